@@ -49,6 +49,19 @@ Tests:
 
 default_dir = dir()
 
+# variables defined in every imported module, default_dir also
+# contains __annotations__ when this file runs as a script
+module_variables = [
+    "__builtins__",
+    "__cached__",
+    "__doc__",
+    "__file__",
+    "__loader__",
+    "__name__",
+    "__package__",
+    "__spec__",
+]
+
 __version__ = "0.1.10"
 __author__ = "Maurice Lambert"
 __author_email__ = "mauricelambert434@gmail.com"
@@ -69,19 +82,20 @@ __copyright__ = copyright
 
 __all__ = [
     "Obfuscator",
+    "ObfuscationResult",
+    "obfuscate",
     "main",
     "Name",
     "DocPassword",
     "DocLevels",
 ]
 
-print(copyright)
-
 from ast import (
     AST,
     Attribute,
     Call,
     Tuple as TupleAst,
+    List as ListAst,
     Load,
     Constant,
     Import,
@@ -100,25 +114,110 @@ from ast import (
     AsyncFunctionDef,
     ExceptHandler,
     Global,
+    Nonlocal,
+    keyword,
     alias,
     arg,
     parse,
     unparse,
+    walk as walk_ast,
+    iter_child_nodes,
+    Lambda,
+    ListComp,
+    SetComp,
+    DictComp,
+    GeneratorExp,
+    For,
+    AsyncFor,
+    While,
+    comprehension,
+    stmt,
+    iter_fields,
+    If,
+    Try,
+    Compare,
+    Eq,
 )
-from argparse import ArgumentParser, Namespace
-from logging import debug, info, basicConfig
+from logging import debug, info, basicConfig, getLogger, DEBUG
 from random import choice, choices, randint
 from string import ascii_letters, digits
-from typing import Tuple, Dict, List
-from dataclasses import dataclass
-from os.path import splitext
-from base64 import b85encode
-from re import sub, finditer
-from gzip import compress
-from json import dump
+from typing import Tuple, Dict, List, Set, Callable, Iterator, Any, Union
+from typing import NamedTuple
+from itertools import product
+from keyword import kwlist
+from importlib import import_module
+from time import perf_counter
+from os.path import (
+    expanduser,
+    splitext,
+    basename,
+    abspath,
+    dirname,
+    relpath,
+    commonpath,
+    getsize,
+    isfile,
+    isabs,
+    normpath,
+    join,
+)
+from marshal import dumps as marshal_dumps
+from os import walk, sep, makedirs, stat, scandir, remove
+from sys import stderr, stdin, stdout
 import builtins
 
 
+def get_data_size(data: Any) -> int:
+    """
+    This function returns the size of code (characters or bytes)
+    or the number of nodes of an AST.
+
+    >>> get_data_size("abc"), get_data_size(parse("a = 1"))
+    (3, 5)
+    >>>
+    """
+
+    if isinstance(data, AST):
+        return sum(1 for _ in walk_ast(data))
+
+    return len(data)
+
+
+def xor_bytes(data: bytes, key: Union[bytes, List[int]]) -> bytes:
+    """
+    This function encrypts data with a repeated key using XOR on
+    the whole buffer (big integers or NumPy for large buffers when
+    it's installed) instead of a Python loop on each byte.
+
+    >>> xor_bytes(b"abc", [1, 2])
+    b'``b'
+    >>> xor_bytes(b"``b", b"\\x01\\x02")
+    b'abc'
+    >>>
+    """
+
+    size = len(data)
+    if not size:
+        return b""
+
+    key = bytes(key)
+    keystream = (key * (size // len(key) + 1))[:size]
+
+    if size >= 1 << 20:
+        try:
+            from numpy import frombuffer, bitwise_xor, uint8
+        except ImportError:
+            pass
+        else:
+            return bitwise_xor(
+                frombuffer(data, uint8), frombuffer(keystream, uint8)
+            ).tobytes()
+
+    return (
+        int.from_bytes(data, "little") ^ int.from_bytes(keystream, "little")
+    ).to_bytes(size, "little")
+
+
 class DocPassword:
 
     """
@@ -152,32 +251,37 @@ class DocLevels:
         - level 1
         - strings are encrypted (using Obfuscator.crypt_strings function)
             the strings become illegible but execution is longer
+        - encrypted constants used in loops and comprehensions are
+            decrypted once, before the loop (disabled with hoist=False)
     if level equal 3:
         - level 2
-        - code is compressed using GZIP
+        - code is compressed using GZIP (or zlib, lzma, bz2)
             the code structure becomes invisible but execution is longer
     if level equal 4:
         - level 3
         - encrypt the code but execution is longer
     if level equal 5:
         - level 4
-        - encode code using base85
+        - encode code using base85 (or base85-chunked, base64, base16)
             bigger file size and execution is longer
     if level equal 6:
         - level 5
         - encode your code as hexadecimal escape ('a' become '\x061')
             file size * 4
+
+    With the combined loader (level 3 or greater), all compression,
+    encryption and encoding are undone by one stub working on a single
+    bytes buffer: startup is faster and uses less memory.
     """
 
     def print_the_doc() -> None:
         print(DocLevels.__doc__)
 
 
-@dataclass
 class Name:
 
     """
-    Dataclass with default name, obfuscation name, definition and namespace.
+    Class with default name, obfuscation name, definition and namespace.
 
     name(str): default variable name
     obfuscation(str): variable name after obfuscation (a random name)
@@ -186,1229 +290,4654 @@ class Name:
     <class name>.<function name>)
     """
 
-    name: str
-    obfuscation: str
-    is_attribute: bool = False
-    namespace_name: str = None
+    def __init__(
+        self,
+        name: str,
+        obfuscation: str,
+        is_attribute: bool = False,
+        namespace_name: str = None,
+    ):
+        self.name = name
+        self.obfuscation = obfuscation
+        self.is_attribute = is_attribute
+        self.namespace_name = namespace_name
+
+    def __repr__(self) -> str:
+        return (
+            f"Name(name={self.name!r}, obfuscation={self.obfuscation!r},"
+            f" is_attribute={self.is_attribute!r},"
+            f" namespace_name={self.namespace_name!r})"
+        )
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Name):
+            return NotImplemented
+
+        return vars(self) == vars(other)
 
 
-@dataclass
-class ModuleImport:
+class ObfuscationResult(NamedTuple):
 
     """
-    This dataclass contains modules informations to import it.
+    This class contains the obfuscate code and names mapping.
+
+    code(str): the obfuscate code
+    names(Dict[str, Name]): default name to Name (with obfuscation name)
+    configuration(Dict[str, Any]): configuration and names mapping
+        to reverse obfuscation (content of deobfuscate.json)
     """
 
-    name: str
-    alias: str
+    code: str
+    names: Dict[str, Name]
+    configuration: Dict[str, Any]
+    stats: "ObfuscationStats" = None
 
 
-@dataclass
-class ElementImport:
+class StageStats:
 
     """
-    This dataclass contains name to import it from module.
+    This class contains wall time, peak traced memory (bytes)
+    and input/output sizes (characters or bytes, AST nodes for
+    AST stages) of one obfuscation stage.
     """
 
-    name: str
-    asname: str
+    def __init__(
+        self,
+        name: str,
+        input_size: int,
+        output_size: int = 0,
+        time: float = 0,
+        peak_memory: int = 0,
+    ):
+        self.name = name
+        self.input_size = input_size
+        self.output_size = output_size
+        self.time = time
+        self.peak_memory = peak_memory
 
 
-class Obfuscator(NodeTransformer):
+class ObfuscationStats(NamedTuple):
 
     """
-    This class obfuscates python code.
-
-    filename(str):                 python filename to obfuscate
-    output_filename(str) = None:   obfuscate python filename
-    level(int) = 6:                obfuscation level (see DocLevels)
-    names(Dict[str, Name]) = {}:   names you need to know (define your obfuscation names for import)
-        For exemple: to import class named 'Obfuscator' as 'Fdg6jsT_2', names must be
-        "{'Obfuscator': Name('Obfuscator', 'Fdg6jsT_2', False, None)}".
-    deobfuscate(bool) = True:      save names in a JSON file to reverse name obfuscation
-    password(str) = None:          key for encryption (see DocPassword)
-    encoding(str) = 'utf-8':       python file encoding
-    names_size(int) = 12:          size to generate random variables names
+    This class contains statistics of each obfuscation stage,
+    of the names allocator (names and rejected random names)
+    and of the exports cache.
     """
 
-    def __init__(
-        self,
-        filename: str,
-        output_filename: str = None,
-        level: int = 6,
-        names: Dict[str, Name] = {},
-        deobfuscate: bool = True,
-        password: str = None,
-        encoding: str = "utf-8",
-        names_size: int = 12,
-    ):
-        self.filename = filename
-        self.output_filename = (
-            output_filename or f"{splitext(filename)[0]}_obfu.py"
-        )
-        self.level = level
-        self.deobfuscate = deobfuscate
+    stages: List[StageStats]
+    names: int
+    name_retries: int
+    cache_hits: int = 0
+    cache_misses: int = 0
 
-        self.password = password
-        self.code = None
-        self.astcode = None
 
-        self.default_names = names
-        self.obfu_names = {v.obfuscation: v for v in names.values()}
+class ModuleImport(NamedTuple):
 
-        self.names_size = names_size
-        self.encoding = encoding
+    """
+    This class contains modules informations to import it.
+    """
 
-        self._xor_password_key = None
-        self._xor_password_key_length = 40
+    name: str
+    alias: str
 
-        self.current_class = None
-        self.default_is_define = False
 
-        self.using_default_obfu = False
+class ElementImport(NamedTuple):
 
-        self.in_format_string = False
-        self.hard_coded_string = {("decode",), ("utf-8",)}
+    """
+    This class contains name to import it from module.
+    """
 
-        self.in_assign = False
+    name: str
+    asname: str
 
-        super().__init__()
 
-    def get_random_name(
-        self, first_name: str, is_attribute: bool = False
-    ) -> Name:
-        """
-        This function returns a random variable name.
+def gzip_compress(data: bytes, level: int) -> bytes:
+    """
+    This function compresses data using gzip.
+    """
 
-        >>> Obfuscator("").get_random_name("test").name
-        'test'
-        >>>
-        """
+    from gzip import compress
 
-        if (name := self.default_names.get(first_name)) is not None:
-            if is_attribute:
-                name.is_attribute = True
-            return name
+    return compress(data, level)
 
-        while name is None or name in self.obfu_names.keys():
-            first = choice("_" + ascii_letters)
-            name = "".join(
-                choices("_" + ascii_letters + digits, k=self.names_size - 1)
-            )
 
-            name = first + name
+def deflate(data: bytes, level: int) -> bytes:
+    """
+    This function compresses data using raw deflate (zlib without header).
+    """
 
-        name = Name(
-            first_name,
-            name,
-            is_attribute or self.default_is_define,
-            self.current_class,
-        )
-        self.obfu_names[name.obfuscation] = name
-        self.default_names[first_name] = name
+    from zlib import compressobj, DEFLATED
 
-        return name
+    compressor = compressobj(level, DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
 
-    def get_code(self) -> Tuple[str, AST]:
-        """
-        This function returns content and AST from python file.
-        """
 
-        with open(self.filename, encoding=self.encoding) as file:
-            code = self.code = file.read()
+def lzma_alone(data: bytes, level: int) -> bytes:
+    """
+    This function compresses data using lzma with the legacy .lzma format
+    (smaller header than the .xz format).
+    """
 
-        debug(f"Get code from {self.filename!r}")
+    from lzma import compress, FORMAT_ALONE
 
-        astcode = self.astcode = parse(code)
-        return code, astcode
+    return compress(data, FORMAT_ALONE, preset=level)
 
-    def add_super_arguments(self, code: str = None) -> Tuple[str, AST]:
-        r"""
-        This function adds super arguments because super
-        can't defined it's arguments after obfuscation.
 
-        >>> code = "class A:\n\tdef __init__(self):super().__init__()"
-        >>> code, _ = Obfuscator("").add_super_arguments(code)
-        >>> code
-        'class A:\n\tdef __init__(self):super(self.__class__, self).__init__()'
-        >>>
-        """
+def bzip2(data: bytes, level: int) -> bytes:
+    """
+    This function compresses data using bz2.
+    """
 
-        code = self.code = sub(
-            r"\bsuper\b\(\)",
-            "super(self.__class__, self)",
-            (code or self.code),
-        )
+    from bz2 import compress
 
-        astcode = self.astcode = parse(code)
-        info("Super arguments is added.")
-        return code, astcode
+    return compress(data, level)
 
-    def add_builtins(self) -> str:
-        """
-        This function adds builtins obfuscation on the top of the code
-        and returns it.
 
-        This function raises RuntimeError if builtins are not obfuscate.
+class Compression(NamedTuple):
 
-        This function raises RuntimeError if self.code is None.
-        """
+    """
+    This class contains functions and runtime import to compress code.
 
-        if (init := getattr(self, "default_variables", None)) is None:
-            raise RuntimeError(
-                "Initialize obfuscation with 'init_builtins' method."
-            )
+    module(str): module to import decompress function in obfuscate code
+    compress(Callable): function to compress data with a level
+    arguments(str): arguments to add in the decompress call
+    default_level(int): compression level to use by default
+    levels(range): valid compression levels
+    """
 
-        if self.code is None:
-            raise RuntimeError("Code is not defined")
+    module: str
+    compress: Callable[[bytes, int], bytes]
+    arguments: str = ""
+    default_level: int = 9
+    levels: range = range(10)
 
-        code = self.code = f"{init}{self.code}"
-        return code
 
-    def write_code(self) -> Tuple[str, AST]:
-        """
-        This function writes obfuscate code in output file
-        and returns the obfuscate code.
+class CompressionBenchmark(NamedTuple):
 
-        This function raises RuntimeError if self.code is None.
-        """
+    """
+    This class contains size and time to decompress code with a codec.
+    """
 
-        code = self.code
-        if code is None:
-            raise RuntimeError("Code is not defined")
+    codec: str
+    level: int
+    size: int
+    compress_time: float
+    decompress_time: float
 
-        with open(self.output_filename, "w", encoding=self.encoding) as file:
-            file.write(code)
 
-        debug(f"Write obfuscate code in {self.output_filename}")
+class Armor(NamedTuple):
 
-        return code
+    """
+    This class contains functions and runtime code to encode code.
 
-    def gzip(self, code: str = None) -> str:
-        """
-        This function compress python code with gzip.
-           (Level 3)
+    module(str): module to import decode function in obfuscate code
+    function(str): decode function name in the module
+    encode(Callable): function to encode data
+    expression(str): runtime expression to decode {data} using {decode}
+    """
 
-        - if code is None this function use self.code
-        - self.code is compressed using GZIP
-        - returns the compressed code
+    module: str
+    function: str
+    encode: Callable[[bytes], bytes]
+    expression: str = "{decode}({data})"
 
-        >>> code = "print('Hello World !')"
-        >>> obfu = Obfuscator("").gzip(code)
-        >>> code != obfu
-        True
-        >>> exec(obfu)
-        Hello World !
-        >>>
-        """
 
-        code = code or self.code
+def base85_encode(data: bytes) -> bytes:
+    """
+    This function encodes data with base85.
+    """
 
-        if self.level >= 3:
-            code = compress(code.encode())
-            self.code = (
-                code
-            ) = f"from gzip import decompress as __;_=exec;_(__({code}))"
-            debug("Code is compressed using gzip.")
+    from base64 import b85encode
 
-        return code
+    return b85encode(data)
 
-    def hexadecimal(self, code: str = None) -> str:
-        r"""
-        This function encodes python code as hexadecimal ('a' become '\x61').
-           (Level 6)
 
-        - if code is None this function use self.code
-        - self.code is encoded as hexadecimal
-        - returns the hexadecimal encoded code
+def b85encode_chunked(data: bytes, size: int = 65536) -> bytes:
+    """
+    This function encodes data with base85 using chunks
+    to keep memory bounded (same output as base85_encode).
 
-        >>> code = "print('Hello World !')"
-        >>> obfu = Obfuscator("").hexadecimal(code)
-        >>> code != obfu
-        True
-        >>> exec(obfu)
-        Hello World !
-        >>>
-        """
+    size must be a multiple of 4 (4 bytes are encoded in 5 characters).
 
-        code = code or self.code
+    >>> b85encode_chunked(b"abcdefgh", 4) == base85_encode(b"abcdefgh")
+    True
+    >>>
+    """
 
-        if self.level >= 6:
-            code = "".join([f"\\x{car:0>2x}" for car in code.encode()])
-            code = self.code = f"_=exec;_('{code}')"
-            debug("Code is encoded as hexadecimal.")
+    from base64 import b85encode
 
-        return code
+    if size <= 0 or size % 4:
+        raise ValueError(f"Invalid chunk size: {size} (multiple of 4)")
 
-    def xor_code(self, code: str = None, password: str = None) -> str:
-        """
-        This function encrypts code using xor.
-           (Level 4)
+    data = memoryview(data)
+    return b"".join(
+        [
+            b85encode(data[index : index + size])
+            for index in range(0, len(data), size)
+        ]
+    )
 
-        - if code is None this function use self.code
-        - if password is None this function use self.password
-               (see the DocPassword's doc string for more information)
-        - if self.password is None this function generate a random password
-               (see the DocPassword's doc string for more information)
-        - self.code is set to encrypted code
-        - returns the encrypted code
 
-        >>> exec(Obfuscator("").xor_code("print('Hello World !')"))
-        Hello World !
-        >>>
-        """
+def b85decode_chunked(data: bytes, size: int = 81920) -> bytes:
+    """
+    This function decodes base85 data using chunks
+    to keep memory bounded (same output as base64.b85decode).
 
-        code = code or self.code
-        if self.level < 4:
-            return code
+    size must be a multiple of 5 (5 characters are decoded in 4 bytes).
 
-        password = password or self.password
-        if password:
-            ask_password = True
-            password = password.encode()
-            password_lenght = len(password)
-            debug("Encrypt with your key.")
-        else:
-            ask_password = False
-            password = choices(list(range(256)), k=40)
-            password_lenght = 40
-            debug("Encrypt with random key.")
+    >>> b85decode_chunked(base85_encode(b"abcdefgh"), 5)
+    b'abcdefgh'
+    >>>
+    """
+
+    from base64 import b85decode
 
-        code = [
-            char ^ password[i % password_lenght]
-            for i, char in enumerate(code.encode())
+    if size <= 0 or size % 5:
+        raise ValueError(f"Invalid chunk size: {size} (multiple of 5)")
+
+    data = memoryview(data)
+    return b"".join(
+        [
+            b85decode(data[index : index + size])
+            for index in range(0, len(data), size)
         ]
+    )
 
-        if ask_password:
-            code = self.code = (
-                "_=input('Password: ').encode();__=len(_);___=exec;_____='';"
-                f"\nfor _______,______ in enumerate({code}):_____+=chr"
-                "(______^_[_______%__])\n___(_____)"
+
+def base64_encode(data: bytes) -> bytes:
+    """
+    This function encodes data with base64 (without newline).
+    """
+
+    from binascii import b2a_base64
+
+    return b2a_base64(data, newline=False)
+
+
+def base16_encode(data: bytes) -> bytes:
+    """
+    This function encodes data with base16 (hexadecimal).
+    """
+
+    from binascii import hexlify
+
+    return hexlify(data)
+
+
+armors = {
+    "base85": Armor("base64", "b85decode", base85_encode),
+    "base85-chunked": Armor(
+        "base64",
+        "b85decode",
+        b85encode_chunked,
+        "(lambda d,c:b''.join([d(c[i:i+81920]) for i in range(0,len(c),"
+        "81920)]))({decode},memoryview({data}))",
+    ),
+    "base64": Armor("binascii", "a2b_base64", base64_encode),
+    "base16": Armor("binascii", "a2b_hex", base16_encode),
+}
+
+compressions = {
+    "gzip": Compression("gzip", gzip_compress),
+    "zlib": Compression("zlib", deflate, ",-15", levels=range(-1, 10)),
+    "lzma": Compression("lzma", lzma_alone, default_level=6),
+    "bz2": Compression("bz2", bzip2, levels=range(1, 10)),
+}
+
+
+def compression_benchmark(
+    code: str, level: int = None, repeat: int = 5
+) -> List[CompressionBenchmark]:
+    """
+    This function compresses code with all codecs and returns
+    the compressed size and the runtime decompression time
+    (the best time on `repeat` runs of the obfuscate code
+    decompression statement, codec import included, in a new
+    python process).
+
+    >>> [r.codec for r in compression_benchmark("print('Hello World !')")]
+    ['gzip', 'zlib', 'lzma', 'bz2']
+    >>>
+    """
+
+    from subprocess import run
+    from sys import executable
+
+    reports = []
+    data = code.encode()
+
+    for name, compression in compressions.items():
+        codec_level = compression.default_level if level is None else level
+        start = perf_counter()
+        compressed = compression.compress(data, codec_level)
+        compress_time = perf_counter() - start
+
+        stub = (
+            "from sys import stdin\nfrom time import perf_counter\n"
+            "_=stdin.buffer.read()\nstart=perf_counter()\n"
+            f"from {compression.module} import decompress as __;"
+            f"__(_{compression.arguments})\nprint(perf_counter()-start)"
+        )
+        decompress_time = min(
+            float(
+                run(
+                    [executable, "-c", stub],
+                    input=compressed,
+                    capture_output=True,
+                    check=True,
+                ).stdout
             )
-        else:
-            code = self.code = (
-                f"_={password};__=len(_);___=exec;_____='';\nfor _______,_____"
-                f"_ in enumerate({code}):_____+=chr(______^_[_______%__])"
-                "\n___(_____)"
+            for _ in range(repeat)
+        )
+
+        reports.append(
+            CompressionBenchmark(
+                name,
+                codec_level,
+                len(compressed),
+                compress_time,
+                decompress_time,
             )
+        )
 
-        debug("Code is encrypted with XOR.")
-        return code
+    return reports
 
-    def base85(self, code: str = None) -> str:
-        """
-        This function encodes python code with base85.
-           (Level 5)
 
-        - if code is None this function use self.code
-        - self.code is set encoded code
-        - returns the base85 encoded code
+def iter_scope(nodes: List[AST]) -> Iterator[AST]:
+    """
+    This function yields AST nodes of a scope without nodes
+    of nested scopes (except default values, decorators, bases
+    and the first comprehension iterable, evaluated in the scope).
+    """
 
-        >>> exec(Obfuscator("").base85("print('Hello World !')"))
-        Hello World !
-        >>>
-        """
+    stack = list(nodes)
+
+    while stack:
+        node = stack.pop()
+        yield node
+
+        if isinstance(node, (FunctionDef, AsyncFunctionDef, Lambda)):
+            stack.extend(getattr(node, "decorator_list", []))
+            stack.extend(node.args.defaults)
+            stack.extend(filter(None, node.args.kw_defaults))
+        elif isinstance(node, ClassDef):
+            stack.extend(node.decorator_list)
+            stack.extend(node.bases)
+            stack.extend(node.keywords)
+        elif isinstance(node, (ListComp, SetComp, DictComp, GeneratorExp)):
+            stack.append(node.generators[0].iter)
+        else:
+            stack.extend(iter_child_nodes(node))
 
-        code = code or self.code
 
-        if self.level < 5:
-            return code
+def find_module_filename(name: str) -> str:
+    """
+    This function returns the source filename of a module without
+    importing it or its parent packages (None for builtin, frozen,
+    extension and namespace modules).
+
+    >>> basename(find_module_filename("xml.dom.minidom"))
+    'minidom.py'
+    >>> find_module_filename("sys")
+    >>>
+    """
 
-        code = b85encode(code.encode())
-        code = (
-            self.code
-        ) = ("from base64 import b85decode as _;___=bytes.decode;"f"__=exec;__(___(_({code})))")
-        debug("Code is encoded with base85")
+    from importlib.machinery import PathFinder, SourceFileLoader
 
-        return code
+    spec = None
+    path = None
+    parts = name.split(".")
 
-    def delete_field(self, element: AST, field: str) -> AST:
-        """
-        This function deletes field in AST object.
-        """
+    for index in range(1, len(parts) + 1):
+        spec = PathFinder.find_spec(".".join(parts[:index]), path)
+        if spec is None:
+            return None
+        path = spec.submodule_search_locations
 
-        dict_ = element.__dict__
-        if field in dict_.keys():
-            del dict_[field]
-            element._fields = tuple(dict_.keys())
-            info(f"Deleted {field} in {type(element)}")
+    if isinstance(spec.loader, SourceFileLoader):
+        return spec.origin
 
-        return element
+    return None
 
-    def delete_annotations(self, element: AST) -> AST:
-        """
-        This function deletes annotations in AST object.
-        """
 
-        return self.delete_field(element, "annotation")
+def get_string_list(astcode: AST) -> List[str]:
+    """
+    This function returns strings from a literal list or tuple
+    of strings (None when the value is not a literal).
+    """
 
-    def delete_returns(self, element: AST) -> AST:
-        """
-        This function deletes returns in AST object.
-        """
+    if not isinstance(astcode, (ListAst, TupleAst)):
+        return None
 
-        return self.delete_field(element, "returns")
+    if not all(
+        isinstance(element, Constant) and isinstance(element.value, str)
+        for element in astcode.elts
+    ):
+        return None
 
-    def init_builtins(self) -> str:
-        """
-        This function obfuscates default variables and builtins names.
-        """
+    return [element.value for element in astcode.elts]
 
-        names = tuple(map(self.get_random_name, dir(builtins) + default_dir))
 
-        default_variables = self.default_variables = (
-            f"{','.join([name.obfuscation for name in names])}"
-            f"={','.join([name.name for name in names])}\n"
-        )
-        info("Builtins obfuscated.")
+def is_main_guard(node: AST) -> bool:
+    """
+    This function returns True for an 'if __name__ == "__main__":'
+    statement (never executed by an import).
 
-        return default_variables
+    >>> is_main_guard(parse("if __name__ == '__main__': main()").body[0])
+    True
+    >>>
+    """
 
-    def init_import(self, code: str = None) -> Tuple[str, AST]:
-        """
-        This function adds an import function to try module
-        'from <module>.<module> import <module>'.
+    return (
+        isinstance(node, If)
+        and isinstance(node.test, Compare)
+        and isinstance(node.test.left, NameAst)
+        and node.test.left.id == "__name__"
+        and len(node.test.ops) == 1
+        and isinstance(node.test.ops[0], Eq)
+        and isinstance(node.test.comparators[0], Constant)
+        and node.test.comparators[0].value == "__main__"
+    )
 
-        code(str) = None: if code this function use this code else
-        it use self.code
-        self.code is set to the new code
-        Return the new code and AST.
-        """
 
-        code = code or self.code
+def get_static_exports(filename: str) -> List[str]:
+    """
+    This function returns names imported by 'from <module> import *'
+    analyzing the module source (the module is not executed).
+
+    Returns the literal __all__ or all public names defined at the
+    top level, or None when names can't be resolved statically
+    (dynamic __all__, star import or conditional definitions).
+    'if __name__ == "__main__":' blocks are ignored and names defined
+    in any block of a top-level try statement are exported.
+    """
 
-        self.code = code = (
-            (
-                "def myimport(module, element, *args, **kwargs):\n\ttry:return"
-                " __import__(module+'.'+element, *args, **kwargs)\n\texcept"
-                " ImportError:return __import__(module, *args, **kwargs)\n"
+    with open(filename, "rb") as file:
+        tree = parse(file.read())
+
+    names = {}
+    exports = None
+    resolved = True
+    all_assignments = 0
+    nodes = list(tree.body)
+
+    while nodes:
+        node = nodes.pop(0)
+        if isinstance(node, Try):
+            nodes[0:0] = [
+                *node.body,
+                *(
+                    element
+                    for handler in node.handlers
+                    for element in handler.body
+                ),
+                *node.orelse,
+                *node.finalbody,
+            ]
+        elif is_main_guard(node):
+            continue
+        elif isinstance(node, (Assign, AnnAssign, AugAssign)):
+            targets = (
+                node.targets if isinstance(node, Assign) else [node.target]
             )
-            + code
-            if code
-            else ""
-        )
+            for target in targets:
+                if isinstance(target, NameAst) and target.id == "__all__":
+                    all_assignments += 1
+                    values = get_string_list(node.value)
+                    if values is None:
+                        return None
+                    elif not isinstance(node, AugAssign):
+                        exports = values
+                    elif exports is None:
+                        return None
+                    else:
+                        exports = exports + values
+                elif isinstance(target, NameAst):
+                    names[target.id] = None
+                elif isinstance(target, (TupleAst, ListAst)):
+                    for element in target.elts:
+                        if isinstance(element, NameAst):
+                            names[element.id] = None
+                        else:
+                            resolved = False
+        elif isinstance(node, (FunctionDef, AsyncFunctionDef, ClassDef)):
+            names[node.name] = None
+        elif isinstance(node, Import):
+            for alias_ in node.names:
+                names[alias_.asname or alias_.name.split(".")[0]] = None
+        elif isinstance(node, ImportFrom):
+            for alias_ in node.names:
+                if alias_.name == "*":
+                    resolved = False
+                else:
+                    names[alias_.asname or alias_.name] = None
+        elif not isinstance(node, Expr):
+            resolved = False
+
+    all_references = sum(
+        isinstance(node, NameAst) and node.id == "__all__"
+        for node in walk_ast(tree)
+    )
+    if all_references != all_assignments:
+        return None
 
-        astcode = self.astcode = parse(code)
-        info("Import function is added to code.")
-        return code, astcode
+    if exports is not None:
+        return exports
 
-    def init_crypt_strings(self, code: str = None) -> Tuple[str, AST]:
-        """
-        This function adds the decrypt function to decrypt
-        obfuscated/encrypted strings.
+    if not resolved:
+        return None
 
-        code(str) = None: if code this function use this code else
-        it use self.code
-        self.code is set to the new code
-        Return the new code and AST.
-        """
+    return [name for name in names if not name.startswith("_")]
 
-        code = code or self.code
-        self._xor_password_key = choices(
-            list(range(256)), k=self._xor_password_key_length
-        )
 
-        if self.level < 2:
-            return code, self.astcode
+def get_imported_exports(name: str) -> List[str]:
+    """
+    This function imports a module to get names
+    imported by 'from <module> import *'.
+    """
 
-        self.code = code = (
-            (
-                "xor=lambda bytes_:(bytes([x^"
-                f"{self._xor_password_key}[i%{self._xor_password_key_length}]"
-                f" for i,x in enumerate(bytes_)]))\n{self.code}"
-            )
-            if code
-            else (
-                "xor=lambda bytes_:(bytes([x^"
-                f"{self._xor_password_key}[i%{self._xor_password_key_length}]"
-                " for i,x in enumerate(bytes_)]))\n"
-            )
-        )
+    module = import_module(name)
+    exports = getattr(module, "__all__", None)
+    if exports is None:
+        return [name for name in dir(module) if not name.startswith("_")]
 
-        astcode = self.astcode = parse(code)
-        info("Encrypt/decrypt (XOR) function is added to code.")
-        return code, astcode
+    return list(exports)
 
-    def xor(self, data: bytes) -> bytes:
-        """
-        This function encrypts data.
 
-        data(bytes): data to encrypt
-        return encrypted bytes
-        """
+exports_caches = {}
+exports_cache_statistics = {"hits": 0, "misses": 0}
 
-        if self._xor_password_key is None:
-            raise RuntimeError(
-                "To encrypt data the encryption key must be set."
-            )
 
-        cipher = [
-            byte ^ self._xor_password_key[i % self._xor_password_key_length]
-            for i, byte in enumerate(data)
-        ]
-        return bytes(cipher)
+def get_exports_cache(cache_filename: str) -> Dict[str, List[Any]]:
+    """
+    This function returns the export lists cache
+    (loaded from the JSON file once per process).
+    """
 
-    def set_namespace_name(self, name: str) -> str:
-        """
-        This function sets current namespace name.
+    from json import loads
 
-        returns old namespace name
+    cache = exports_caches.get(cache_filename)
+    if cache is not None:
+        return cache
 
-        >>> obfu = Obfuscator("")
-        >>> obfu.set_namespace_name("Test")
-        >>> obfu.set_namespace_name("test")
-        'Test'
-        >>> obfu.current_class
-        'Test.test'
-        >>>
-        """
+    cache = {}
+    if cache_filename and isfile(cache_filename):
+        try:
+            with open(cache_filename, encoding="utf-8") as file:
+                cache = loads(file.read())
+        except ValueError:
+            info("Invalid exports cache: %r", cache_filename)
 
-        namespace = self.current_class
-        if namespace is not None:
-            self.current_class += "." + name
-        else:
-            self.current_class = name
+    exports_caches[cache_filename] = cache
+    return cache
 
-        return namespace
 
-    def get_targets_and_value_for_import(
-        self,
-        module: str,
-        elements: List[alias],
-        is_from_import: bool = True,
-        level: int = 0,
-    ) -> Tuple[TupleAst, TupleAst]:
-        """
-        This function obfuscates 'from ... import ...'.
-        """
+def get_module_exports(
+    name: str, filename: str = None, cache_filename: str = None
+) -> List[str]:
+    """
+    This function returns names imported by 'from <module> import *'.
+
+    The module source is analyzed statically, the module is imported
+    only when names can't be resolved from the source. Results are
+    cached (in the cache_filename JSON file when defined) by module
+    filename, modification time and size: repeat builds import nothing.
+    The cache file is replaced atomically (shared by processes).
+
+    name is None for a relative import in an unknown package
+    (filename is required).
+
+    >>> get_module_exports("json")[:4]
+    ['dump', 'dumps', 'load', 'loads']
+    >>>
+    """
 
-        def get_basic_myimport():
-            return (
-                f"myimport({module!r}, "
-                f"{repr(element.name) if element else None}, globals="
-                f'{"globals()" if level else None}, locals='
-                f'{"locals()" if level else None}, level={level!r})'
+    from json import dumps
+
+    filename = filename or (name and find_module_filename(name))
+    if filename is None:
+        return get_imported_exports(name)
+
+    filename = abspath(filename)
+    status = stat(filename)
+    key = f"{status.st_mtime_ns}:{status.st_size}"
+
+    cache = get_exports_cache(cache_filename)
+    cached = cache.get(filename)
+    if cached is not None and cached[0] == key:
+        debug("Exports of %r loaded from cache.", name)
+        exports_cache_statistics["hits"] += 1
+        return cached[1]
+
+    exports_cache_statistics["misses"] += 1
+    exports = get_static_exports(filename)
+    if exports is None:
+        debug("Exports of %r can't be resolved statically.", name)
+        if name is None:
+            raise ValueError(
+                f"Exports of {filename!r} can't be resolved statically"
+                " and the package of the relative import is unknown"
             )
+        exports = get_imported_exports(name)
 
-        targets = []
-        values = []
+    cache[filename] = [key, exports]
 
-        for element in elements:
-            alias = getattr(element, "asname", None) or element.name
+    if cache_filename:
+        makedirs(dirname(abspath(cache_filename)), exist_ok=True)
+        write_atomic(cache_filename, dumps(cache).encode())
 
-            if module is None:
-                module, element = element.name, module
+    return exports
 
-            code = (
-                None
-                if "." not in module and element is not None
-                else get_basic_myimport()
-            )
-            for name in module.split(".")[1:]:
-                code = f"getattr({code if code else module}, {name!r})"
 
-            if is_from_import and element:
-                code = f"""getattr(
-                    {code if code else get_basic_myimport()},
-                    {element.name!r})"""
+def get_profile(filename: str) -> Dict[Tuple[str, int, str], float]:
+    """
+    This function returns the share of the execution profile used by
+    each function: {(filename, line number, function name): share}.
+
+    filename is a cProfile/pstats file (own time of each function) or
+    a JSON calls count trace: {"<filename>:<line>(<function>)": calls}.
+
+    >>> from tempfile import NamedTemporaryFile
+    >>> from os import remove
+    >>> with NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+    ...     file.write('{"a.py:1(f)": 3, "a.py:5(g)": 1}')
+    32
+    >>> get_profile(file.name)
+    {('a.py', 1, 'f'): 0.75, ('a.py', 5, 'g'): 0.25}
+    >>> remove(file.name)
+    >>>
+    """
 
-            targets.append(NameAst(id=alias, ctx=Store()))
-            values.append(parse(code).body[0].value)
-            info(
-                f"Obfuscates from {module!r} import "
-                + (repr(element.name) if element else ".")
-            )
+    from json import loads
+
+    with open(filename, "rb") as file:
+        is_json = file.read(1) == b"{"
+
+    if is_json:
+        with open(filename, encoding="utf-8") as file:
+            counts = {}
+            for function, calls in loads(file.read()).items():
+                location, _, name = function[:-1].rpartition("(")
+                path, _, line = location.rpartition(":")
+                counts[(path, int(line), name)] = calls
+    else:
+        from pstats import Stats
+
+        counts = {
+            function: own_time
+            for function, (_, _, own_time, _, _) in Stats(
+                filename
+            ).stats.items()
+        }
 
-        # TODO add parse(start) to AST
+    total = sum(counts.values()) or 1
+    return {function: value / total for function, value in counts.items()}
 
-        return TupleAst(elts=targets, ctx=Load()), TupleAst(
-            elts=values, ctx=Load()
-        )
 
-    @staticmethod
-    def delete_doc_string(astcode: AST) -> AST:
+class Tracer:
+
+    """
+    This class traces the obfuscation of AST nodes: debug messages
+    are formatted (with % and arguments) only when the DEBUG level is
+    enabled and structured events (JSON lines) are written for a
+    sample of traced nodes (one node every 1/sample nodes). Lines
+    of events are lines of the original code (line_offset is the
+    number of lines added before it).
+
+    Tracer.enabled is False when there is nothing to log or write,
+    callers check it before calling the tracer to skip arguments
+    building (the default log level doesn't cost any formatting).
+    Messages logged with info are only written as events (see event).
+
+    >>> tracer = Tracer("code.py")
+    >>> tracer.enabled
+    False
+    >>> tracer("Name obfuscation for %r", "name")
+    >>>
+    """
+
+    def __init__(
+        self, filename: str, events_filename: str = None, sample: float = 1
+    ):
+        self.filename = filename
+        self.log = getLogger().isEnabledFor(DEBUG)
+        self.events_filename = events_filename
+        self.events = None
+        self.sample = sample
+        self.sampled = 1 - sample
+        self.line_offset = 0
+        self.enabled = self.log or bool(events_filename)
+
+    def __call__(
+        self, message: str, *arguments: Any, node: AST = None
+    ) -> None:
         """
-        This function deletes doc string in AST object.
+        This function logs the message and writes an event for node
+        (when it's sampled).
         """
 
-        for i, element in enumerate(astcode.body):
-            if isinstance(element, Expr) and isinstance(
-                element.value, Constant
-            ):
-                del astcode.body[i]
+        if self.log:
+            debug(message, *arguments)
 
-        return astcode
+        self.event(message, *arguments, node=node)
 
-    def string_obfuscation(
-        self, string: str, no_backlash: bool = False
-    ) -> str:
+    def event(self, message: str, *arguments: Any, node: AST = None) -> None:
         """
-        This function obfuscate a string.
+        This function writes an event for node (when it's sampled)
+        without logging the message.
         """
 
-        def to_hex(car: str) -> str:
-            return f"'\\x{ord(car):0>2x}'"
-
-        def to_octal(car: str) -> str:
-            return f"'\\{ord(car):0>3o}'"
-
-        def to_chr(car: str) -> str:
-            return f"chr({ord(car)})"
+        if node is None or not self.events_filename:
+            return None
 
-        def to_chrbin(car: str) -> str:
-            return f"chr({bin(ord(car))})"
+        self.sampled += self.sample
+        if self.sampled < 1:
+            return None
 
-        def to_chradd(car: str) -> str:
-            value = ord(car)
-            temp_value = randint(0, value)
-            return f"chr({bin(temp_value)} + {oct(value - temp_value)})"
+        from json import dumps
 
-        def to_chrsub(car: str) -> str:
-            value = ord(car)
-            temp_value = randint(value, value * value)
-            return f"chr({temp_value} - {temp_value - value})"
+        self.sampled -= 1
+        if self.events is None:
+            self.events = open(self.events_filename, "a", encoding="utf-8")
 
-        if no_backlash:
-            functions = (to_chr, to_chrbin, to_chradd, to_chrsub)
-        else:
-            functions = (
-                to_hex,
-                to_octal,
-                to_chr,
-                to_chrbin,
-                to_chradd,
-                to_chrsub,
-            )
-        string_repr = repr(string)
-        code = self.code
-        debug("Hard coded string obfuscation: " + string_repr)
-        while string_repr in code:
-            code = code.replace(
-                string_repr,
-                " + ".join(choice(functions)(car) for car in string),
-                1,
+        line = getattr(node, "lineno", None)
+        self.events.write(
+            dumps(
+                {
+                    "filename": self.filename,
+                    "node": node.__class__.__name__,
+                    "line": line and line - self.line_offset,
+                    "column": getattr(node, "col_offset", None),
+                    "message": message % arguments,
+                }
             )
-        self.code = code
-        return code
+            + "\n"
+        )
 
-    def int_call_obfuscation(self) -> str:
+    def close(self) -> None:
         """
-        This method obfuscates int calls for int obfuscation.
+        This function closes the events file.
         """
 
-        code = self.code
-        for match in finditer(r"\('0o[0-7]+', 8\)", code):
-            string = match.group()
-            debug("Int call obfuscation: " + repr(string))
-            _8 = choice(
-                (
-                    'ord("\\x08")',
-                    oct(8),
-                    bin(8),
-                    (lambda x: f"{x} - {x - 8}")(randint(8, 256 * 256)),
+        if self.events is not None:
+            self.events.close()
+            self.events = None
+
+
+runtime_stats_code = """def __pyobfuscator_runtime_stats__():
+    from sys import modules, _getframe
+    from time import perf_counter
+
+    stats = modules.get("__pyobfuscator_runtime_stats__")
+    if stats is not None:
+        return stats
+
+    from os import environ, getpid
+    from types import ModuleType
+
+    filename = environ.get("PYOBFUSCATOR_RUNTIME_STATS")
+    layers, calls = {}, {"xor": {}, "getattr": {}}
+
+    def layer(name):
+        if not filename:
+            return exec
+        start = perf_counter()
+
+        def exec_(code):
+            frame = _getframe(1)
+            decoded = perf_counter()
+            code = compile(code, "<string>", "exec")
+            compiled = perf_counter()
+            try:
+                exec(code, frame.f_globals, frame.f_locals)
+            finally:
+                times = layers.setdefault(
+                    name, {"calls": 0, "decode": 0, "compile": 0, "exec": 0}
                 )
+                times["calls"] += 1
+                times["decode"] += decoded - start
+                times["compile"] += compiled - decoded
+                times["exec"] += perf_counter() - compiled
+
+        return exec_
+
+    def count(kind, function):
+        if not filename:
+            return function
+        sites = calls[kind]
+
+        def counter(*args):
+            frame = _getframe(1)
+            site = f"{frame.f_code.co_name}:{frame.f_lineno}"
+            if kind == "getattr":
+                site = f"{site}:{args[1]}"
+            sites[site] = sites.get(site, 0) + 1
+            return function(*args)
+
+        return counter
+
+    def write():
+        from json import dump
+
+        with open(filename.replace("{pid}", str(getpid())), "w") as file:
+            dump({"layers": layers, **calls}, file, indent=4)
+
+    if filename:
+        from atexit import register
+
+        register(write)
+
+    stats = modules["__pyobfuscator_runtime_stats__"] = ModuleType(
+        "__pyobfuscator_runtime_stats__"
+    )
+    stats.layer = layer
+    stats.count = count
+    return stats
+"""
+
+
+class Obfuscator(NodeTransformer):
+
+    """
+    This class obfuscates python code.
+
+    filename(str):                 python filename to obfuscate
+    output_filename(str) = None:   obfuscate python filename
+    level(int) = 6:                obfuscation level (see DocLevels)
+    names(Dict[str, Name]) = {}:   names you need to know (define your obfuscation names for import)
+        For exemple: to import class named 'Obfuscator' as 'Fdg6jsT_2', names must be
+        "{'Obfuscator': Name('Obfuscator', 'Fdg6jsT_2', False, None)}".
+    deobfuscate(bool) = True:      save names in a JSON file to reverse name obfuscation
+    password(str) = None:          key for encryption (see DocPassword)
+    encoding(str) = 'utf-8':       python file encoding
+    names_size(int) = 12:          size to generate random variables names
+    compression(str) = 'gzip':     codec to compress the code (gzip, zlib, lzma or bz2)
+    compression_level(int) = None: compression level (None to use the codec default level)
+    combined_loader(bool) = False: use one loader to undo all transforms (level 3 or greater)
+    armor(str) = 'base85':         level 5 encoding (base85, base85-chunked, base64 or base16)
+    lazy(bool) = False:            encrypt top-level functions separately, decrypted on first call (level 2 or greater)
+    exports_cache(str) = None:     JSON file to cache 'from <module> import *' names between builds
+    runtime(str) = None:           shared runtime module to import helpers from (see get_runtime, level 1 or greater)
+    strings_key(List[int]) = None: key to encrypt strings (random by default, the shared runtime key)
+    minify(bool) = False:          shortest names for the most used identifiers (names_size is not used)
+    scopes(bool) = False:          rename function locals per scope, short names are reused between functions
+    profile(str) = None:           cProfile/pstats file or JSON calls count trace of the original code (see get_profile)
+    hot_threshold(float) = 0.05:   profile share from which a function is hot (only renamed, level 2 or greater)
+    constants(bool) = True:        encrypt strings, bytes and integers (level 2 or greater)
+    attributes(bool) = True:       read attributes with getattr (the attribute name is encrypted from level 2)
+    fast_xor(bool) = False:        decrypt strings with big integers XOR instead of a loop on each byte (level 2 or greater)
+    hoist(bool) = True:            decrypt constants used in loops once, before the loop (level 2 or greater)
+    stats(bool) = False:           record time, memory and sizes of each stage (see get_stats, tracemalloc slows obfuscation)
+    trace_memory(bool) = True:     record the peak memory of each stage with tracemalloc (stats)
+    runtime_stats(bool) = False:   obfuscate code records layers time and decrypt/getattr calls (see add_runtime_stats)
+    trace_events(str) = None:      JSON lines file to write structured events for traced AST nodes (see Tracer)
+    trace_sample(float) = 1:       part of the traced AST nodes written in trace_events
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        output_filename: str = None,
+        level: int = 6,
+        names: Dict[str, Name] = {},
+        deobfuscate: bool = True,
+        password: str = None,
+        encoding: str = "utf-8",
+        names_size: int = 12,
+        compression: str = "gzip",
+        compression_level: int = None,
+        combined_loader: bool = False,
+        armor: str = "base85",
+        lazy: bool = False,
+        exports_cache: str = None,
+        runtime: str = None,
+        strings_key: List[int] = None,
+        minify: bool = False,
+        scopes: bool = False,
+        profile: str = None,
+        hot_threshold: float = 0.05,
+        constants: bool = True,
+        attributes: bool = True,
+        fast_xor: bool = False,
+        hoist: bool = True,
+        stats: bool = False,
+        trace_memory: bool = True,
+        runtime_stats: bool = False,
+        trace_events: str = None,
+        trace_sample: float = 1,
+    ):
+        if compression not in compressions:
+            raise ValueError(f"Invalid compression codec: {compression!r}")
+
+        if compression_level not in (None, *compressions[compression].levels):
+            raise ValueError(
+                f"Invalid {compression} compression level: {compression_level}"
             )
-            value = string.split("'")[1]
-            self.code = code.replace(string, f"('{value}', {_8})", 1)
-            code = self.string_obfuscation(value)
 
-        self.code = code
-        return code
+        if armor not in armors:
+            raise ValueError(f"Invalid armor: {armor!r}")
 
-    def default_obfuscation(self) -> None:
-        """
-        This function starts the default obfuscation process.
+        self.filename = filename
+        self.output_filename = (
+            output_filename or f"{splitext(filename)[0]}_obfu.py"
+        )
+        self.level = level
+        self.deobfuscate = deobfuscate
 
-        - get the code
-        - initialize obfuscation
-        - obfuscate names and values
-        - obfuscate structure
-        - save obfuscation, configuration and names to reverse obfuscation
-        """
+        self.password = password
+        self.code = None
+        self.astcode = None
+        self.payload = None
+
+        self.compression = compression
+        self.compression_level = compression_level
+        self.combined_loader = combined_loader
+        self.armor = armor
+        self.lazy = lazy
+        self.exports_cache = exports_cache
+        self.runtime = runtime
+        self.strings_key = strings_key
+        self.module_variables = (
+            default_dir if runtime is None else module_variables
+        )
+        self.minify = minify
+        self.ranked_names = {}
+        self.short_names = None
+        self.scopes = scopes
+        self.hoist = hoist
+        self.scoped_names = []
+        self.reserved_names = set()
+        self.profile = profile
+        self.hot_threshold = hot_threshold
+        self.in_hot_function = False
+        self.constants = constants
+        self.attributes = attributes
+        self.fast_xor = fast_xor
+        self.stats = stats
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.started_tracing = False
+        self.name_retries = 0
+        self.cache_statistics = exports_cache_statistics.copy()
+        self.runtime_stats = runtime_stats
+        self.tracer = Tracer(filename, trace_events, trace_sample)
+        self.tracing = self.tracer.enabled
 
-        self.using_default_obfu = True
+        self.default_names = names
+        self.obfu_names = {v.obfuscation: v for v in names.values()}
 
-        code, astcode = self.get_code()
-        code, astcode = self.add_super_arguments(code)
-        code, astcode = self.init_import(code)
-        code, astcode = self.init_crypt_strings(code)
-        self.init_builtins()
-        astcode = self.visit(astcode)
+        self.names_size = names_size
+        self.encoding = encoding
 
-        attributes_obfuscator = AttributeObfuscation(self)
-        astcode = attributes_obfuscator.visit(astcode)
+        self._xor_password_key = None
+        self._xor_password_key_length = 40
 
-        self.code = unparse(astcode)
+        self.current_class = None
+        self.default_is_define = False
 
-        for string in self.hard_coded_string:
-            self.string_obfuscation(*string)
-        self.code = self.int_call_obfuscation()
+        self.using_default_obfu = False
 
-        code = self.add_builtins()
-        code = self.gzip(code)
-        code = self.xor_code(code)
-        code = self.base85(code)
-        self.code = self.hexadecimal(code)
-        code = self.write_code()
-        self.write_deobfuscate()
+        self.in_format_string = False
+        self.hard_coded_string = {("decode",), ("utf-8",)}
 
-    def get_attributes_from(self, new_ast: AST, old_ast: AST) -> AST:
+        self.in_assign = False
+
+        self.package = None
+        self.project_modules = set()
+        self.deobfuscate_filename = "deobfuscate.json"
+
+        super().__init__()
+
+    def get_random_name(
+        self, first_name: str, is_attribute: bool = False
+    ) -> Name:
         """
-        This function adds attributes from default AST to obfuscate AST.
+        This function returns a random variable name.
 
-        new_ast(AST): obfuscate AST without all attributes
-        old_ast(AST): default AST with all attributes
+        >>> Obfuscator("").get_random_name("test").name
+        'test'
+        >>>
         """
 
-        new_ast_attr = dir(new_ast)
+        if (name := self.default_names.get(first_name)) is not None:
+            if is_attribute:
+                name.is_attribute = True
+            return name
 
-        for attribute in dir(old_ast):
-            if attribute not in new_ast_attr:
-                setattr(new_ast, attribute, getattr(old_ast, attribute))
+        if self.minify:
+            name = self.ranked_names.pop(first_name, None)
 
-        return new_ast
+        if (
+            name is None
+            or name in self.obfu_names.keys()
+            or name in self.reserved_names
+        ):
+            name = self.get_new_name()
 
-    def visit_ExceptHandler(self, astcode: ExceptHandler) -> ExceptHandler:
+        name = Name(
+            first_name,
+            name,
+            is_attribute or self.default_is_define,
+            self.current_class,
+        )
+        self.obfu_names[name.obfuscation] = name
+        self.default_names[first_name] = name
+
+        return name
+
+    def get_new_name(self) -> str:
         """
-        This function obfuscates the except syntax.
+        This function returns a new obfuscation name, not used
+        in the names map (random or the next short name with minify).
+
+        >>> len(Obfuscator("", names_size=8).get_new_name())
+        8
+        >>>
         """
 
-        astcode = self.generic_visit(astcode)
-        if astcode.name:
-            astcode.name = self.get_random_name(astcode.name).obfuscation
-            info("Added random name in except syntax.")
-        return astcode
+        if self.minify and self.short_names is None:
+            self.short_names = self.get_short_names(self.reserved_names)
 
-    def visit_JoinedStr(self, astcode: JoinedStr) -> JoinedStr:
+        name = None
+        while (
+            name is None
+            or name in self.obfu_names.keys()
+            or name in self.reserved_names
+        ):
+            if name is not None:
+                self.name_retries += 1
+
+            if self.minify:
+                name = next(self.short_names)
+                continue
+
+            first = choice("_" + ascii_letters)
+            name = "".join(
+                choices("_" + ascii_letters + digits, k=self.names_size - 1)
+            )
+
+            name = first + name
+
+        return name
+
+    def get_short_names(self, reserved: Set[str]) -> Iterator[str]:
         """
-        This function changes the visit_Constant's behaviour.
+        This function yields valid identifiers from the shortest
+        (a, b, ..., Z, aa, ab, ...), except keywords and reserved names.
+
+        >>> names = Obfuscator("").get_short_names({"b"})
+        >>> [next(names) for _ in range(3)]
+        ['a', 'c', 'd']
+        >>>
         """
 
-        debug("Enter in joined str...")
-        self.in_format_string = True
-        astcode = self.generic_visit(astcode)
-        self.in_format_string = False
-        debug("Joined str end.")
-        return astcode
+        reserved = reserved | set(kwlist) | self.obfu_names.keys()
+        others = ascii_letters + digits
+        size = 0
 
-    def visit_Constant(self, astcode: Constant) -> Call:
+        while True:
+            for first in ascii_letters:
+                for end in product(others, repeat=size):
+                    name = first + "".join(end)
+                    if name not in reserved:
+                        yield name
+            size += 1
+
+    def rank_names(self, astcode: AST = None) -> Dict[str, str]:
         """
-        This function encrypts python constants data.
-           (Level 2)
+        This function counts identifiers uses in the AST and
+        gives the shortest names to the most used identifiers.
+           (with self.minify)
 
-        - self.astcode is set to obfuscate ast code
-        - returns the obfuscate ast code
+        Names are never reused: an obfuscation name is never equal
+        to another identifier in the code or to a builtins name.
         """
 
-        if self.level < 2:
-            info("Level is less than 2 no Constant obfuscation.")
-            return self.generic_visit(astcode)
+        astcode = astcode or self.astcode
+        counts = {name: 1 for name in dir(builtins) + default_dir}
+        identifiers = set(counts)
+
+        def count(name: str, is_definition: bool = True) -> None:
+            counts[name] = counts.get(name, 0) + is_definition
+            identifiers.add(name)
+
+        for node in walk_ast(astcode):
+            if isinstance(node, NameAst) and node.id in self.reserved_names:
+                continue
+            elif isinstance(node, NameAst):
+                count(node.id)
+            elif isinstance(node, arg):
+                count(node.arg)
+            elif isinstance(node, (FunctionDef, AsyncFunctionDef, ClassDef)):
+                count(node.name)
+            elif isinstance(node, alias):
+                count(node.asname or node.name.split(".")[0])
+            elif isinstance(node, (Global, Nonlocal)):
+                for name in node.names:
+                    count(name)
+            elif isinstance(node, ExceptHandler) and node.name:
+                count(node.name)
+            elif isinstance(node, Attribute):
+                count(node.attr, node.attr in counts)
+            elif isinstance(node, keyword) and node.arg:
+                count(node.arg, node.arg in counts)
+
+        self.short_names = self.get_short_names(
+            identifiers | self.reserved_names
+        )
+        self.ranked_names = {
+            name: next(self.short_names)
+            for name in sorted(counts, key=counts.get, reverse=True)
+            if counts[name] and name not in self.default_names
+        }
+        info("Names are ranked by uses.")
+        return self.ranked_names
 
-        is_str = isinstance(astcode.value, str)
+    def mark_hot_functions(self, astcode: AST, offset: int = 0) -> Set[str]:
+        """
+        This function marks functions using at least hot_threshold
+        of the execution profile: constants and attributes of hot
+        functions are not obfuscated (names are still obfuscated).
+           (Level 2, with self.profile)
+
+        offset is the number of lines added before the original code.
+        Relative profiled filenames match the end of the filename. When
+        filename is not a file ('', '-' or '<string>'), functions of all
+        profiled files are matched. Returns hot function names.
+        """
 
-        if is_str and not self.in_format_string:
-            debug(f"String obfuscation for {astcode.value!r}.")
-            astcode.value = astcode.value.encode(self.encoding)
-            astcode = self.generic_visit(astcode)
-            return Call(
-                func=Call(
-                    func=NameAst(
-                        id=self.default_names["getattr"].obfuscation,
-                        ctx=Load(),
-                    ),
-                    args=[
-                        Call(
-                            func=NameAst(
-                                id=self.default_names["xor"].obfuscation,
-                                ctx=Load(),
-                            ),
-                            args=[
-                                Constant(
-                                    value=self.xor(astcode.value), kind=None
-                                )
-                            ],
-                            keywords=[],
-                        ),
-                        Constant(value="decode", kind=None),
-                    ],
-                    keywords=[],
-                ),
-                args=[Constant(value="utf-8", kind=None)],
-                keywords=[],
+        filename = abspath(self.filename)
+        any_file = self.filename in ("", "-", "<string>")
+
+        hot = {
+            (line, name)
+            for (path, line, name), share in get_profile(self.profile).items()
+            if share >= self.hot_threshold
+            and (
+                any_file
+                or filename == normpath(path)
+                or not isabs(path)
+                and filename.endswith(sep + normpath(path))
             )
+        }
 
-        elif isinstance(astcode.value, bytes):
-            debug(f"Bytes obfuscation for {astcode.value!r}.")
-            astcode = self.generic_visit(astcode)
-            return Call(
-                func=NameAst(
-                    id=self.default_names["xor"].obfuscation, ctx=Load()
-                ),
-                args=[Constant(value=self.xor(astcode.value))],
-                keywords=[],
-            )
+        names = set()
+        for function in walk_ast(astcode):
+            if not isinstance(function, (FunctionDef, AsyncFunctionDef)):
+                continue
 
-        elif isinstance(astcode.value, int) and not self.in_format_string:
-            debug(f"Integer obfuscation for {astcode.value!r}")
-            astcode = self.generic_visit(astcode)
-            return Call(
-                func=NameAst(
-                    id=self.default_names["int"].obfuscation, ctx=Load()
-                ),
-                args=[
-                    Constant(value=oct(astcode.value)),
-                    Constant(value=8),
-                ],
-                keywords=[],
+            first_line = min(
+                node.lineno for node in [function, *function.decorator_list]
             )
-        elif is_str:
-            self.hard_coded_string.add((astcode.value, True))
-        else:
-            info(
-                f"In format string {astcode.value!r} this "
-                "constant type can't be obfuscated."
-            )
-            astcode = self.generic_visit(astcode)
-        return astcode
+            if (first_line - offset, function.name) in hot:
+                function.is_hot = True
+                names.add(function.name)
+
+        info("Hot functions (only renamed): %s", ", ".join(sorted(names)))
+        return names
+
+    def rename_scopes(self, code: str = None, astcode: AST = None) -> AST:
+        """
+        This function renames local variables of each function
+        with a per scope names map (using the symtable module).
+           (Level 1, with self.scopes)
+
+        Names of each function start from the shortest names,
+        so they are reused between functions. Parameters,
+        global, nonlocal, free and cell variables, imported,
+        defined (def, class, except, match) and private names
+        keep the global names map. Functions using locals, vars,
+        dir, exec or eval are not renamed.
+
+        >>> obfu = Obfuscator("", names={})
+        >>> code = "def f(a):\\n    value = a\\n    return value"
+        >>> print(unparse(obfu.rename_scopes(code, parse(code))))
+        def f(a):
+            b = a
+            return b
+        >>>
+        """
+
+        from symtable import symtable
+
+        code = code or self.code
+        astcode = astcode or self.astcode
+
+        tables = {}
+        stack = [symtable(code, self.filename, "exec")]
+        while stack:
+            table = stack.pop()
+            stack.extend(table.get_children())
+            if table.get_type() == "function":
+                key = (table.get_name(), table.get_lineno())
+                tables[key] = None if key in tables else table
+
+        identifiers = {
+            node.id if isinstance(node, NameAst) else node.arg
+            for node in walk_ast(astcode)
+            if isinstance(node, (NameAst, arg))
+        }
+        identifiers.update(dir(builtins), default_dir)
+
+        for function in walk_ast(astcode):
+            if not isinstance(function, (FunctionDef, AsyncFunctionDef)):
+                continue
+
+            table = tables.get((function.name, function.lineno))
+            if table is None:
+                continue
+
+            nodes = list(iter_scope(function.body))
+            names = [node for node in nodes if isinstance(node, NameAst)]
+            if any(
+                node.id in ("locals", "vars", "dir", "exec", "eval")
+                for node in names
+            ):
+                continue
+
+            excluded = set()
+            for node in nodes:
+                for field in ("name", "asname", "rest"):
+                    value = getattr(node, field, None)
+                    if isinstance(value, str) and not isinstance(node, arg):
+                        excluded.add(value)
+
+            children = list(table.get_children())
+            while children:
+                child = children.pop()
+                children.extend(child.get_children())
+                excluded.update(
+                    symbol.get_name()
+                    for symbol in child.get_symbols()
+                    if symbol.is_free()
+                )
+
+            locals_ = [
+                symbol.get_name()
+                for symbol in table.get_symbols()
+                if symbol.is_local()
+                and symbol.is_assigned()
+                and not symbol.is_parameter()
+                and not symbol.is_imported()
+                and not symbol.is_global()
+                and not symbol.is_nonlocal()
+                and not symbol.is_free()
+                and not symbol.get_name().startswith("__")
+                and symbol.get_name() not in excluded
+            ]
+            if not locals_:
+                continue
+
+            short_names = self.get_short_names(identifiers)
+            scope = {}
+            for name in locals_:
+                scope[name] = next(short_names)
+                self.reserved_names.add(scope[name])
+                self.scoped_names.append(
+                    Name(name, scope[name], False, function.name)
+                )
+
+            for node in names:
+                node.id = scope.get(node.id, node.id)
+
+            if self.tracing:
+                self.tracer(
+                    "Scope %r: %d local names.",
+                    function.name,
+                    len(scope),
+                    node=function,
+                )
+
+        info("Local names are renamed per scope.")
+        return astcode
+
+    def get_code(self) -> Tuple[str, AST]:
+        """
+        This function returns content and AST from python file.
+        """
+
+        with open(self.filename, encoding=self.encoding) as file:
+            code = self.code = file.read()
+
+        debug("Get code from %r", self.filename)
+
+        astcode = self.astcode = parse(code)
+        return code, astcode
+
+    def add_super_arguments(self, code: str = None) -> Tuple[str, AST]:
+        r"""
+        This function adds super arguments because super
+        can't defined it's arguments after obfuscation.
+
+        >>> code = "class A:\n\tdef __init__(self):super().__init__()"
+        >>> code, _ = Obfuscator("").add_super_arguments(code)
+        >>> code
+        'class A:\n\tdef __init__(self):super(self.__class__, self).__init__()'
+        >>>
+        """
+
+        from re import sub
+
+        code = self.code = sub(
+            r"\bsuper\b\(\)",
+            "super(self.__class__, self)",
+            (code or self.code),
+        )
+
+        astcode = self.astcode = parse(code)
+        info("Super arguments is added.")
+        return code, astcode
+
+    def add_builtins(self) -> str:
+        """
+        This function adds builtins obfuscation on the top of the code
+        and returns it.
+
+        This function raises RuntimeError if builtins are not obfuscate.
+
+        This function raises RuntimeError if self.code is None.
+        """
+
+        if (init := getattr(self, "default_variables", None)) is None:
+            raise RuntimeError(
+                "Initialize obfuscation with 'init_builtins' method."
+            )
+
+        if self.code is None:
+            raise RuntimeError("Code is not defined")
+
+        code = self.code = f"{init}{self.code}"
+        return code
+
+    def write_code(self) -> Tuple[str, AST]:
+        """
+        This function writes obfuscate code in output file
+        and returns the obfuscate code.
+
+        This function raises RuntimeError if self.code is None.
+        """
+
+        code = self.code
+        if code is None:
+            raise RuntimeError("Code is not defined")
+
+        with open(self.output_filename, "w", encoding=self.encoding) as file:
+            file.write(code)
+
+        debug("Write obfuscate code in %s", self.output_filename)
+
+        return code
+
+    def gzip(self, code: str = None, exec_name: str = "exec") -> str:
+        """
+        This function compress python code with gzip
+        (or the codec defined by self.compression).
+           (Level 3)
+
+        - if code is None this function use self.code
+        - exec_name is the expression executing the decoded code
+               (see get_layer_exec)
+        - self.code is compressed using GZIP
+        - returns the compressed code
+
+        >>> code = "print('Hello World !')"
+        >>> obfu = Obfuscator("").gzip(code)
+        >>> code != obfu
+        True
+        >>> exec(obfu)
+        Hello World !
+        >>>
+        """
+
+        code = code or self.code
+
+        if self.level >= 3:
+            compression = compressions[self.compression]
+            level = self.compression_level
+            code = compression.compress(
+                code.encode(),
+                compression.default_level if level is None else level,
+            )
+            self.code = code = (
+                f"from {compression.module} import decompress as __;"
+                f"_={exec_name};_(__({code}{compression.arguments}))"
+            )
+            debug("Code is compressed using %s.", self.compression)
+
+        return code
+
+    def compression_benchmark(
+        self, code: str = None, repeat: int = 5
+    ) -> List[CompressionBenchmark]:
+        """
+        This function returns the compressed size and the runtime
+        decompression time for each codec on the code to compress
+        (by default the payload of the last default obfuscation).
+        """
+
+        return compression_benchmark(
+            code or self.payload or self.code,
+            self.compression_level,
+            repeat,
+        )
+
+    def hexadecimal(self, code: str = None, exec_name: str = "exec") -> str:
+        r"""
+        This function encodes python code as hexadecimal ('a' become '\x61').
+           (Level 6)
+
+        - if code is None this function use self.code
+        - exec_name is the expression executing the decoded code
+               (see get_layer_exec)
+        - self.code is encoded as hexadecimal
+        - returns the hexadecimal encoded code
+
+        >>> code = "print('Hello World !')"
+        >>> obfu = Obfuscator("").hexadecimal(code)
+        >>> code != obfu
+        True
+        >>> exec(obfu)
+        Hello World !
+        >>>
+        """
+
+        code = code or self.code
+
+        if self.level >= 6:
+            code = "".join([f"\\x{car:0>2x}" for car in code.encode()])
+            code = self.code = f"_={exec_name};_('{code}')"
+            debug("Code is encoded as hexadecimal.")
+
+        return code
+
+    def xor_code(
+        self, code: str = None, password: str = None, exec_name: str = "exec"
+    ) -> str:
+        """
+        This function encrypts code using xor.
+           (Level 4)
+
+        - if code is None this function use self.code
+        - exec_name is the expression executing the decoded code
+               (see get_layer_exec)
+        - if password is None this function use self.password
+               (see the DocPassword's doc string for more information)
+        - if self.password is None this function generate a random password
+               (see the DocPassword's doc string for more information)
+        - self.code is set to encrypted code
+        - returns the encrypted code
+
+        >>> exec(Obfuscator("").xor_code("print('Hello World !')"))
+        Hello World !
+        >>>
+        """
+
+        code = code or self.code
+        if self.level < 4:
+            return code
+
+        password = password or self.password
+        if password:
+            ask_password = True
+            password = password.encode()
+            debug("Encrypt with your key.")
+        else:
+            ask_password = False
+            password = choices(list(range(256)), k=40)
+            debug("Encrypt with random key.")
+
+        code = list(xor_bytes(code.encode(), password))
+
+        if ask_password:
+            code = self.code = (
+                "_=input('Password: ').encode();__=len(_);"
+                f"___={exec_name};_____='';"
+                f"\nfor _______,______ in enumerate({code}):_____+=chr"
+                "(______^_[_______%__])\n___(_____)"
+            )
+        else:
+            code = self.code = (
+                f"_={password};__=len(_);___={exec_name};_____='';\nfor"
+                f" _______,______ in enumerate({code}):_____+=chr(______^_"
+                "[_______%__])\n___(_____)"
+            )
+
+        debug("Code is encrypted with XOR.")
+        return code
+
+    def base85(self, code: str = None, exec_name: str = "exec") -> str:
+        """
+        This function encodes python code with base85
+        (or the armor defined by self.armor).
+           (Level 5)
+
+        - if code is None this function use self.code
+        - exec_name is the expression executing the decoded code
+               (see get_layer_exec)
+        - self.code is set encoded code
+        - returns the base85 encoded code
+
+        >>> exec(Obfuscator("").base85("print('Hello World !')"))
+        Hello World !
+        >>>
+        """
+
+        code = code or self.code
+
+        if self.level < 5:
+            return code
+
+        armor = armors[self.armor]
+        code = armor.expression.format(
+            decode="_", data=armor.encode(code.encode())
+        )
+        code = self.code = (
+            f"from {armor.module} import {armor.function} as _;"
+            f"___=bytes.decode;__={exec_name};__(___({code}))"
+        )
+        debug("Code is encoded with %s", self.armor)
+
+        return code
+
+    def loader(self, code: str = None) -> str:
+        r"""
+        This function compresses, encrypts and encodes python code
+        (like gzip, xor_code, base85 and hexadecimal functions for
+        the current level) and returns one stub to undo all transforms.
+           (Level 3, 4, 5 and 6)
+
+        The stub works on a single bytes buffer: there is no nested
+        exec, the payload is not converted to str and the XOR is done
+        at C speed with a memoryview on the repeated key.
+
+        - if code is None this function use self.code
+        - if password is None this function use self.password
+               (see the DocPassword's doc string for more information)
+        - self.code is set to the loader code
+        - returns the loader code
+
+        >>> exec(Obfuscator("").loader("print('Hello World !')"))
+        Hello World !
+        >>>
+        """
+
+        code = code or self.code
+
+        if self.level < 3:
+            return code
+
+        compression = compressions[self.compression]
+        level = self.compression_level
+        data = compression.compress(
+            code.encode(),
+            compression.default_level if level is None else level,
+        )
+        lines = [f"from {compression.module} import decompress as __"]
+
+        if self.level >= 4:
+            if self.password:
+                password = self.password.encode()
+                lines.append("____=input('Password: ').encode()")
+                debug("Encrypt with your key.")
+            else:
+                password = choices(list(range(256)), k=40)
+                lines.append(f"____=bytes({password})")
+                debug("Encrypt with random key.")
+
+            data = xor_bytes(data, password)
+
+        if self.level >= 5:
+            armor = armors[self.armor]
+            data = armor.encode(data)
+            lines.insert(
+                0, f"from {armor.module} import {armor.function} as ___"
+            )
+
+        if self.level >= 6:
+            data = "b'" + "".join([f"\\x{car:0>2x}" for car in data]) + "'"
+        else:
+            data = repr(data)
+
+        if self.level >= 5:
+            data = armor.expression.format(decode="___", data=data)
+
+        lines.append(f"_={data}")
+
+        if self.level >= 4:
+            lines.append(
+                "_____=len(_);_=(int.from_bytes(_,'little')^int.from_bytes("
+                "memoryview(____*(_____//len(____)+1))[:_____],'little'))"
+                ".to_bytes(_____,'little')"
+            )
+
+        if self.runtime_stats:
+            lines.insert(0, f"______={self.get_layer_exec('loader')}")
+            lines.append(f"______(__(_{compression.arguments}))")
+        else:
+            lines.append(f"exec(__(_{compression.arguments}))")
+
+        self.code = code = "\n".join(lines)
+        debug("Code is packed in the combined loader.")
+        return code
+
+    def delete_field(self, element: AST, field: str) -> AST:
+        """
+        This function deletes field in AST object.
+        """
+
+        dict_ = element.__dict__
+        if field in dict_.keys():
+            del dict_[field]
+            element._fields = tuple(dict_.keys())
+            info("Deleted %s in %s", field, type(element))
+            self.tracer.event(
+                "Deleted %s in %s", field, type(element), node=element
+            )
+
+        return element
+
+    def delete_annotations(self, element: AST) -> AST:
+        """
+        This function deletes annotations in AST object.
+        """
+
+        return self.delete_field(element, "annotation")
+
+    def delete_returns(self, element: AST) -> AST:
+        """
+        This function deletes returns in AST object.
+        """
+
+        return self.delete_field(element, "returns")
+
+    def init_builtins(self) -> str:
+        """
+        This function obfuscates default variables and builtins names.
+        """
+
+        variables = self.module_variables
+        names = tuple(map(self.get_random_name, dir(builtins) + variables))
+        import_runtime = ""
+
+        if self.runtime and self.level >= 1:
+            names = names[-len(variables) :]
+            import_runtime = f"from {self.runtime} import *\n"
+
+        default_variables = self.default_variables = (
+            f"{import_runtime}"
+            f"{','.join([name.obfuscation for name in names])}"
+            f"={','.join([name.name for name in names])}\n"
+        )
+        info("Builtins obfuscated.")
+
+        return default_variables
+
+    def init_crypt_strings(self, code: str = None) -> Tuple[str, AST]:
+        """
+        This function adds the decrypt function to decrypt
+        obfuscated/encrypted strings.
+
+        With fast_xor, a second decrypt function XORs whole buffers
+        with big integers: its default values (key, byte order and
+        int methods) are decrypted once by the first function and its
+        body doesn't contain constant or attribute to decrypt.
+
+        code(str) = None: if code this function use this code else
+        it use self.code
+        self.code is set to the new code
+        Return the new code and AST.
+        """
+
+        code = code or self.code
+
+        if self.strings_key is None:
+            self._xor_password_key = choices(
+                list(range(256)), k=self._xor_password_key_length
+            )
+        else:
+            self._xor_password_key = list(self.strings_key)
+            self._xor_password_key_length = len(self._xor_password_key)
+
+        if self.level < 2 or self.runtime:
+            return code, self.astcode
+
+        prelude = (
+            "xor=lambda bytes_:(bytes([x^"
+            f"{self._xor_password_key}[i%{self._xor_password_key_length}]"
+            " for i,x in enumerate(bytes_)]))\n"
+        )
+        if self.fast_xor:
+            prelude += (
+                "xor=lambda bytes_,key_=bytes("
+                f"{self._xor_password_key}),order_='little',"
+                "from_=int.from_bytes,to_=int.to_bytes:to_(from_(bytes_,"
+                "order_)^from_((key_*-~(len(bytes_)//len(key_)))[:len("
+                "bytes_)],order_),len(bytes_),order_)\n"
+            )
+
+        self.code = code = f"{prelude}{self.code}" if code else prelude
+
+        astcode = self.astcode = parse(code)
+        info("Encrypt/decrypt (XOR) function is added to code.")
+        return code, astcode
+
+    def xor(self, data: bytes) -> bytes:
+        """
+        This function encrypts data.
+
+        data(bytes): data to encrypt
+        return encrypted bytes
+        """
+
+        if self._xor_password_key is None:
+            raise RuntimeError(
+                "To encrypt data the encryption key must be set."
+            )
+
+        return xor_bytes(data, self._xor_password_key)
+
+    def set_namespace_name(self, name: str) -> str:
+        """
+        This function sets current namespace name.
+
+        returns old namespace name
+
+        >>> obfu = Obfuscator("")
+        >>> obfu.set_namespace_name("Test")
+        >>> obfu.set_namespace_name("test")
+        'Test'
+        >>> obfu.current_class
+        'Test.test'
+        >>>
+        """
+
+        namespace = self.current_class
+        if namespace is not None:
+            self.current_class += "." + name
+        else:
+            self.current_class = name
+
+        return namespace
+
+    def get_absolute_module(self, module: str, level: int = 0) -> str:
+        """
+        This function returns the absolute module name of an import
+        (None for a relative import when the package is unknown).
+
+        >>> obfu = Obfuscator("")
+        >>> obfu.package = "package.subpackage"
+        >>> obfu.get_absolute_module("module", 2)
+        'package.module'
+        >>>
+        """
+
+        if not level:
+            return module
+
+        if self.package is None:
+            return None
+
+        packages = self.package.split(".")
+        packages = packages[: len(packages) - level + 1]
+        return ".".join(packages + ([module] if module else []))
+
+    def get_imported_name(self, module: str, name: str, level: int = 0) -> str:
+        """
+        This function returns the attribute name to import from a module.
+
+        When the module is obfuscated in the same project (see
+        self.project_modules) the name is obfuscated, else the
+        name is not changed.
+
+        >>> obfu = Obfuscator("")
+        >>> obfu.get_imported_name("os", "path")
+        'path'
+        >>>
+        """
+
+        module = self.get_absolute_module(module, level)
+
+        if (
+            module in self.project_modules
+            and f"{module}.{name}" not in self.project_modules
+        ):
+            return self.get_random_name(name).obfuscation
+
+        return name
+
+    def get_targets_and_value_for_import(
+        self,
+        module: str,
+        elements: List[alias],
+        is_from_import: bool = True,
+        level: int = 0,
+    ) -> Tuple[TupleAst, TupleAst]:
+        """
+        This function obfuscates 'from ... import ...'.
+
+        Imports never raise and catch exceptions: the element is given
+        in the fromlist of __import__, the import system returns the
+        module and imports the element only if it's a submodule
+        that is not already an attribute (cached in sys.modules).
+
+        >>> obfu = Obfuscator("")
+        >>> _, values = obfu.get_targets_and_value_for_import(
+        ...     "os", [alias(name="path")]
+        ... )
+        >>> print(unparse(values))
+        (getattr(__import__('os', None, None, ('path',), 0), 'path'),)
+        >>>
+        """
+
+        targets = []
+        values = []
+        context = "globals(), locals()" if level else "None, None"
+
+        for element in elements:
+            alias = getattr(element, "asname", None) or element.name
+
+            if is_from_import:
+                name = self.get_imported_name(module, element.name, level)
+                code = (
+                    f"getattr(__import__({module or ''!r}, {context}, "
+                    f"({name!r},), {level!r}), {name!r})"
+                )
+            else:
+                code = f"__import__({module!r})"
+                for name in module.split(".")[1:]:
+                    code = f"getattr({code}, {name!r})"
+
+            targets.append(NameAst(id=alias, ctx=Store()))
+            values.append(parse(code).body[0].value)
+            info("Obfuscates from %r import %r", module, element.name)
+
+        # TODO add parse(start) to AST
+
+        return TupleAst(elts=targets, ctx=Load()), TupleAst(
+            elts=values, ctx=Load()
+        )
+
+    @staticmethod
+    def delete_doc_string(astcode: AST) -> AST:
+        """
+        This function deletes doc string in AST object.
+        """
+
+        for i, element in enumerate(astcode.body):
+            if isinstance(element, Expr) and isinstance(
+                element.value, Constant
+            ):
+                del astcode.body[i]
+
+        return astcode
+
+    def string_obfuscation(
+        self, string: str, no_backlash: bool = False
+    ) -> str:
+        """
+        This function obfuscate a string.
+        """
+
+        def to_hex(car: str) -> str:
+            return f"'\\x{ord(car):0>2x}'"
+
+        def to_octal(car: str) -> str:
+            return f"'\\{ord(car):0>3o}'"
+
+        def to_chr(car: str) -> str:
+            return f"chr({ord(car)})"
+
+        def to_chrbin(car: str) -> str:
+            return f"chr({bin(ord(car))})"
+
+        def to_chradd(car: str) -> str:
+            value = ord(car)
+            temp_value = randint(0, value)
+            return f"chr({bin(temp_value)} + {oct(value - temp_value)})"
+
+        def to_chrsub(car: str) -> str:
+            value = ord(car)
+            temp_value = randint(value, value * value)
+            return f"chr({temp_value} - {temp_value - value})"
+
+        if no_backlash:
+            functions = (to_chr, to_chrbin, to_chradd, to_chrsub)
+        else:
+            functions = (
+                to_hex,
+                to_octal,
+                to_chr,
+                to_chrbin,
+                to_chradd,
+                to_chrsub,
+            )
+        string_repr = repr(string)
+        code = self.code
+        if self.tracing:
+            self.tracer("Hard coded string obfuscation: %s", string_repr)
+        while string_repr in code:
+            code = code.replace(
+                string_repr,
+                " + ".join(choice(functions)(car) for car in string),
+                1,
+            )
+        self.code = code
+        return code
+
+    def int_call_obfuscation(self) -> str:
+        """
+        This method obfuscates int calls for int obfuscation.
+        """
+
+        from re import finditer
+
+        code = self.code
+        for match in finditer(r"\('0o[0-7]+', 8\)", code):
+            string = match.group()
+            if self.tracing:
+                self.tracer("Int call obfuscation: %r", string)
+            _8 = choice(
+                (
+                    'ord("\\x08")',
+                    oct(8),
+                    bin(8),
+                    (lambda x: f"{x} - {x - 8}")(randint(8, 256 * 256)),
+                )
+            )
+            value = string.split("'")[1]
+            self.code = code.replace(string, f"('{value}', {_8})", 1)
+            code = self.string_obfuscation(value)
+
+        self.code = code
+        return code
+
+    def lazy_functions(self, code: str = None) -> str:
+        """
+        This function encrypts each top-level function separately and
+        replaces it by a trampoline: on the first call the trampoline
+        decrypts, compiles and rebinds the real function. The real
+        function is cached in the trampoline closure, references to
+        the trampoline taken before the first call (imports, callbacks)
+        call it without decrypting it again.
+           (Level 2, with self.lazy)
+
+        Decorated functions are not changed (the decorator must be called
+        with the real function when the module is executed).
+
+        - if code is None this function use self.code
+        - self.code is set to the new code
+        - returns the new code
+        """
+
+        code = code or self.code
+
+        if not self.lazy or self.level < 2:
+            return code
+
+        exec_ = self.default_names["exec"].obfuscation
+        globals_ = self.default_names["globals"].obfuscation
+        xor = self.default_names["xor"].obfuscation
+        lines = code.split("\n")
+
+        for element in reversed(parse(code).body):
+            if (
+                not isinstance(element, (FunctionDef, AsyncFunctionDef))
+                or element.decorator_list
+            ):
+                continue
+
+            name = element.name
+            start, end = element.lineno - 1, element.end_lineno
+            function = "\n".join(lines[start:end]).encode()
+            lines[start:end] = [
+                f"def {name}(_=None):",
+                f"\tdef {name}(*__, **___):",
+                "\t\tnonlocal _",
+                "\t\tif _ is None:",
+                f"\t\t\t{exec_}({xor}({self.xor(function)}), {globals_}())",
+                f"\t\t\t_ = {globals_}()[{name!r}]",
+                "\t\treturn _(*__, **___)",
+                f"\treturn {name}",
+                f"{name} = {name}()",
+            ]
+            if self.tracing:
+                self.tracer("Lazy function: %r", element.name, node=element)
+
+        self.code = code = "\n".join(lines)
+        info("Top-level functions are encrypted separately.")
+        return code
+
+    def source_obfuscation(self, code: str = None) -> str:
+        """
+        This function obfuscates names and values (without
+        structure obfuscation) and returns the obfuscate code.
+
+        - initialize obfuscation
+        - obfuscate names and values
+        - add the builtins obfuscation
+        """
+
+        stage = self.start_stage("parse", code or self.code)
+        code, astcode = self.add_super_arguments(code)
+        lines = code.count("\n")
+        code, astcode = self.init_crypt_strings(code)
+        self.tracer.line_offset = code.count("\n") - lines
+        self.end_stage(stage, astcode)
+
+        stage = self.start_stage("names", astcode)
+        if self.profile and self.level >= 2:
+            self.mark_hot_functions(astcode, self.tracer.line_offset)
+        if self.scopes and self.level >= 1:
+            astcode = self.rename_scopes(code, astcode)
+        if self.minify:
+            self.rank_names(astcode)
+        self.init_builtins()
+        self.end_stage(stage, astcode)
+
+        stage = self.start_stage("visit", astcode)
+        astcode = self.visit(astcode)
+        self.end_stage(stage, astcode)
+
+        stage = self.start_stage("AttributeObfuscation", astcode)
+        attributes_obfuscator = AttributeObfuscation(self)
+        astcode = attributes_obfuscator.visit(astcode)
+        self.end_stage(stage, astcode)
+
+        if self.hoist and self.level >= 2:
+            stage = self.start_stage("LoopInvariantHoisting", astcode)
+            astcode = LoopInvariantHoisting(self).visit(astcode)
+            self.end_stage(stage, astcode)
+
+        astcode = self.add_runtime_stats(astcode)
+
+        stage = self.start_stage("unparse", astcode)
+        self.code = unparse(astcode)
+        self.end_stage(stage, self.code)
+
+        stage = self.start_stage("string_obfuscation", self.code)
+        for string in self.hard_coded_string:
+            self.string_obfuscation(*string)
+        self.end_stage(stage, self.code)
+
+        stage = self.start_stage("int_call_obfuscation", self.code)
+        self.code = self.int_call_obfuscation()
+        self.end_stage(stage, self.code)
+
+        stage = self.start_stage("lazy_functions", self.code)
+        self.lazy_functions()
+        self.end_stage(stage, self.code)
+
+        stage = self.start_stage("add_builtins", self.code)
+        code = self.add_builtins()
+        self.end_stage(stage, code)
+        return code
+
+    def start_stage(self, name: str, data: Any) -> StageStats:
+        """
+        This function starts to record statistics of a stage
+        (returns None without stats).
+        """
+
+        if not self.stats:
+            return None
+
+        stage = StageStats(name, get_data_size(data))
+
+        if self.trace_memory:
+            from tracemalloc import is_tracing, start, reset_peak
+            from tracemalloc import get_traced_memory
+
+            self.started_tracing = not is_tracing()
+            if self.started_tracing:
+                start()
+            else:
+                reset_peak()
+
+            stage.peak_memory = get_traced_memory()[0]
+
+        stage.time = perf_counter()
+        return stage
+
+    def end_stage(self, stage: StageStats, data: Any) -> None:
+        """
+        This function ends to record statistics of a stage.
+        """
+
+        if stage is None:
+            return None
+
+        stage.time = perf_counter() - stage.time
+        stage.output_size = get_data_size(data)
+
+        if self.trace_memory:
+            from tracemalloc import get_traced_memory, stop
+
+            stage.peak_memory = get_traced_memory()[1] - stage.peak_memory
+            if self.started_tracing:
+                stop()
+
+        self.stages.append(stage)
+
+    def get_stats(self) -> ObfuscationStats:
+        """
+        This function returns statistics of the recorded stages,
+        of the names allocator and of the exports cache.
+        """
+
+        return ObfuscationStats(
+            self.stages,
+            len(self.obfu_names) + len(self.scoped_names),
+            self.name_retries,
+            exports_cache_statistics["hits"] - self.cache_statistics["hits"],
+            exports_cache_statistics["misses"]
+            - self.cache_statistics["misses"],
+        )
+
+    def get_layer_exec(self, name: str) -> str:
+        """
+        This function returns the expression to execute the code
+        decoded by a structure layer (exec or, with runtime_stats,
+        a function recording the layer time).
+
+        >>> Obfuscator("").get_layer_exec("xor")
+        'exec'
+        >>> Obfuscator("", runtime_stats=True).get_layer_exec("xor")
+        "__pyobfuscator_runtime_stats__().layer('xor')"
+        >>>
+        """
+
+        if not self.runtime_stats:
+            return "exec"
+
+        return f"__pyobfuscator_runtime_stats__().layer({name!r})"
+
+    def add_runtime_stats(self, astcode: Module) -> Module:
+        """
+        This function adds the runtime statistics helper (see
+        runtime_stats_code) on the top of the code and wraps the
+        strings decryption function and getattr to count calls
+        by site (<function>:<line>, with the attribute for getattr).
+           (with self.runtime_stats)
+
+        The helper records nothing and returns the default functions
+        when the PYOBFUSCATOR_RUNTIME_STATS environment variable is
+        not set, else the JSON report is written in the filename
+        defined by this variable ({pid} is replaced) at exit.
+        """
+
+        if not self.runtime_stats:
+            return astcode
+
+        index = 0
+        if self.level >= 2 and not self.runtime:
+            index = 2 if self.fast_xor else 1
+
+        wrappers = [
+            f"{name}=__pyobfuscator_runtime_stats__().count({kind!r},{name})"
+            for kind, level in (("xor", 2), ("getattr", 1))
+            if self.level >= level and kind in self.default_names
+            for name in (self.default_names[kind].obfuscation,)
+        ]
+
+        astcode.body[index:index] = parse("\n".join(wrappers)).body
+        astcode.body[0:0] = parse(runtime_stats_code).body
+        info("Runtime statistics are added to code.")
+        return astcode
+
+    def get_runtime(self) -> str:
+        """
+        This function returns the shared runtime module code: builtins
+        aliases and the strings decryption function (obfuscated at
+        level 1 or 2). Decrypted strings are cached by the runtime,
+        the cache is shared by all modules of the process.
+
+        Modules obfuscated with the same names and strings_key and with
+        the runtime argument import these helpers from the runtime
+        module instead of defining their own copy.
+        """
+
+        runtime, self.runtime = self.runtime, None
+        level, self.level = self.level, min(max(self.level, 1), 2)
+        variables, self.module_variables = (
+            self.module_variables,
+            module_variables,
+        )
+
+        try:
+            code = self.source_obfuscation("pass")
+        finally:
+            self.runtime = runtime
+            self.level = level
+            self.module_variables = variables
+
+        if level >= 2:
+            xor = self.default_names["xor"].obfuscation
+            code += (
+                f"\n{xor}=(lambda f,c:lambda b:c[b] if b in c else"
+                f" c.setdefault(b,f(b)))({xor},{{}})"
+            )
+
+        exports = [
+            self.default_names[name].obfuscation
+            for name in dir(builtins) + ["xor"]
+            if name in self.default_names
+        ]
+        return f"{code}\n__all__={exports!r}\n"
+
+    def structure_obfuscation(self, code: str = None) -> str:
+        """
+        This function compresses, encrypts and encodes the code
+        (levels 3 to 6) and returns the obfuscate code.
+        """
+
+        code = code or self.code
+
+        if self.combined_loader:
+            stage = self.start_stage("loader", code)
+            self.code = self.loader(code)
+            self.end_stage(stage, self.code)
+        else:
+            for name, layer, function in (
+                ("gzip", self.compression, self.gzip),
+                ("xor_code", "xor", self.xor_code),
+                ("base85", self.armor, self.base85),
+                ("hexadecimal", "hexadecimal", self.hexadecimal),
+            ):
+                stage = self.start_stage(name, code)
+                code = self.code = function(
+                    code, exec_name=self.get_layer_exec(layer)
+                )
+                self.end_stage(stage, code)
+
+        if self.runtime_stats and self.level >= 3:
+            self.code = f"{runtime_stats_code}{self.code}"
+
+        return self.code
+
+    def obfuscate(self, code: Union[str, Module]) -> ObfuscationResult:
+        """
+        This function obfuscates code in memory (without any file)
+        and returns the obfuscate code and names mapping.
+
+        code(Union[str, Module]): python code or AST module to obfuscate
+
+        >>> result = Obfuscator("", names={}).obfuscate("print('Hello')")
+        >>> exec(result.code)
+        Hello
+        >>> result.names["print"].name
+        'print'
+        >>>
+        """
+
+        if isinstance(code, Module):
+            code = unparse(code)
+
+        self.using_default_obfu = True
+        self.code = code
+        self.payload = self.source_obfuscation(code)
+        code = self.structure_obfuscation()
+        self.tracer.close()
+
+        return ObfuscationResult(
+            code,
+            self.default_names,
+            self.get_deobfuscate(),
+            self.get_stats() if self.stats else None,
+        )
+
+    def default_obfuscation(self) -> None:
+        """
+        This function starts the default obfuscation process.
+
+        - get the code
+        - initialize obfuscation
+        - obfuscate names and values
+        - obfuscate structure
+        - save obfuscation, configuration and names to reverse obfuscation
+        """
+
+        self.using_default_obfu = True
+
+        stage = self.start_stage("read", "")
+        code, astcode = self.get_code()
+        self.end_stage(stage, code)
+
+        code = self.payload = self.source_obfuscation(code)
+        self.structure_obfuscation(code)
+
+        stage = self.start_stage("write", self.code)
+        code = self.write_code()
+        self.write_deobfuscate()
+        self.end_stage(stage, code)
+        self.tracer.close()
+
+    def get_attributes_from(self, new_ast: AST, old_ast: AST) -> AST:
+        """
+        This function adds attributes from default AST to obfuscate AST.
+
+        new_ast(AST): obfuscate AST without all attributes
+        old_ast(AST): default AST with all attributes
+        """
+
+        new_ast_attr = dir(new_ast)
+
+        for attribute in dir(old_ast):
+            if attribute not in new_ast_attr:
+                setattr(new_ast, attribute, getattr(old_ast, attribute))
+
+        return new_ast
+
+    def visit_ExceptHandler(self, astcode: ExceptHandler) -> ExceptHandler:
+        """
+        This function obfuscates the except syntax.
+        """
+
+        astcode = self.generic_visit(astcode)
+        if astcode.name:
+            astcode.name = self.get_random_name(astcode.name).obfuscation
+            info("Added random name in except syntax.")
+            self.tracer.event(
+                "Added random name in except syntax.", node=astcode
+            )
+        return astcode
+
+    def visit_JoinedStr(self, astcode: JoinedStr) -> JoinedStr:
+        """
+        This function changes the visit_Constant's behaviour.
+        """
+
+        if self.tracing:
+            self.tracer("Enter in joined str...", node=astcode)
+        self.in_format_string = True
+        astcode = self.generic_visit(astcode)
+        self.in_format_string = False
+        if self.tracing:
+            self.tracer("Joined str end.")
+        return astcode
+
+    def visit_Constant(self, astcode: Constant) -> Call:
+        """
+        This function encrypts python constants data.
+           (Level 2)
+
+        - self.astcode is set to obfuscate ast code
+        - returns the obfuscate ast code
+        """
+
+        if self.level < 2:
+            info("Level is less than 2 no Constant obfuscation.")
+            return self.generic_visit(astcode)
+
+        if self.in_hot_function or not self.constants:
+            if self.tracing:
+                self.tracer(
+                    "Hot function or disabled Constant obfuscation.",
+                    node=astcode,
+                )
+            return self.generic_visit(astcode)
+
+        is_str = isinstance(astcode.value, str)
+
+        if is_str and not self.in_format_string:
+            if self.tracing:
+                self.tracer(
+                    "String obfuscation for %r.", astcode.value, node=astcode
+                )
+            astcode.value = astcode.value.encode(self.encoding)
+            astcode = self.generic_visit(astcode)
+            call = Call(
+                func=Call(
+                    func=NameAst(
+                        id=self.default_names["getattr"].obfuscation,
+                        ctx=Load(),
+                    ),
+                    args=[
+                        Call(
+                            func=NameAst(
+                                id=self.default_names["xor"].obfuscation,
+                                ctx=Load(),
+                            ),
+                            args=[
+                                Constant(
+                                    value=self.xor(astcode.value), kind=None
+                                )
+                            ],
+                            keywords=[],
+                        ),
+                        Constant(value="decode", kind=None),
+                    ],
+                    keywords=[],
+                ),
+                args=[Constant(value="utf-8", kind=None)],
+                keywords=[],
+            )
+
+        elif isinstance(astcode.value, bytes):
+            if self.tracing:
+                self.tracer(
+                    "Bytes obfuscation for %r.", astcode.value, node=astcode
+                )
+            astcode = self.generic_visit(astcode)
+            call = Call(
+                func=NameAst(
+                    id=self.default_names["xor"].obfuscation, ctx=Load()
+                ),
+                args=[Constant(value=self.xor(astcode.value))],
+                keywords=[],
+            )
+
+        elif isinstance(astcode.value, int) and not self.in_format_string:
+            if self.tracing:
+                self.tracer(
+                    "Integer obfuscation for %r", astcode.value, node=astcode
+                )
+            astcode = self.generic_visit(astcode)
+            call = Call(
+                func=NameAst(
+                    id=self.default_names["int"].obfuscation, ctx=Load()
+                ),
+                args=[
+                    Constant(value=oct(astcode.value)),
+                    Constant(value=8),
+                ],
+                keywords=[],
+            )
+        elif is_str:
+            self.hard_coded_string.add((astcode.value, True))
+            return astcode
+        else:
+            info(
+                "In format string %r this constant type can't be obfuscated.",
+                astcode.value,
+            )
+            self.tracer.event(
+                "In format string %r this constant type can't be obfuscated.",
+                astcode.value,
+                node=astcode,
+            )
+            return self.generic_visit(astcode)
+
+        call.is_obfuscated_constant = True
+        return call
+
+    def visit_Module(self, astcode: Module) -> Module:
+        """
+        This function deletes the Module doc string.
+
+        module(Module): module to obfuscate.
+        if this module have doc string, doc string is delete.
+        returns module.
+        """
+
+        if self.level >= 1:
+            if self.tracing:
+                self.tracer("Delete Module doc string.", node=astcode)
+            astcode = self.delete_doc_string(astcode)
+        else:
+            info("Level is less than 1 no Module obfuscation.")
+
+        astcode = self.generic_visit(astcode)
+        return astcode
+
+    def get_relative_filename(self, module: str, level: int) -> str:
+        """
+        This function returns the source filename of a relative import
+        (None for absolute import or if the file doesn't exist).
+        """
+
+        if not level or not isfile(self.filename):
+            return None
+
+        directory = dirname(abspath(self.filename))
+        for _ in range(level - 1):
+            directory = dirname(directory)
+
+        path = join(directory, *module.split(".")) if module else directory
+        for filename in (path + ".py", join(path, "__init__.py")):
+            if isfile(filename):
+                return filename
+
+        return None
+
+    def visit_ImportFrom(self, astcode: ImportFrom) -> Assign:
+        """
+        This function build a obfuscate 'from ... import ...'
+        """
+
+        if self.level < 1:
+            info("Level is less than 1 no ImportFrom obfuscation.")
+            astcode = self.generic_visit(astcode)
+            return astcode
+
+        if astcode.names[0].name == "*":
+            module = self.get_absolute_module(astcode.module, astcode.level)
+            filename = self.get_relative_filename(
+                astcode.module, astcode.level
+            )
+            if module is None and filename is None:
+                raise ValueError(
+                    "Can't resolve the module of 'from "
+                    f"{'.' * astcode.level}{astcode.module or ''} import *'"
+                )
+
+            astcode.names = [
+                alias(name=name)
+                for name in get_module_exports(
+                    module, filename, self.exports_cache
+                )
+                if not (
+                    name.startswith("__")
+                    and name.endswith("__")
+                    and name in self.default_names.keys()
+                )
+                and name != "__path__"
+            ]
+
+        targets, values = self.get_targets_and_value_for_import(
+            astcode.module, astcode.names, level=astcode.level
+        )
+
+        if self.tracing:
+            self.tracer(
+                "'from %s import' obfuscation.", astcode.module, node=astcode
+            )
+        assign = Assign(targets=[targets], value=values)
+        astcode = self.get_attributes_from(assign, astcode)
+
+        astcode = self.generic_visit(astcode)
+        return astcode
+
+    def visit_Import(self, astcode: Import) -> Assign:
+        """
+        This function obfuscates 'import ...'
+        """
+
+        if self.level < 1:
+            info("Level is less than 1 no ImportFrom obfuscation.")
+            astcode = self.generic_visit(astcode)
+            return astcode
+
+        modules = {
+            alias.name: ModuleImport(
+                alias.name.split(".")[0], alias.__dict__.get("asname")
+            )
+            for alias in astcode.names
+        }
+        if self.tracing:
+            self.tracer(
+                "Import obfuscation (%s).", ", ".join(modules), node=astcode
+            )
+
+        targets = []
+        values = []
+
+        assign = Assign(
+            targets=[TupleAst(elts=targets, ctx=Store())],
+            value=TupleAst(elts=values, ctx=Load()),
+        )
+
+        for name, module in modules.items():
+            if module.alias is None or "." not in name:
+                values.append(
+                    Call(
+                        func=NameAst(id="__import__", ctx=Load()),
+                        args=[Constant(value=name)],
+                        keywords=[],
+                    )
+                )
+            else:
+                _, value = self.get_targets_and_value_for_import(
+                    name,
+                    [ElementImport(name.split(".")[-1], module.alias)],
+                    False,
+                )
+                values.append(value.elts[0])
+
+            targets.append(
+                NameAst(id=module.alias or module.name, ctx=Store())
+            )
+
+        astcode = self.get_attributes_from(assign, astcode)
+        astcode = self.generic_visit(astcode)
+        return astcode
+
+    def visit_ClassDef(self, astcode: ClassDef) -> ClassDef:
+        """
+        This function obfuscates the class name and delete the doc string.
+
+        astcode(ClassDef): the class to obfuscate
+        returns a ClassDef with different name without doc string
+        """
+
+        precedent_class = self.set_namespace_name(astcode.name)
+
+        if self.level >= 1:
+            if self.tracing:
+                self.tracer(
+                    "%r (class definition) obfuscation.",
+                    astcode.name,
+                    node=astcode,
+                )
+            astcode.name = self.get_random_name(
+                astcode.name, bool(precedent_class)
+            ).obfuscation
+            astcode = self.delete_doc_string(astcode)
+
+        astcode = self.generic_visit(astcode)
+        self.current_class = precedent_class
+        return astcode
+
+    def visit_AsyncFunctionDef(
+        self, astcode: AsyncFunctionDef
+    ) -> AsyncFunctionDef:
+        """
+        This methods obfuscates asynchronous function
+        using the function obfusction.
+
+        astcode(AsyncFunctionDef): asynchronous function to obfuscate
+        returns a AsyncFunctionDef with different name
+        """
+
+        return self.visit_FunctionDef(astcode)
+
+    def visit_FunctionDef(self, astcode: FunctionDef) -> FunctionDef:
+        """
+        This function obfuscates function name if isn't a magic method.
+
+        astcode(FunctionDef): function to obfuscate
+        returns a FunctionDef with different name
+        """
+
+        precedent_class = self.set_namespace_name(astcode.name)
+
+        if self.level >= 1:
+            name = astcode.name
+            if not (name.startswith("__") and name.endswith("__")):
+                astcode.name = self.get_random_name(
+                    name, bool(precedent_class)
+                ).obfuscation
+            if self.tracing:
+                self.tracer("%r function obfuscation.", name, node=astcode)
+            astcode = self.delete_doc_string(astcode)
+
+        in_hot_function = self.in_hot_function
+        self.in_hot_function = getattr(astcode, "is_hot", False)
+        astcode = self.generic_visit(astcode)
+        self.in_hot_function = in_hot_function
+        self.current_class = precedent_class
+        return astcode
+
+    def visit_Name(self, astcode: NameAst) -> NameAst:
+        """
+        This function obfuscates name.
+
+        astcode(Name): the name to obfuscate
+        returns a Name with different id
+        """
+
+        if self.level >= 1 and astcode.id not in self.reserved_names:
+            if self.tracing:
+                self.tracer(
+                    "Name obfuscation for %r", astcode.id, node=astcode
+                )
+            astcode.id = self.get_random_name(astcode.id).obfuscation
+
+        astcode = self.generic_visit(astcode)
+        return astcode
+
+    def visit_Global(self, astcode: Global) -> Global:
+        """
+        This function obfuscates global names
+
+        astcode(Global): AST object to obfuscate
+        returns a Global with different names
+        """
+
+        if self.level >= 1:
+            for i, name in enumerate(astcode.names):
+                astcode.names[i] = self.get_random_name(name).obfuscation
+                if self.tracing:
+                    self.tracer("[Global] %r obfuscation", name, node=astcode)
+
+        astcode = self.generic_visit(astcode)
+        return astcode
+
+    def visit_Nonlocal(self, astcode: Nonlocal) -> Nonlocal:
+        """
+        This function obfuscates nonlocal names
+
+        astcode(Nonlocal): AST object to obfuscate
+        returns a Nonlocal with different names
+        """
+
+        if self.level >= 1:
+            for i, name in enumerate(astcode.names):
+                astcode.names[i] = self.get_random_name(name).obfuscation
+                if self.tracing:
+                    self.tracer(
+                        "[Nonlocal] %r obfuscation", name, node=astcode
+                    )
+
+        astcode = self.generic_visit(astcode)
+        return astcode
+
+    def visit_arg(self, astcode: arg) -> arg:
+        """
+        This function obfuscates AST arg
+
+        astcode(arg): the arg to obfuscate
+        returns a AST arg with different arg name
+        """
+
+        if self.level >= 1:
+            if self.tracing:
+                self.tracer(
+                    "arg obfuscation for %s", astcode.arg, node=astcode
+                )
+            self.delete_field(astcode, "annotation")
+            astcode.arg = self.get_random_name(astcode.arg).obfuscation
+
+        astcode = self.generic_visit(astcode)
+        return astcode
+
+    def visit_Attribute(self, attribute: Attribute) -> Attribute:
+        """
+        This function adds an attributes to define when
+        the attribute should be obfuscated.
+
+        attribute: Attribute object
+        return an Attribute object with obfuscate name
+        """
+
+        attribute = self.generic_visit(attribute)
+        if self.in_assign:
+            if self.tracing:
+                self.tracer(
+                    "Attribute assignation for %r",
+                    attribute.attr,
+                    node=attribute,
+                )
+            attribute.is_attribute = True
+            self.get_random_name(attribute.attr).is_attribute = True
+        elif (name := self.default_names.get(attribute.attr)) is not None:
+            if self.tracing:
+                self.tracer(
+                    "Define attribute obfuscation for: %r (defined: %s)",
+                    attribute.attr,
+                    name.is_attribute,
+                    node=attribute,
+                )
+            attribute.is_attribute = name.is_attribute
+        else:
+            if self.tracing:
+                self.tracer(
+                    "No attribute obfuscation for: %r",
+                    attribute.attr,
+                    node=attribute,
+                )
+            attribute.is_attribute = False
+
+        return attribute
+
+    def visit_AnnAssign(self, astcode: AnnAssign) -> Assign:
+        """
+        This function obfuscates assignation.
+
+        astcode(AnnAssign): assign with annotation
+        return an Assign obfuscated
+        """
+
+        if self.level >= 1:
+            if self.tracing:
+                annotation = astcode.annotation
+                if isinstance(annotation, Name):
+                    self.tracer(
+                        "Delete annotation %s from Assign",
+                        annotation.id,
+                        node=astcode,
+                    )
+                elif isinstance(annotation, Call):
+                    self.tracer(
+                        "Delete annotation %s from Assign",
+                        annotation.func.id,
+                        node=astcode,
+                    )
+                else:
+                    self.tracer("Delete unknown type annotation", node=astcode)
+
+            assign = Assign(
+                targets=[astcode.target],
+                value=astcode.value if astcode.value else Constant(value=None),
+            )
+            astcode = self.get_attributes_from(assign, astcode)
+
+        return self.generic_visit(astcode)
+
+    def visit_Assign(self, assign: Assign) -> Assign:
+        """
+        This function defines attribute obfuscation mode.
+
+        assign: Assign object
+        return an Assign object with obfuscation
+        """
+
+        self.in_assign = True
+        for index, astcode in enumerate(assign.targets):
+            if isinstance(astcode, AST) and (
+                return_value := self.visit(astcode)
+            ):
+                assign.targets[index] = return_value
+        self.in_assign = False
+
+        if isinstance(assign.value, AST) and (
+            return_value := self.visit(assign.value)
+        ):
+            assign.value = return_value
+        if isinstance(assign.type_comment, AST) and (
+            return_value := self.visit(assign.type_comment)
+        ):
+            assign.type_comment = return_value
+
+        return assign
+
+    def visit_AugAssign(self, assign: AugAssign) -> AugAssign:
+        """
+        This function defines attribute obfuscation mode.
+
+        assign: AugAssign object
+        return an AugAssign object with obfuscation
+        """
+
+        self.in_assign = True
+        if isinstance(assign.target, AST) and (
+            return_value := self.visit(assign.target)
+        ):
+            assign.target = return_value
+        self.in_assign = False
+        if isinstance(assign.value, AST) and (
+            return_value := self.visit(assign.value)
+        ):
+            assign.value = return_value
+        if isinstance(assign.op, AST) and (
+            return_value := self.visit(assign.op)
+        ):
+            assign.op = return_value
+        return assign
+
+    def write_deobfuscate(self) -> None:
+        """
+        This function saves configuration and the mapping between
+        variable names and obfuscation names.
+        """
+
+        from json import dump
+
+        if not self.deobfuscate:
+            return None
+
+        with open(
+            self.deobfuscate_filename, "w", encoding=self.encoding
+        ) as file:
+            dump(self.get_deobfuscate(), file)
+
+        debug("Writing file %s", self.deobfuscate_filename)
+
+    def get_deobfuscate(self) -> Dict[str, Any]:
+        """
+        This function returns configuration and the mapping between
+        variable names and obfuscation names.
+        """
+
+        return {
+            "Obfuscator": {
+                "level": self.level,
+                "encoding": self.encoding,
+                "output_file": self.output_filename,
+                "default_obfuscation": self.using_default_obfu,
+            },
+            "encryption_key": self.password,
+            "runtime": self.runtime,
+            "names": [
+                {
+                    "name": name.name,
+                    "definition": name.is_attribute,
+                    "namespace": name.namespace_name,
+                    "obfuscation_name": name.obfuscation,
+                }
+                for name in (*self.default_names.values(), *self.scoped_names)
+            ],
+        }
+
+
+class AttributeObfuscation(NodeTransformer):
+
+    """
+    This class obfuscates attribute name.
+    """
+
+    def __init__(self, obfuscator: Obfuscator):
+        self.default_names = obfuscator.default_names
+        self.obfu_names = obfuscator.obfu_names
+        self.obfuscator = obfuscator
+        self.in_assign = False
+
+    def visit_Assign(self, assign: Assign) -> Assign:
+        """
+        This function defines attribute obfuscation mode.
+
+        assign: Assign object
+        return an Assign object with obfuscation
+        """
+
+        self.in_assign = True
+        assign = self.generic_visit(assign)
+        self.in_assign = False
+        return assign
+
+    def visit_AugAssign(self, assign: AugAssign) -> AugAssign:
+        """
+        This function defines attribute obfuscation mode.
+
+        assign: AugAssign object
+        return an AugAssign object with obfuscation
+        """
+
+        self.in_assign = True
+        assign = self.generic_visit(assign)
+        self.in_assign = False
+        return assign
+
+    def visit_JoinedStr(self, astcode: JoinedStr) -> JoinedStr:
+        """
+        This function changes the visit_Constant's behaviour.
+        """
+
+        self.obfuscator.in_format_string = True
+        astcode = self.generic_visit(astcode)
+        self.obfuscator.in_format_string = False
+        return astcode
+
+    def visit_AsyncFunctionDef(
+        self, astcode: AsyncFunctionDef
+    ) -> AsyncFunctionDef:
+        """
+        This function visits asynchronous functions
+        using the function visit.
+        """
+
+        return self.visit_FunctionDef(astcode)
+
+    def visit_FunctionDef(self, astcode: FunctionDef) -> FunctionDef:
+        """
+        This function disables getattr obfuscation in hot functions.
+        """
+
+        in_hot_function = self.obfuscator.in_hot_function
+        self.obfuscator.in_hot_function = getattr(astcode, "is_hot", False)
+        astcode = self.generic_visit(astcode)
+        self.obfuscator.in_hot_function = in_hot_function
+        return astcode
+
+    def visit_Attribute(self, attribute: Attribute) -> Attribute:
+        """
+        This function obfuscate attribute name.
+
+        attribute: Attribute object
+        return an Attribute object with obfuscate name
+        """
+
+        if (name := self.default_names.get(attribute.attr)) is not None:
+            if self.obfuscator.tracing:
+                self.obfuscator.tracer(
+                    "Change attribute: %r (defined: %s)",
+                    attribute.attr,
+                    name.is_attribute,
+                    node=attribute,
+                )
+            if attribute.is_attribute:
+                attribute.attr = name.obfuscation
+
+        if (
+            self.in_assign
+            or self.obfuscator.in_hot_function
+            or not self.obfuscator.attributes
+        ):
+            return attribute
+
+        constant = Constant(value=attribute.attr, kind=None)
+
+        if attribute.attr != "decode":
+            constant = self.obfuscator.visit_Constant(constant)
+
+        return Call(
+            func=NameAst(
+                id=self.default_names["getattr"].obfuscation, ctx=Load()
+            ),
+            args=[attribute.value, constant],
+            keywords=[],
+        )
+
+
+class LoopInvariantHoisting(NodeTransformer):
+
+    """
+    This class hoists obfuscated constants (decrypted strings,
+    bytes and integers) used in loops and comprehensions into
+    variables defined before the loop, to decrypt them only once.
+    """
+
+    loop_fields = {
+        For: ("target", "body"),
+        AsyncFor: ("target", "body"),
+        While: ("test", "body"),
+        comprehension: ("target", "ifs"),
+        ListComp: ("elt",),
+        SetComp: ("elt",),
+        GeneratorExp: ("elt",),
+        DictComp: ("key", "value"),
+    }
+
+    def __init__(self, obfuscator: Obfuscator):
+        self.obfuscator = obfuscator
+
+    def visit_ClassDef(self, astcode: ClassDef) -> ClassDef:
+        """
+        This function visits only nested functions and classes, names
+        defined in a class body are not visible in nested scopes.
+        """
+
+        astcode.body = [
+            self.visit(statement)
+            if isinstance(
+                statement, (FunctionDef, AsyncFunctionDef, ClassDef)
+            )
+            else statement
+            for statement in astcode.body
+        ]
+        return astcode
+
+    def generic_visit(self, astcode: AST) -> AST:
+        """
+        This function hoists constants of each statements list.
+        """
+
+        for field, value in iter_fields(astcode):
+            if (
+                isinstance(value, list)
+                and value
+                and isinstance(value[0], stmt)
+            ):
+                setattr(astcode, field, self.hoist(value))
+            elif isinstance(value, list):
+                for index, node in enumerate(value):
+                    if isinstance(node, AST):
+                        value[index] = self.visit(node)
+            elif isinstance(value, AST):
+                setattr(astcode, field, self.visit(value))
+
+        return astcode
+
+    def hoist(self, statements: List[stmt]) -> List[stmt]:
+        """
+        This function returns statements with assignments of
+        loop-invariant obfuscated constants before each loop.
+        """
+
+        new_statements = []
+
+        for statement in statements:
+            if not any(
+                isinstance(node, tuple(self.loop_fields))
+                for node in iter_scope([statement])
+            ):
+                new_statements.append(self.visit(statement))
+                continue
+
+            hoisted = {}
+            statement = self.replace(statement, hoisted, False)
+            new_statements.extend(
+                Assign(
+                    targets=[NameAst(id=name, ctx=Store())],
+                    value=value,
+                    lineno=statement.lineno,
+                )
+                for name, value in hoisted.values()
+            )
+            new_statements.append(statement)
+
+        return new_statements
+
+    def replace(
+        self, astcode: AST, hoisted: Dict[str, Tuple[str, Call]], loop: bool
+    ) -> AST:
+        """
+        This function replaces obfuscated constants evaluated in a loop
+        by names, hoisted is filled with: source -> (name, constant).
+        """
+
+        if isinstance(astcode, (FunctionDef, AsyncFunctionDef, ClassDef)):
+            return self.visit(astcode)
+        elif isinstance(astcode, Lambda):
+            return astcode
+        elif loop and getattr(astcode, "is_obfuscated_constant", False):
+            source = unparse(astcode)
+            if source not in hoisted:
+                name = self.obfuscator.get_new_name()
+                self.obfuscator.reserved_names.add(name)
+                hoisted[source] = (name, astcode)
+            return NameAst(id=hoisted[source][0], ctx=Load())
+
+        is_comprehension = isinstance(
+            astcode, (ListComp, SetComp, DictComp, GeneratorExp)
+        )
+
+        for field, value in iter_fields(astcode):
+            in_loop = loop or field in self.loop_fields.get(
+                type(astcode), ()
+            )
+
+            if isinstance(value, AST):
+                setattr(astcode, field, self.replace(value, hoisted, in_loop))
+            elif not isinstance(value, list):
+                continue
+            elif not in_loop and value and isinstance(value[0], stmt):
+                setattr(astcode, field, self.hoist(value))
+            else:
+                for index, node in enumerate(value):
+                    if isinstance(node, AST):
+                        value[index] = self.replace(
+                            node,
+                            hoisted,
+                            in_loop or (is_comprehension and index > 0),
+                        )
+
+        return astcode
+
+
+importer_runtime = """from importlib.machinery import ModuleSpec
+from os.path import dirname, join
+from marshal import loads
+from zlib import decompress
+import sys
+
+
+class ObfuscatedImporter:
+    def __init__(self, filename, key):
+        with open(filename, "rb") as file:
+            self.modules = loads(file.read())
+        self.filename = filename
+        self.key = key
+
+    def find_spec(self, fullname, path=None, target=None):
+        module = self.modules.get(fullname)
+        if module is None:
+            return None
+        return ModuleSpec(
+            fullname, self, origin=self.filename, is_package=module[0]
+        )
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        is_package, data = self.modules[module.__name__]
+        size = len(data)
+        key = memoryview(self.key * (size // len(self.key) + 1))[:size]
+        data = (
+            int.from_bytes(data, "little") ^ int.from_bytes(key, "little")
+        ).to_bytes(size, "little")
+        filename = join(dirname(self.filename), *module.__name__.split("."))
+        if is_package:
+            filename = join(filename, "__init__.py")
+        else:
+            filename += ".py"
+        module.__file__ = filename
+        module.__cached__ = None
+        module.__dict__.setdefault("__annotations__", {{}})
+        exec(compile(decompress(data), filename, "exec"), module.__dict__)
+
+
+def install(filename=join(dirname(__file__), {archive!r}), key={key}):
+    importer = ObfuscatedImporter(filename, key)
+    sys.meta_path.insert(0, importer)
+    return importer
+
+
+importer = install()
+"""
+
+
+def get_modules(directory: str) -> Dict[str, Tuple[str, bool]]:
+    """
+    This function returns python files from a directory as
+    module name: (filename, is_package).
+
+    If the directory is a package, the directory name is
+    the first name of all modules.
+    """
+
+    prefix = (
+        [basename(abspath(directory))]
+        if isfile(join(directory, "__init__.py"))
+        else []
+    )
+    modules = {}
+
+    for root, directories, filenames in walk(directory):
+        directories.sort()
+        names = prefix + [
+            name for name in relpath(root, directory).split(sep) if name != "."
+        ]
+
+        for filename in sorted(filenames):
+            if not filename.endswith(".py"):
+                continue
+
+            if filename == "__init__.py":
+                if names:
+                    modules[".".join(names)] = (join(root, filename), True)
+            else:
+                modules[".".join(names + [filename[:-3]])] = (
+                    join(root, filename),
+                    False,
+                )
+
+    return modules
+
+
+def build_runtime(
+    runtime_filename: str,
+    level: int = 2,
+    names: Dict[str, Name] = None,
+    encoding: str = "utf-8",
+    names_size: int = 12,
+    fast_xor: bool = False,
+) -> Tuple[Dict[str, Name], List[int]]:
+    """
+    This function writes the shared runtime module (builtins aliases
+    and strings decryption function) and returns names and strings
+    key to obfuscate modules importing it (runtime argument).
+
+    runtime_filename(str):   filename to write the runtime module
+    level(int) = 2:          runtime obfuscation level (1 or 2)
+    names(Dict[str, Name]):  names shared by all modules
+    fast_xor(bool) = False:  big integers strings decryption (see Obfuscator)
+    returns names shared by all modules and the strings key
+    """
+
+    names = {} if names is None else names
+    obfuscator = Obfuscator(
+        runtime_filename,
+        level=level,
+        names=names,
+        deobfuscate=False,
+        encoding=encoding,
+        names_size=names_size,
+        fast_xor=fast_xor,
+    )
+
+    with open(runtime_filename, "w", encoding=encoding) as file:
+        file.write(obfuscator.get_runtime())
+
+    debug("Write shared runtime %s", runtime_filename)
+    return names, obfuscator._xor_password_key
+
+
+def build_archive(
+    directory: str,
+    archive_filename: str,
+    runtime_filename: str = None,
+    level: int = 2,
+    names: Dict[str, Name] = None,
+    password: str = None,
+    encoding: str = "utf-8",
+    names_size: int = 12,
+    shared_runtime: bool = False,
+) -> Dict[str, Name]:
+    """
+    This function obfuscates all python files in a directory and writes
+    them in an encrypted archive with a runtime module.
+
+    Importing the runtime module installs a sys.meta_path importer:
+    each obfuscated module is decrypted, decompressed and compiled only
+    when it is imported the first time.
+
+    directory(str):              directory containing modules or packages
+    archive_filename(str):       filename to write the encrypted archive
+    runtime_filename(str):       filename to write the runtime module
+        (default: pyobfuscator_runtime.py in the archive directory)
+    level(int) = 2:              names and values obfuscation level (1 or 2)
+    names(Dict[str, Name]):      names shared by all modules
+    password(str) = None:        key for encryption (see DocPassword)
+    shared_runtime(bool) = False: define helpers (builtins aliases
+        and decryption function) once in the runtime module
+    returns the names shared by all modules
+    """
+
+    from zlib import compress
+
+    names = {} if names is None else names
+    runtime_filename = runtime_filename or join(
+        dirname(archive_filename), "pyobfuscator_runtime.py"
+    )
+    runtime = None
+    runtime_code = ""
+    strings_key = None
+
+    if shared_runtime:
+        runtime = splitext(basename(runtime_filename))[0]
+        obfuscator = Obfuscator(
+            runtime_filename,
+            level=min(level, 2),
+            names=names,
+            deobfuscate=False,
+            encoding=encoding,
+            names_size=names_size,
+        )
+        runtime_code = obfuscator.get_runtime()
+        strings_key = obfuscator._xor_password_key
+
+    if password:
+        key = password.encode()
+        key_code = "input('Password: ').encode()"
+    else:
+        key = bytes(choices(list(range(256)), k=40))
+        key_code = repr(key)
+
+    archive = {}
+
+    modules = get_modules(directory)
+
+    for module, (filename, is_package) in modules.items():
+        obfuscator = Obfuscator(
+            filename,
+            level=min(level, 2),
+            names=names,
+            deobfuscate=False,
+            encoding=encoding,
+            names_size=names_size,
+            runtime=runtime,
+            strings_key=strings_key,
+        )
+        obfuscator.package = (
+            module if is_package else module.rpartition(".")[0]
+        )
+        obfuscator.project_modules = modules.keys()
+        code, _ = obfuscator.get_code()
+        data = compress(obfuscator.source_obfuscation(code).encode(), 9)
+        archive[module] = (
+            is_package,
+            xor_bytes(data, key),
+        )
+        info("Module %r is added to the archive.", module)
+
+    with open(archive_filename, "wb") as file:
+        file.write(marshal_dumps(archive))
+
+    with open(runtime_filename, "w", encoding=encoding) as file:
+        file.write(runtime_code)
+        file.write(
+            importer_runtime.format(
+                archive=relpath(
+                    archive_filename, dirname(abspath(runtime_filename))
+                ),
+                key=key_code,
+            )
+        )
+
+    debug(
+        "Write archive %s and runtime %s", archive_filename, runtime_filename
+    )
+    return names
+
+
+def obfuscate(
+    code: Union[str, Module], **options: Any
+) -> ObfuscationResult:
+    """
+    This function obfuscates code in memory (without any file)
+    and returns the obfuscate code and names mapping.
+
+    code(Union[str, Module]): python code or AST module to obfuscate
+    options: Obfuscator arguments (level, names, password, ...)
+
+    >>> exec(obfuscate("print('Hello world !')", level=3).code)
+    Hello world !
+    >>>
+    """
+
+    options.setdefault("names", {})
+    options.setdefault("deobfuscate", False)
+    return Obfuscator("<string>", **options).obfuscate(code)
+
+
+job_options = (
+    "level",
+    "password",
+    "encoding",
+    "names_size",
+    "compression",
+    "compression_level",
+    "combined_loader",
+    "armor",
+    "lazy",
+    "minify",
+    "scopes",
+    "hot_threshold",
+    "constants",
+    "attributes",
+    "fast_xor",
+    "hoist",
+    "runtime_stats",
+    "trace_sample",
+)
+
+# options reading or writing files on the obfuscation host,
+# daemon settings (see serve) that jobs can not define
+host_options = ("exports_cache", "profile", "trace_events")
+
+
+def obfuscate_job(
+    job: Dict[str, Any], settings: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """
+    This function obfuscates the code of a job and returns
+    the obfuscate code and the names mapping.
+
+    job(dict): {"code": <source>, "options": {<Obfuscator arguments>}}
+        names are defined as {<name>: <obfuscation name>},
+        options reading or writing files (host_options) are rejected
+    settings(dict): host_options defined by the daemon (exports_cache, ...)
+    returns {"code": <obfuscate code>, <deobfuscate configuration>}
+        ("Obfuscator", "encryption_key", "runtime" and "names")
+        or {"error": <message>}
+
+    >>> result = obfuscate_job({"code": "print(1)", "options": {"level": 1}})
+    >>> exec(result["code"])
+    1
+    >>> obfuscate_job({"code": "", "options": {"profile": "calls.json"}})
+    {'error': "Option not allowed in a job: 'profile'"}
+    >>>
+    """
+
+    try:
+        options = job.get("options", {})
+        for key in host_options:
+            if key in options:
+                return {"error": f"Option not allowed in a job: {key!r}"}
+
+        names = {
+            name: Name(name, obfuscation, False, None)
+            for name, obfuscation in options.get("names", {}).items()
+        }
+        obfuscator = Obfuscator(
+            basename(job.get("filename", "<job>")),
+            names=names,
+            deobfuscate=False,
+            **{key: options[key] for key in job_options if key in options},
+            **(settings or {}),
+        )
+        result = obfuscator.obfuscate(job["code"])
+    except Exception as error:
+        return {"error": f"{error.__class__.__name__}: {error}"}
+
+    return {"code": result.code, **result.configuration}
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """
+    This function returns (host, port) for TCP address
+    and (path, None) for unix socket address.
+
+    >>> parse_address("127.0.0.1:8000")
+    ('127.0.0.1', 8000)
+    >>> parse_address("/tmp/PyObfuscator.sock")
+    ('/tmp/PyObfuscator.sock', None)
+    >>>
+    """
+
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+
+    return address, None
+
+
+def is_loopback(host: str) -> bool:
+    """
+    This function returns True when host is a loopback address.
+
+    >>> is_loopback("127.0.0.1"), is_loopback("[::1]"), is_loopback("0.0.0.0")
+    (True, True, False)
+    >>>
+    """
+
+    from ipaddress import ip_address
+
+    if host == "localhost":
+        return True
+
+    try:
+        return ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+async def serve(address: str, workers: int = None, **settings: Any) -> None:
+    """
+    This function starts the obfuscation daemon.
+
+    The daemon reads one JSON job per line (see obfuscate_job),
+    obfuscates it in a process pool and writes one JSON result
+    per line. Connections are handled concurrently.
+
+    There is no authentication: TCP addresses must be loopback
+    addresses, use unix socket permissions to restrict access.
+
+    address(str): unix socket path or <host>:<port> (loopback host)
+    workers(int): number of worker processes (default: CPU count)
+    settings: host_options for all jobs (exports_cache, profile
+        and trace_events)
+    """
+
+    host, port = parse_address(address)
+    if port is not None and not is_loopback(host):
+        raise ValueError(f"The daemon only listens on loopback: {host!r}")
+
+    from asyncio import (
+        StreamReader,
+        StreamWriter,
+        get_running_loop,
+        start_unix_server,
+        start_server,
+    )
+    from concurrent.futures import ProcessPoolExecutor
+    from json import dumps, loads
+
+    loop = get_running_loop()
+
+    with ProcessPoolExecutor(workers) as pool:
+
+        async def handle(reader: StreamReader, writer: StreamWriter):
+            try:
+                while line := await reader.readline():
+                    try:
+                        job = loads(line)
+                    except ValueError as error:
+                        result = {"error": f"Invalid JSON job: {error}"}
+                    else:
+                        result = await loop.run_in_executor(
+                            pool, obfuscate_job, job, settings
+                        )
+                    writer.write(dumps(result).encode() + b"\n")
+                    await writer.drain()
+            finally:
+                writer.close()
+
+        if port is None:
+            server = await start_unix_server(handle, host, limit=1 << 28)
+        else:
+            server = await start_server(handle, host, port, limit=1 << 28)
+
+        info("Obfuscation daemon is listening on %s", address)
+        async with server:
+            await server.serve_forever()
+
+
+def client(address: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    This function sends a job to the obfuscation daemon
+    and returns the result (see obfuscate_job).
+    """
+
+    from socket import socket, create_connection, AF_UNIX, SOCK_STREAM
+    from json import dumps, loads
+
+    host, port = parse_address(address)
+    if port is None:
+        connection = socket(AF_UNIX, SOCK_STREAM)
+        connection.connect(host)
+    else:
+        connection = create_connection((host, port))
+
+    with connection, connection.makefile("rwb") as file:
+        file.write(dumps(job).encode() + b"\n")
+        file.flush()
+        return loads(file.readline())
+
+
+class BatchReport:
+
+    """
+    This class contains time and sizes to obfuscate one file.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        output_filename: str,
+        input_size: int,
+        output_size: int = 0,
+        time: float = 0,
+        error: str = None,
+        stats: ObfuscationStats = None,
+    ):
+        self.filename = filename
+        self.output_filename = output_filename
+        self.input_size = input_size
+        self.output_size = output_size
+        self.time = time
+        self.error = error
+        self.stats = stats
+
+
+def get_filenames(patterns: List[str]) -> List[str]:
+    """
+    This function returns filenames from filenames and glob patterns
+    (without duplicate, in the order of the patterns).
+
+    >>> get_filenames(["a.py", "a.py", "b.py"])
+    ['a.py', 'b.py']
+    >>>
+    """
+
+    from glob import glob
+
+    filenames = {}
+
+    for pattern in patterns:
+        if any(character in pattern for character in "*?["):
+            for filename in sorted(glob(pattern, recursive=True)):
+                filenames[filename] = None
+        else:
+            filenames[pattern] = None
+
+    return list(filenames)
+
+
+def obfuscate_file(
+    filename: str, output_filename: str, options: Dict[str, Any]
+) -> BatchReport:
+    """
+    This function obfuscates one file (for batch obfuscation)
+    and returns time and sizes.
+
+    The names mapping is written in <output filename>_deobfuscate.json.
+    """
+
+    report = BatchReport(filename, output_filename, 0)
+    options = options.copy()
+    names = {
+        name: Name(name, obfuscation, False, None)
+        for name, obfuscation in options.pop("names", {}).items()
+    }
+
+    start = perf_counter()
+    try:
+        report.input_size = getsize(filename)
+        if output_filename:
+            makedirs(dirname(output_filename), exist_ok=True)
+        obfuscator = Obfuscator(
+            filename, output_filename, names=names, **options
+        )
+        obfuscator.deobfuscate_filename = (
+            f"{splitext(obfuscator.output_filename)[0]}_deobfuscate.json"
+        )
+        obfuscator.default_obfuscation()
+    except Exception as error:
+        report.error = f"{error.__class__.__name__}: {error}"
+    else:
+        report.output_filename = obfuscator.output_filename
+        report.output_size = getsize(obfuscator.output_filename)
+        if obfuscator.stats:
+            report.stats = obfuscator.get_stats()
+
+    report.time = perf_counter() - start
+    return report
+
+
+def read_source(
+    filename: str, output_filename: str, encoding: str = "utf-8"
+) -> Tuple[BatchReport, str]:
+    """
+    This function reads one file (in the readers threads of the batch
+    obfuscation) and returns a report and the source code (None on
+    error).
+    """
+
+    report = BatchReport(filename, output_filename, 0)
+    start = perf_counter()
+
+    try:
+        with open(filename, "rb") as file:
+            data = file.read()
+        code = (
+            data.decode(encoding).replace("\r\n", "\n").replace("\r", "\n")
+        )
+    except Exception as error:
+        report.error = f"{error.__class__.__name__}: {error}"
+        code = None
+    else:
+        report.input_size = len(data)
+
+    report.time = perf_counter() - start
+    return report, code
+
+
+def transform_source(
+    report: BatchReport, code: str, options: Dict[str, Any]
+) -> Tuple[BatchReport, bytes, Dict[str, Any]]:
+    """
+    This function obfuscates the code of one file in memory (in the
+    process pool of the batch obfuscation) and returns the report,
+    the encoded obfuscate code and the deobfuscate configuration
+    (None when deobfuscate is False, or on error).
+    """
+
+    options = options.copy()
+    names = {
+        name: Name(name, obfuscation, False, None)
+        for name, obfuscation in options.pop("names", {}).items()
+    }
+
+    start = perf_counter()
+    try:
+        obfuscator = Obfuscator(
+            report.filename, report.output_filename, names=names, **options
+        )
+        result = obfuscator.obfuscate(code)
+        data = result.code.encode(obfuscator.encoding)
+    except Exception as error:
+        report.error = f"{error.__class__.__name__}: {error}"
+        data = configuration = None
+    else:
+        report.output_filename = obfuscator.output_filename
+        report.output_size = len(data)
+        report.stats = result.stats
+        configuration = (
+            result.configuration if obfuscator.deobfuscate else None
+        )
 
-    def visit_Module(self, astcode: Module) -> Module:
-        """
-        This function deletes the Module doc string.
+    report.time += perf_counter() - start
+    return report, data, configuration
 
-        module(Module): module to obfuscate.
-        if this module have doc string, doc string is delete.
-        returns module.
-        """
 
-        if self.level >= 1:
-            debug("Delete Module doc string.")
-            astcode = self.delete_doc_string(astcode)
-        else:
-            info("Level is less than 1 no Module obfuscation.")
+def write_atomic(filename: str, data: bytes) -> None:
+    """
+    This function writes a file atomically (a unique temporary file
+    in the same directory is renamed): readers never see a partial
+    file and concurrent writers never share a temporary file.
 
-        astcode = self.generic_visit(astcode)
-        return astcode
+    The file keeps the mode of the replaced file (default: 0o644).
+    """
 
-    def visit_ImportFrom(self, astcode: ImportFrom) -> Assign:
-        """
-        This function build a obfuscate 'from ... import ...'
-        """
+    from os import replace, remove, chmod
+    from tempfile import mkstemp
 
-        if self.level < 1:
-            info("Level is less than 1 no ImportFrom obfuscation.")
-            astcode = self.generic_visit(astcode)
-            return astcode
+    try:
+        mode = stat(filename).st_mode & 0o777
+    except OSError:
+        mode = 0o644
 
-        if astcode.names[0].name == "*":
-            module = __import__(astcode.module)
+    descriptor, temporary = mkstemp(".tmp", dir=dirname(filename) or ".")
+    try:
+        with open(descriptor, "wb") as file:
+            file.write(data)
+        chmod(temporary, mode)
+        replace(temporary, filename)
+    except BaseException:
+        remove(temporary)
+        raise
 
-            for submodule in astcode.module.split(".")[1:]:
-                module = getattr(module, submodule)
 
-            astcode.names = [
-                alias(name=name)
-                for name in getattr(module, "__all__", dir(module))
-                if not (
-                    name.startswith("__")
-                    and name.endswith("__")
-                    and name in self.default_names.keys()
-                )
-                and name != "__path__"
-            ]
+def write_outputs(
+    outputs: "Queue", reports: List[BatchReport], total: int
+) -> None:
+    """
+    This function writes obfuscate files and deobfuscate configurations
+    from the outputs queue (in the writers threads of the batch
+    obfuscation) until it gets None, and adds the reports.
+    """
 
-        targets, values = self.get_targets_and_value_for_import(
-            astcode.module, astcode.names, level=astcode.level
+    from json import dumps
+
+    while (output := outputs.get()) is not None:
+        report, data, configuration = output
+        start = perf_counter()
+
+        if report.error is None:
+            try:
+                if directory := dirname(report.output_filename):
+                    makedirs(directory, exist_ok=True)
+                write_atomic(report.output_filename, data)
+                if configuration is not None:
+                    write_atomic(
+                        f"{splitext(report.output_filename)[0]}"
+                        "_deobfuscate.json",
+                        dumps(configuration).encode(),
+                    )
+            except Exception as error:
+                report.error = f"{error.__class__.__name__}: {error}"
+
+        report.time += perf_counter() - start
+        reports.append(report)
+        print(
+            f"[{len(reports)}/{total}] {report.filename}"
+            + (
+                f" error: {report.error}"
+                if report.error
+                else f" {report.time:.3f}s"
+            ),
+            file=stderr,
         )
 
-        debug(f"'from {astcode.module} import' obfuscation.")
-        assign = Assign(targets=[targets], value=values)
-        astcode = self.get_attributes_from(assign, astcode)
 
-        astcode = self.generic_visit(astcode)
-        return astcode
+def batch_obfuscation(
+    filenames: List[str],
+    output_directory: str = None,
+    workers: int = None,
+    runtime: str = None,
+    readers: int = 4,
+    writers: int = 4,
+    queue_size: int = None,
+    **options: Any,
+) -> List[BatchReport]:
+    """
+    This function obfuscates independent files (largest files first)
+    and returns a report for each file.
+
+    Files are processed in a pipeline: reader threads read sources,
+    a process pool obfuscates them and writer threads write outputs
+    and deobfuscate configurations atomically, so slow file system
+    calls overlap with obfuscation. Files in progress (read or
+    obfuscated) and waiting to be written are bounded by queue_size.
+
+    filenames(List[str]):      python files to obfuscate
+    output_directory(str):     directory to write obfuscate files (same tree
+        as the common directory of filenames, default: <filename>_obfu.py
+        next to each file)
+    workers(int):              number of worker processes (default: CPU count)
+    runtime(str):              shared runtime module name, written in the
+        output directory (default: the common directory of filenames)
+        and imported by all obfuscate files
+    readers(int):              number of reader threads
+    writers(int):              number of writer threads
+    queue_size(int):           maximum files in progress and waiting to be
+        written (default: 2 * workers)
+    options:                   Obfuscator arguments (level, password, ...)
+        names are defined as {<name>: <obfuscation name>}
+    """
 
-    def visit_Import(self, astcode: Import) -> Assign:
-        """
-        This function obfuscates 'import ...'
-        """
+    from concurrent.futures import (
+        ProcessPoolExecutor,
+        ThreadPoolExecutor,
+        FIRST_COMPLETED,
+        wait,
+    )
+    from threading import Thread
+    from queue import Queue
+    from os import cpu_count
 
-        if self.level < 1:
-            info("Level is less than 1 no ImportFrom obfuscation.")
-            astcode = self.generic_visit(astcode)
-            return astcode
+    if output_directory:
+        makedirs(output_directory, exist_ok=True)
 
-        modules = {
-            alias.name: ModuleImport(
-                alias.name.split(".")[0], alias.__dict__.get("asname")
-            )
-            for alias in astcode.names
+    directory = filenames and commonpath(
+        [dirname(abspath(filename)) for filename in filenames]
+    )
+
+    if runtime:
+        names, strings_key = build_runtime(
+            join(output_directory or directory or ".", f"{runtime}.py"),
+            min(options.get("level", 6), 2),
+            {
+                name: Name(name, obfuscation, False, None)
+                for name, obfuscation in options.get("names", {}).items()
+            },
+            options.get("encoding", "utf-8"),
+            options.get("names_size", 12),
+            options.get("fast_xor", False),
+        )
+        options = {
+            **options,
+            "names": {name.name: name.obfuscation for name in names.values()},
+            "runtime": runtime,
+            "strings_key": strings_key,
         }
-        debug(f"Import obfuscation ({', '.join(modules.keys())}).")
 
-        targets = []
-        values = []
+    def get_size(filename: str) -> int:
+        try:
+            return getsize(filename)
+        except OSError:
+            return 0
 
-        assign = Assign(
-            targets=[TupleAst(elts=targets, ctx=Store())],
-            value=TupleAst(elts=values, ctx=Load()),
+    def get_output_filename(filename: str) -> str:
+        if not output_directory:
+            return None
+        return join(
+            output_directory,
+            f"{splitext(relpath(abspath(filename), directory))[0]}_obfu.py",
         )
 
-        for name, module in modules.items():
-            if module.alias is None or "." not in name:
-                values.append(
-                    Call(
-                        func=NameAst(id="__import__", ctx=Load()),
-                        args=[Constant(value=name)],
-                        keywords=[],
+    filenames = sorted(filenames, key=get_size, reverse=True)
+    pending = iter(filenames)
+    queue_size = queue_size or 2 * (workers or cpu_count() or 1)
+    encoding = options.get("encoding", "utf-8")
+    reports = []
+
+    outputs = Queue(queue_size)
+    threads = [
+        Thread(target=write_outputs, args=(outputs, reports, len(filenames)))
+        for _ in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        with ThreadPoolExecutor(readers) as reading, ProcessPoolExecutor(
+            workers
+        ) as pool:
+            reads, transforms = set(), set()
+
+            while True:
+                while len(reads) + len(transforms) < queue_size and (
+                    filename := next(pending, None)
+                ):
+                    reads.add(
+                        reading.submit(
+                            read_source,
+                            filename,
+                            get_output_filename(filename),
+                            encoding,
+                        )
                     )
+
+                if not reads and not transforms:
+                    break
+
+                done, _ = wait(
+                    reads | transforms, return_when=FIRST_COMPLETED
                 )
-            else:
-                _, value = self.get_targets_and_value_for_import(
-                    name,
-                    [ElementImport(name.split(".")[-1], module.alias)],
-                    False,
-                )
-                values.append(value.elts[0])
+                for future in done:
+                    if future in reads:
+                        reads.remove(future)
+                        report, code = future.result()
+                        if code is None:
+                            outputs.put((report, None, None))
+                        else:
+                            transforms.add(
+                                pool.submit(
+                                    transform_source, report, code, options
+                                )
+                            )
+                    else:
+                        transforms.remove(future)
+                        outputs.put(future.result())
+    finally:
+        for thread in threads:
+            outputs.put(None)
+        for thread in threads:
+            thread.join()
 
-            targets.append(
-                NameAst(id=module.alias or module.name, ctx=Store())
+    return reports
+
+
+def print_batch_reports(reports: List[BatchReport]) -> None:
+    """
+    This function prints time and sizes for each obfuscated file.
+    """
+
+    print(f"{'Filename':<40} {'Time (s)':>9} {'Input':>10} {'Output':>10}")
+    for report in sorted(reports, key=lambda report: report.filename):
+        print(
+            f"{report.filename:<40} {report.time:>9.3f} "
+            f"{report.input_size:>10} "
+            + (
+                f"{'error':>10}"
+                if report.error
+                else f"{report.output_size:>10}"
             )
+        )
 
-        astcode = self.get_attributes_from(assign, astcode)
-        astcode = self.generic_visit(astcode)
-        return astcode
+    print(
+        f"{'Total (' + str(len(reports)) + ' files)':<40} "
+        f"{sum(report.time for report in reports):>9.3f} "
+        f"{sum(report.input_size for report in reports):>10} "
+        f"{sum(report.output_size for report in reports):>10}"
+    )
 
-    def visit_ClassDef(self, astcode: ClassDef) -> ClassDef:
-        """
-        This function obfuscates the class name and delete the doc string.
 
-        astcode(ClassDef): the class to obfuscate
-        returns a ClassDef with different name without doc string
-        """
+def print_stats(stats: ObfuscationStats, file: Any = None) -> None:
+    """
+    This function prints statistics of each obfuscation stage
+    and of the names allocator (in file, default: stdout).
+    """
 
-        precedent_class = self.set_namespace_name(astcode.name)
+    print(
+        f"{'Stage':<24} {'Time (ms)':>10} {'Peak memory':>12} "
+        f"{'Input':>10} {'Output':>10}",
+        file=file,
+    )
+    for stage in stats.stages:
+        print(
+            f"{stage.name:<24} {stage.time * 1000:>10.3f} "
+            f"{stage.peak_memory:>12} {stage.input_size:>10} "
+            f"{stage.output_size:>10}",
+            file=file,
+        )
 
-        if self.level >= 1:
-            debug(f"{astcode.name!r} (class definition) obfuscation.")
-            astcode.name = self.get_random_name(
-                astcode.name, bool(precedent_class)
-            ).obfuscation
-            astcode = self.delete_doc_string(astcode)
+    print(
+        f"{'Total':<24} "
+        f"{sum(stage.time for stage in stats.stages) * 1000:>10.3f} "
+        f"{max((stage.peak_memory for stage in stats.stages), default=0):>12}",
+        file=file,
+    )
+    print(f"Names: {stats.names} ({stats.name_retries} retries)", file=file)
 
-        astcode = self.generic_visit(astcode)
-        self.current_class = precedent_class
-        return astcode
 
-    def visit_AsyncFunctionDef(
-        self, astcode: AsyncFunctionDef
-    ) -> AsyncFunctionDef:
-        """
-        This methods obfuscates asynchronous function
-        using the function obfusction.
+def get_metrics(report: BatchReport, level: int) -> Dict[str, Any]:
+    """
+    This function returns the metrics of one obfuscated file
+    (time and expansion ratio of each stage, sizes, names and
+    exports cache).
+
+    Stage expansion ratios are output size / input size of each
+    stage (AST nodes for AST stages, characters or bytes for code
+    stages and for each layer of levels 3 to 6).
+
+    >>> metrics = get_metrics(BatchReport("a.py", "a_obfu.py", 10, 25), 6)
+    >>> metrics["expansion_ratio"], metrics["stages"]
+    (2.5, {})
+    >>> stats = ObfuscationStats([StageStats("gzip", 100, 40)], 0, 0)
+    >>> get_metrics(BatchReport("a.py", "a.py", 10, stats=stats), 3)[
+    ...     "stage_expansion_ratios"
+    ... ]
+    {'gzip': 0.4}
+    >>>
+    """
 
-        astcode(AsyncFunctionDef): asynchronous function to obfuscate
-        returns a AsyncFunctionDef with different name
-        """
+    stats = report.stats or ObfuscationStats([], 0, 0)
+    stages = {}
+    sizes = {}
+    for stage in stats.stages:
+        stages[stage.name] = stages.get(stage.name, 0) + stage.time
+        input_size, output_size = sizes.get(stage.name, (0, 0))
+        sizes[stage.name] = (
+            input_size + stage.input_size,
+            output_size + stage.output_size,
+        )
 
-        return self.visit_FunctionDef(astcode)
+    return {
+        "filename": report.filename,
+        "output_filename": report.output_filename,
+        "level": level,
+        "error": report.error,
+        "time": report.time,
+        "input_size": report.input_size,
+        "output_size": report.output_size,
+        "expansion_ratio": (
+            report.output_size / report.input_size
+            if report.input_size
+            else 0
+        ),
+        "names": stats.names,
+        "name_retries": stats.name_retries,
+        "cache_hits": stats.cache_hits,
+        "cache_misses": stats.cache_misses,
+        "stages": stages,
+        "stage_expansion_ratios": {
+            stage: output_size / input_size
+            for stage, (input_size, output_size) in sizes.items()
+            if input_size
+        },
+    }
+
+
+prometheus_metrics = (
+    ("duration_seconds", "time", "Time to obfuscate the file."),
+    ("input_bytes", "input_size", "Size of the source file."),
+    ("output_bytes", "output_size", "Size of the obfuscate file."),
+    ("expansion_ratio", "expansion_ratio", "Output size / input size."),
+    ("names", "names", "Number of generated names."),
+    ("name_retries", "name_retries", "Number of rejected random names."),
+    ("exports_cache_hits", "cache_hits", "Exports cache hits."),
+    ("exports_cache_misses", "cache_misses", "Exports cache misses."),
+)
 
-    def visit_FunctionDef(self, astcode: FunctionDef) -> FunctionDef:
-        """
-        This function obfuscates function name if isn't a magic method.
+prometheus_stage_metrics = (
+    ("stage_duration_seconds", "stages", "Time of each obfuscation stage."),
+    (
+        "stage_expansion_ratio",
+        "stage_expansion_ratios",
+        "Output size / input size of each obfuscation stage.",
+    ),
+)
 
-        astcode(FunctionDef): function to obfuscate
-        returns a FunctionDef with different name
-        """
 
-        precedent_class = self.set_namespace_name(astcode.name)
+def prometheus_label(value: Any) -> str:
+    r"""
+    This function escapes a Prometheus label value.
 
-        if self.level >= 1:
-            name = astcode.name
-            if not (name.startswith("__") and name.endswith("__")):
-                astcode.name = self.get_random_name(
-                    name, bool(precedent_class)
-                ).obfuscation
-            debug(f"{name!r} function obfuscation.")
-            astcode = self.delete_doc_string(astcode)
+    >>> print(prometheus_label('a"b\\c'))
+    a\"b\\c
+    >>>
+    """
 
-        astcode = self.generic_visit(astcode)
-        self.current_class = precedent_class
-        return astcode
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
 
-    def visit_Name(self, astcode: NameAst) -> NameAst:
-        """
-        This function obfuscates name.
 
-        astcode(Name): the name to obfuscate
-        returns a Name with different id
-        """
+def format_prometheus(metrics: List[Dict[str, Any]]) -> str:
+    """
+    This function returns metrics in the Prometheus text format
+    (for the node exporter textfile collector).
 
-        if self.level >= 1:
-            debug(f"Name obfuscation for {astcode.id!r}")
-            astcode.id = self.get_random_name(astcode.id).obfuscation
+    >>> report = BatchReport("a.py", "a_obfu.py", 10, 25)
+    >>> print(format_prometheus([get_metrics(report, 6)]).splitlines()[2])
+    pyobfuscator_failed{file="a.py",level="6"} 0
+    >>>
+    """
 
-        astcode = self.generic_visit(astcode)
-        return astcode
+    lines = [
+        "# HELP pyobfuscator_failed 1 if the obfuscation failed.",
+        "# TYPE pyobfuscator_failed gauge",
+    ]
+    labels = [
+        f'file="{prometheus_label(metric["filename"])}",'
+        f'level="{prometheus_label(metric["level"])}"'
+        for metric in metrics
+    ]
+
+    for label, metric in zip(labels, metrics):
+        lines.append(
+            f"pyobfuscator_failed{{{label}}} {int(bool(metric['error']))}"
+        )
 
-    def visit_Global(self, astcode: Global) -> Global:
-        """
-        This function obfuscates global names
+    for name, key, help_ in prometheus_metrics:
+        lines.append(f"# HELP pyobfuscator_{name} {help_}")
+        lines.append(f"# TYPE pyobfuscator_{name} gauge")
+        for label, metric in zip(labels, metrics):
+            lines.append(f"pyobfuscator_{name}{{{label}}} {metric[key]}")
+
+    for name, key, help_ in prometheus_stage_metrics:
+        lines.append(f"# HELP pyobfuscator_{name} {help_}")
+        lines.append(f"# TYPE pyobfuscator_{name} gauge")
+        for label, metric in zip(labels, metrics):
+            for stage, value in metric[key].items():
+                lines.append(
+                    f"pyobfuscator_{name}{{{label},"
+                    f'stage="{prometheus_label(stage)}"}} {value}'
+                )
 
-        astcode(Global): AST object to obfuscate
-        returns a Global with different names
-        """
+    return "\n".join(lines) + "\n"
 
-        if self.level >= 1:
-            for i, name in enumerate(astcode.names):
-                astcode.names[i] = self.get_random_name(name).obfuscation
-                debug(f"[Global] {name!r} obfuscation")
 
-        astcode = self.generic_visit(astcode)
-        return astcode
+def write_metrics(filename: str, metrics: List[Dict[str, Any]]) -> None:
+    """
+    This function writes metrics of obfuscated files (see get_metrics).
 
-    def visit_arg(self, astcode: arg) -> arg:
-        """
-        This function obfuscates AST arg
+    Metrics are written in the Prometheus text format when the
+    filename ends with '.prom' (the file is replaced atomically for
+    the textfile collector), else they are appended as JSON lines
+    (with a timestamp).
+    """
 
-        astcode(arg): the arg to obfuscate
-        returns a AST arg with different arg name
-        """
+    from json import dumps
 
-        if self.level >= 1:
-            debug(f"arg obfuscation for {astcode.arg}")
-            self.delete_field(astcode, "annotation")
-            astcode.arg = self.get_random_name(astcode.arg).obfuscation
+    if filename.endswith(".prom"):
+        write_atomic(filename, format_prometheus(metrics).encode())
+        return None
 
-        astcode = self.generic_visit(astcode)
-        return astcode
+    from time import time
 
-    def visit_Attribute(self, attribute: Attribute) -> Attribute:
-        """
-        This function adds an attributes to define when
-        the attribute should be obfuscated.
+    timestamp = time()
+    with open(filename, "a", encoding="utf-8") as file:
+        for metric in metrics:
+            file.write(dumps({"timestamp": timestamp, **metric}) + "\n")
 
-        attribute: Attribute object
-        return an Attribute object with obfuscate name
-        """
 
-        attribute = self.generic_visit(attribute)
-        if self.in_assign:
-            debug(f"Attribute assignation for {attribute.attr!r}")
-            attribute.is_attribute = True
-            self.get_random_name(attribute.attr).is_attribute = True
-        elif (name := self.default_names.get(attribute.attr)) is not None:
-            debug(
-                f"Define attribute obfuscation for: {attribute.attr!r}"
-                f" (defined: {name.is_attribute})"
-            )
-            attribute.is_attribute = name.is_attribute
-        else:
-            debug(f"No attribute obfuscation for: {attribute.attr!r}")
-            attribute.is_attribute = False
+class BudgetReport:
 
-        return attribute
+    """
+    This class contains benchmark times and kept
+    transforms for one file obfuscated with a performance budget.
+    """
 
-    def visit_AnnAssign(self, astcode: AnnAssign) -> Assign:
+    def __init__(
+        self,
+        filename: str,
+        output_filename: str = None,
+        original_time: float = 0,
+        time: float = 0,
+        kept: List[str] = None,
+        within_budget: bool = False,
+        error: str = None,
+    ):
+        self.filename = filename
+        self.output_filename = output_filename
+        self.original_time = original_time
+        self.time = time
+        self.kept = kept
+        self.within_budget = within_budget
+        self.error = error
+
+    @property
+    def slowdown(self) -> float:
         """
-        This function obfuscates assignation.
-
-        astcode(AnnAssign): assign with annotation
-        return an Assign obfuscated
+        This function returns the obfuscated code slowdown (0.1 is 10%).
         """
 
-        if self.level >= 1:
-            if isinstance(astcode.annotation, Name):
-                debug(f"Delete annotation {astcode.annotation.id} from Assign")
-            elif isinstance(astcode.annotation, Call):
-                debug(
-                    f"Delete annotation {astcode.annotation.func.id} ""from Assign"
-                )
-            else:
-                debug("Delete unknown type annotation")
+        return self.time / self.original_time - 1 if self.original_time else 0
 
-            assign = Assign(
-                targets=[astcode.target],
-                value=astcode.value if astcode.value else Constant(value=None),
-            )
-            astcode = self.get_attributes_from(assign, astcode)
 
-        return self.generic_visit(astcode)
+budget_transforms = (
+    ("constants", {"constants": False}),
+    ("attributes", {"attributes": False}),
+    ("layers", {"level": 2}),
+)
 
-    def visit_Assign(self, assign: Assign) -> Assign:
-        """
-        This function defines attribute obfuscation mode.
 
-        assign: Assign object
-        return an Assign object with obfuscation
-        """
+def run_benchmark(command: str, filename: str, repeat: int = 3) -> float:
+    """
+    This function runs the benchmark command ('{file}' is replaced
+    by filename) and returns the best time on `repeat` runs.
 
-        self.in_assign = True
-        for index, astcode in enumerate(assign.targets):
-            if isinstance(astcode, AST) and (
-                return_value := self.visit(astcode)
-            ):
-                assign.targets[index] = return_value
-        self.in_assign = False
+    This function raises CalledProcessError if the command fails.
+    """
 
-        if isinstance(assign.value, AST) and (
-            return_value := self.visit(assign.value)
-        ):
-            assign.value = return_value
-        if isinstance(assign.type_comment, AST) and (
-            return_value := self.visit(assign.type_comment)
-        ):
-            assign.type_comment = return_value
+    from subprocess import run, DEVNULL
+    from shlex import split
+
+    arguments = [
+        argument.replace("{file}", filename) for argument in split(command)
+    ]
+
+    best_time = None
+    for _ in range(repeat):
+        start = perf_counter()
+        run(arguments, check=True, stdout=DEVNULL)
+        duration = perf_counter() - start
+        if best_time is None or duration < best_time:
+            best_time = duration
 
-        return assign
+    return best_time
 
-    def visit_AugAssign(self, assign: AugAssign) -> AugAssign:
-        """
-        This function defines attribute obfuscation mode.
 
-        assign: AugAssign object
-        return an AugAssign object with obfuscation
-        """
+def budget_obfuscation(
+    filename: str,
+    command: str,
+    max_slowdown: float = 0.1,
+    output_filename: str = None,
+    repeat: int = 3,
+    **options: Any,
+) -> BudgetReport:
+    """
+    This function obfuscates a file with a performance budget: the
+    benchmark command runs on the original and the obfuscated file
+    and the most expensive transforms (see budget_transforms) are
+    disabled one by one until the slowdown is less than max_slowdown.
+
+    command(str):              benchmark command, '{file}' is replaced by
+        the original or the obfuscate filename (example: 'python3 {file}')
+    max_slowdown(float):       maximum slowdown (0.1 is 10%)
+    options:                   Obfuscator arguments (level, password, ...)
+        names are defined as {<name>: <obfuscation name>}
+    """
 
-        self.in_assign = True
-        if isinstance(assign.target, AST) and (
-            return_value := self.visit(assign.target)
-        ):
-            assign.target = return_value
-        self.in_assign = False
-        if isinstance(assign.value, AST) and (
-            return_value := self.visit(assign.value)
-        ):
-            assign.value = return_value
-        if isinstance(assign.op, AST) and (
-            return_value := self.visit(assign.op)
-        ):
-            assign.op = return_value
-        return assign
+    report = BudgetReport(filename)
+    level = options.get("level", 6)
+    steps = [
+        (name, step)
+        for name, step in budget_transforms
+        if name != "layers" or level > 2
+    ]
 
-    def write_deobfuscate(self) -> None:
-        """
-        This function saves configuration and the mapping between
-        variable names and obfuscation names.
-        """
+    try:
+        report.original_time = run_benchmark(command, filename, repeat)
 
-        if not self.deobfuscate:
-            return None
+        for index in range(len(steps) + 1):
+            step_options = options.copy()
+            for _, step in steps[:index]:
+                step_options.update(step)
 
-        config = {
-            "Obfuscator": {
-                "level": self.level,
-                "encoding": self.encoding,
-                "output_file": self.output_filename,
-                "default_obfuscation": self.using_default_obfu,
-            },
-            "encryption_key": self.password,
-            "names": [
-                {
-                    "name": name.name,
-                    "definition": name.is_attribute,
-                    "namespace": name.namespace_name,
-                    "obfuscation_name": name.obfuscation,
-                }
-                for name in self.default_names.values()
-            ],
-        }
+            obfuscation = obfuscate_file(
+                filename, output_filename, step_options
+            )
+            if obfuscation.error:
+                raise RuntimeError(obfuscation.error)
 
-        with open("deobfuscate.json", "w", encoding=self.encoding) as file:
-            dump(config, file)
+            report.output_filename = obfuscation.output_filename
+            report.time = run_benchmark(
+                command, obfuscation.output_filename, repeat
+            )
+            report.kept = [name for name, _ in steps[index:]]
+            report.within_budget = report.slowdown <= max_slowdown
 
-        debug("Writing file deobfuscate.txt")
+            info(
+                "Budget %r: %.1f%% slowdown with %s.",
+                filename,
+                report.slowdown * 100,
+                ", ".join(report.kept) or "no expensive transform",
+            )
+            if report.within_budget:
+                break
+    except Exception as error:
+        report.error = f"{error.__class__.__name__}: {error}"
 
+    return report
 
-class AttributeObfuscation(NodeTransformer):
 
+def print_budget_reports(reports: List[BudgetReport]) -> None:
     """
-    This class obfuscates attribute name.
+    This function prints benchmark times and kept transforms
+    for each file obfuscated with a performance budget.
     """
 
-    def __init__(self, obfuscator: Obfuscator):
-        self.default_names = obfuscator.default_names
-        self.obfu_names = obfuscator.obfu_names
-        self.obfuscator = obfuscator
-        self.in_assign = False
+    print(
+        f"{'Filename':<40} {'Original':>9} {'Obfuscate':>9} "
+        f"{'Slowdown':>8}  Kept transforms"
+    )
+    for report in sorted(reports, key=lambda report: report.filename):
+        if report.error:
+            print(f"{report.filename:<40} error: {report.error}")
+            continue
+
+        print(
+            f"{report.filename:<40} {report.original_time:>9.3f} "
+            f"{report.time:>9.3f} {report.slowdown:>8.1%}  "
+            + (", ".join(report.kept) or "-")
+            + ("" if report.within_budget else " (over budget)")
+        )
 
-    def visit_Assign(self, assign: Assign) -> Assign:
+
+class Watcher:
+
+    """
+    This class watches python files in a directory and obfuscates
+    only new and modified files (detected with a stat snapshot).
+
+    All files share the same names map: names of unchanged modules
+    stay stable and modified modules reuse them, so obfuscate
+    modules importing each other still work after a rebuild.
+    The names map and the snapshot are saved in the state file
+    (pyobfuscator_watch.json in the output directory or in the
+    watched directory) and loaded on start: after a restart only
+    modified files and files without obfuscate file are obfuscated,
+    with the same names. Obfuscate files of deleted files are removed.
+
+    directory(str):            directory to watch
+    output_directory(str):     directory to write obfuscate files
+        (same tree as directory, default: <filename>_obfu.py next to
+        each file)
+    options:                   Obfuscator arguments (level, password, ...)
+        names are defined as {<name>: <obfuscation name>}
+    """
+
+    def __init__(
+        self, directory: str, output_directory: str = None, **options: Any
+    ):
+        self.directory = directory
+        self.output_directory = output_directory and abspath(output_directory)
+        self.state_filename = join(
+            output_directory or directory, "pyobfuscator_watch.json"
+        )
+        self.names = {}
+        self.snapshot = {}
+        self.outputs = None
+        self.load_state()
+        self.names.update(
+            {
+                name: Name(name, obfuscation, False, None)
+                for name, obfuscation in options.pop("names", {}).items()
+            }
+        )
+        self.options = options
+
+    def load_state(self) -> None:
+        """
+        This function loads the names map and the snapshot
+        of the previous run from the state file.
         """
-        This function defines attribute obfuscation mode.
 
-        assign: Assign object
-        return an Assign object with obfuscation
+        from json import loads
+
+        if not isfile(self.state_filename):
+            return None
+
+        try:
+            with open(self.state_filename, encoding="utf-8") as file:
+                state = loads(file.read())
+            names = {
+                name["name"]: Name(
+                    name["name"],
+                    name["obfuscation_name"],
+                    name["definition"],
+                    name["namespace"],
+                )
+                for name in state["names"]
+            }
+            snapshot = {
+                filename: tuple(status)
+                for filename, status in state["sources"].items()
+            }
+        except (ValueError, KeyError, TypeError):
+            info("Invalid watch state: %r", self.state_filename)
+            return None
+
+        self.names = names
+        self.snapshot = snapshot
+
+    def save_state(self) -> None:
+        """
+        This function saves the names map and the snapshot
+        in the state file (replaced atomically).
         """
 
-        self.in_assign = True
-        assign = self.generic_visit(assign)
-        self.in_assign = False
-        return assign
+        from json import dumps
 
-    def visit_AugAssign(self, assign: AugAssign) -> AugAssign:
+        write_atomic(
+            self.state_filename,
+            dumps(
+                {
+                    "names": [
+                        {
+                            "name": name.name,
+                            "definition": name.is_attribute,
+                            "namespace": name.namespace_name,
+                            "obfuscation_name": name.obfuscation,
+                        }
+                        for name in self.names.values()
+                    ],
+                    "sources": self.snapshot,
+                }
+            ).encode(),
+        )
+
+    def get_snapshot(self) -> Dict[str, Tuple[int, int]]:
         """
-        This function defines attribute obfuscation mode.
+        This function returns python files to obfuscate as
+        filename: (modification time in nanoseconds, size).
 
-        assign: AugAssign object
-        return an AugAssign object with obfuscation
+        Obfuscate files and the output directory are ignored.
         """
 
-        self.in_assign = True
-        assign = self.generic_visit(assign)
-        self.in_assign = False
-        return assign
+        snapshot = {}
+        directories = [self.directory]
+
+        while directories:
+            try:
+                entries = scandir(directories.pop())
+            except OSError:
+                continue
+
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if abspath(entry.path) != self.output_directory:
+                            directories.append(entry.path)
+                    elif entry.name.endswith(".py") and not (
+                        entry.name.endswith("_obfu.py")
+                    ):
+                        try:
+                            status = entry.stat()
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (
+                            status.st_mtime_ns,
+                            status.st_size,
+                        )
+
+        return snapshot
+
+    def get_output_filename(self, filename: str) -> str:
+        """
+        This function returns the obfuscate filename for a watched file.
+        """
 
-    def visit_JoinedStr(self, astcode: JoinedStr) -> JoinedStr:
+        if not self.output_directory:
+            return f"{splitext(filename)[0]}_obfu.py"
+
+        return join(
+            self.output_directory,
+            f"{splitext(relpath(filename, self.directory))[0]}_obfu.py",
+        )
+
+    def remove_output(self, filename: str) -> None:
         """
-        This function changes the visit_Constant's behaviour.
+        This function removes the obfuscate file and the deobfuscate
+        configuration of a deleted watched file.
         """
 
-        self.obfuscator.in_format_string = True
-        astcode = self.generic_visit(astcode)
-        self.obfuscator.in_format_string = False
-        return astcode
+        output_filename = self.outputs.pop(
+            filename, None
+        ) or self.get_output_filename(filename)
 
-    def visit_Attribute(self, attribute: Attribute) -> Attribute:
+        for filename in (
+            output_filename,
+            f"{splitext(output_filename)[0]}_deobfuscate.json",
+        ):
+            try:
+                remove(filename)
+            except FileNotFoundError:
+                continue
+            info("%r is removed.", filename)
+
+    def poll(self) -> List[BatchReport]:
         """
-        This function obfuscate attribute name.
+        This function obfuscates files created or modified since
+        the last poll and returns a report for each file.
 
-        attribute: Attribute object
-        return an Attribute object with obfuscate name
+        A file with an error (a syntax error while it is edited)
+        is obfuscated again on the next modification. Obfuscate files
+        are known from the previous polls, they are only checked on
+        the first poll: a file without obfuscate file is obfuscated.
         """
 
-        if (name := self.default_names.get(attribute.attr)) is not None:
-            debug(
-                f"Change attribute: {attribute.attr!r} "
-                f"(defined: {name.is_attribute})"
+        snapshot = self.get_snapshot()
+        missing = set()
+
+        if self.outputs is None:
+            self.outputs = {}
+            for filename in snapshot:
+                output_filename = self.get_output_filename(filename)
+                if isfile(output_filename):
+                    self.outputs[filename] = output_filename
+                else:
+                    missing.add(filename)
+
+        filenames = sorted(
+            filename
+            for filename, status in snapshot.items()
+            if self.snapshot.get(filename) != status or filename in missing
+        )
+        deleted = self.snapshot.keys() - snapshot.keys()
+
+        for filename in deleted:
+            info("%r is deleted.", filename)
+            self.remove_output(filename)
+
+        self.snapshot = snapshot
+        reports = []
+
+        for filename in filenames:
+            report = BatchReport(
+                filename, self.get_output_filename(filename), 0
             )
-            if attribute.is_attribute:
-                attribute.attr = name.obfuscation
+            start = perf_counter()
+            try:
+                report.input_size = getsize(filename)
+                makedirs(dirname(report.output_filename), exist_ok=True)
+                obfuscator = Obfuscator(
+                    filename,
+                    report.output_filename,
+                    names=self.names,
+                    **self.options,
+                )
+                obfuscator.deobfuscate_filename = (
+                    f"{splitext(report.output_filename)[0]}_deobfuscate.json"
+                )
+                obfuscator.default_obfuscation()
+                report.output_size = getsize(report.output_filename)
+                self.outputs[filename] = report.output_filename
+            except Exception as error:
+                report.error = f"{error.__class__.__name__}: {error}"
 
-        if self.in_assign:
-            return attribute
+            report.time = perf_counter() - start
+            reports.append(report)
 
-        constant = Constant(value=attribute.attr, kind=None)
+        if filenames or deleted:
+            self.save_state()
 
-        if attribute.attr != "decode":
-            constant = self.obfuscator.visit_Constant(constant)
+        return reports
 
-        return Call(
-            func=NameAst(
-                id=self.default_names["getattr"].obfuscation, ctx=Load()
-            ),
-            args=[attribute.value, constant],
-            keywords=[],
-        )
+    def run(self, interval: float = 1.0) -> None:
+        """
+        This function obfuscates all files and then polls the
+        directory every interval seconds until KeyboardInterrupt.
+        """
 
+        from time import sleep
+
+        try:
+            while True:
+                for report in self.poll():
+                    print(
+                        f"{report.filename} -> "
+                        + (
+                            f"error: {report.error}"
+                            if report.error
+                            else f"{report.output_filename} "
+                            f"({report.time:.3f} s)"
+                        ),
+                        flush=True,
+                    )
+                sleep(interval)
+        except KeyboardInterrupt:
+            pass
 
-def parse_args() -> Namespace:
+
+def parse_args() -> "Namespace":
     """
     This function parses command line arguments.
     """
 
+    from argparse import ArgumentParser
+
     parser = ArgumentParser(description="This tool obfuscates python code.")
     add_argument = parser.add_argument
 
-    add_argument("filename")
+    add_argument(
+        "filenames",
+        nargs="*",
+        help=(
+            "Python files or glob patterns to obfuscate ('-' to read stdin"
+            " and write stdout). With many files, --output-filename is the"
+            " output directory."
+        ),
+    )
     add_argument(
         "--output-filename",
         "--output",
@@ -1457,10 +4986,228 @@ def parse_args() -> Namespace:
         action="store_true",
         help="Print the obfuscate code in console.",
     )
+    add_argument(
+        "--compression",
+        "-c",
+        default="gzip",
+        choices=compressions.keys(),
+        help="Codec to compress the code (level 3 or greater).",
+    )
+    add_argument(
+        "--compression-level",
+        "-C",
+        type=int,
+        default=None,
+        help="Compression level (default: codec default level).",
+    )
+    add_argument(
+        "--compression-benchmark",
+        "-b",
+        action="store_true",
+        help="Print compressed size and decompression time for each codec.",
+    )
+    add_argument(
+        "--serve",
+        default=None,
+        help=(
+            "Start the obfuscation daemon on <unix socket>"
+            " or <loopback host>:<port>."
+        ),
+    )
+    add_argument(
+        "--workers",
+        "-j",
+        type=int,
+        default=None,
+        help="Number of worker processes for daemon and many files.",
+    )
+    add_argument(
+        "--io-threads",
+        "-k",
+        type=int,
+        default=4,
+        help="Number of reader and writer threads for many files.",
+    )
+    add_argument(
+        "--watch",
+        "-W",
+        default=None,
+        help=(
+            "Watch python files in this directory and obfuscate modified"
+            " files (--output-filename is the output directory)."
+        ),
+    )
+    add_argument(
+        "--watch-interval",
+        "-i",
+        type=float,
+        default=1.0,
+        help="Seconds between two scans of the watched directory.",
+    )
+    add_argument(
+        "--connect",
+        default=None,
+        help="Send the file to the obfuscation daemon on this address.",
+    )
+    add_argument(
+        "--archive",
+        "-A",
+        default=None,
+        help=(
+            "Obfuscate all modules of the directory (filename) in this "
+            "encrypted archive, loaded lazily by the runtime module "
+            "(output filename, default: pyobfuscator_runtime.py)."
+        ),
+    )
+    add_argument(
+        "--armor",
+        "-a",
+        default="base85",
+        choices=armors.keys(),
+        help="Encoding to use for level 5 (base64 and base16 are C-backed).",
+    )
+    add_argument(
+        "--lazy",
+        "-z",
+        action="store_true",
+        help="Decrypt and compile each top-level function on first call.",
+    )
+    add_argument(
+        "--combined-loader",
+        "-L",
+        action="store_true",
+        help="Undo all compression, encryption and encoding in one loader.",
+    )
+    add_argument(
+        "--minify",
+        "-m",
+        action="store_true",
+        help="Give the shortest names to the most used identifiers.",
+    )
+    add_argument(
+        "--scopes",
+        "-S",
+        action="store_true",
+        help="Rename function locals per scope (names reused by functions).",
+    )
+    add_argument(
+        "--stats",
+        "-t",
+        action="store_true",
+        help="Print time, memory and sizes of each obfuscation stage.",
+    )
+    add_argument(
+        "--metrics",
+        "-X",
+        help="Write metrics as JSON lines (or Prometheus text for *.prom).",
+    )
+    add_argument(
+        "--trace-events",
+        help="Write structured events of the obfuscated AST nodes"
+        " (JSON lines, appended).",
+    )
+    add_argument(
+        "--trace-sample",
+        "-u",
+        type=float,
+        default=1,
+        help="Part of the AST nodes written in --trace-events (default: 1).",
+    )
+    add_argument(
+        "--runtime-stats",
+        "-I",
+        action="store_true",
+        help="Record decode layers time and decrypt/getattr calls at runtime"
+        " (report written at exit when PYOBFUSCATOR_RUNTIME_STATS is set).",
+    )
+    add_argument(
+        "--fast-xor",
+        "-x",
+        action="store_true",
+        help="Decrypt strings with big integers XOR (faster long strings).",
+    )
+    add_argument(
+        "--profile",
+        "-P",
+        help=(
+            "cProfile/pstats file or JSON calls count trace of the original "
+            "code: hot functions are only renamed."
+        ),
+    )
+    add_argument(
+        "--hot-threshold",
+        "-T",
+        type=float,
+        default=0.05,
+        help="Profile share from which a function is hot (default: 0.05).",
+    )
+    add_argument(
+        "--no-hoist",
+        dest="hoist",
+        action="store_false",
+        help="Do not decrypt constants used in loops once before the loop.",
+    )
+    add_argument(
+        "--shared-runtime",
+        "-R",
+        action="store_true",
+        help=(
+            "With multiple files or --archive, define helpers once in a "
+            "runtime module imported by all obfuscate modules "
+            "(pyobfuscator_runtime.py)."
+        ),
+    )
+    add_argument(
+        "--benchmark",
+        "-B",
+        help=(
+            "Benchmark command ('{file}' is replaced by the original or the "
+            "obfuscate filename): expensive transforms are disabled until "
+            "the slowdown is less than --max-slowdown."
+        ),
+    )
+    add_argument(
+        "--max-slowdown",
+        "-M",
+        type=float,
+        default=0.1,
+        help="Maximum slowdown with --benchmark (default: 0.1, 10%%).",
+    )
+    add_argument(
+        "--exports-cache",
+        "-E",
+        default=join(
+            expanduser("~"), ".cache", "PyObfuscator", "exports.json"
+        ),
+        help="JSON file to cache names of 'from <module> import *'.",
+    )
     add_argument("--log-level", "-g", type=int, default=40, help="Log level.")
     add_argument("--log-filename", "-f", default=None, help="Log filename.")
 
-    return parser.parse_args()
+    arguments = parser.parse_args()
+    levels = compressions[arguments.compression].levels
+
+    if not (arguments.filenames or arguments.serve or arguments.watch):
+        parser.error(
+            "the following arguments are required: filenames"
+            " (or --serve or --watch)"
+        )
+
+    if arguments.serve:
+        host, port = parse_address(arguments.serve)
+        if port is not None and not is_loopback(host):
+            parser.error(
+                "argument --serve: the daemon only listens on loopback"
+                " addresses (or unix sockets)"
+            )
+
+    if arguments.compression_level not in (None, *levels):
+        parser.error(
+            f"argument --compression-level/-C: {arguments.compression} levels"
+            f" are {levels.start} to {levels.stop - 1}"
+        )
+
+    return arguments
 
 
 def main() -> int:
@@ -1468,6 +5215,8 @@ def main() -> int:
     This function starts this tool from command line.
     """
 
+    from json import dump
+
     args = parse_args()
 
     names = {}
@@ -1483,21 +5232,225 @@ def main() -> int:
         format="%(levelname)s - %(message)s",
     )
 
+    filenames = get_filenames(args.filenames)
+    filename = filenames[0] if filenames else None
+
+    # constants and attributes are only disabled by the performance budget
+    options = {
+        option: getattr(args, option)
+        for option in job_options + host_options
+        if option not in ("encoding", "constants", "attributes")
+    }
+    options["encoding"] = args.file_encoding
+    names_map = {name.name: name.obfuscation for name in names.values()}
+
+    if filename == "-":
+        print(copyright, file=stderr)
+        code = stdin.read()
+        start = perf_counter()
+        result = Obfuscator(
+            "-",
+            args.output_filename,
+            names=names,
+            deobfuscate=args.deobfuscate,
+            stats=args.stats or bool(args.metrics),
+            trace_memory=args.stats,
+            **options,
+        ).obfuscate(code)
+        end = perf_counter()
+
+        if args.output_filename:
+            with open(
+                args.output_filename, "w", encoding=args.file_encoding
+            ) as file:
+                file.write(result.code)
+        else:
+            stdout.write(result.code)
+
+        if args.deobfuscate:
+            with open("deobfuscate.json", "w", encoding="utf-8") as file:
+                dump(result.configuration, file)
+
+        if args.stats:
+            print_stats(result.stats, stderr)
+
+        if args.metrics:
+            report = BatchReport(
+                "-",
+                args.output_filename or "-",
+                len(code.encode(args.file_encoding)),
+                len(result.code.encode(args.file_encoding)),
+                end - start,
+                stats=result.stats,
+            )
+            write_metrics(args.metrics, [get_metrics(report, args.level)])
+
+        return 0
+
+    print(copyright)
+
+    if args.serve:
+        from asyncio import run
+
+        run(
+            serve(
+                args.serve,
+                args.workers,
+                **{option: options[option] for option in host_options},
+            )
+        )
+        return 0
+
+    if args.watch:
+        Watcher(
+            args.watch,
+            args.output_filename,
+            names=names_map,
+            deobfuscate=args.deobfuscate,
+            **options,
+        ).run(args.watch_interval)
+        return 0
+
+    if args.connect:
+        with open(filename, encoding=args.file_encoding) as file:
+            code = file.read()
+
+        result = client(
+            args.connect,
+            {
+                "filename": filename,
+                "code": code,
+                "options": {
+                    **{
+                        option: value
+                        for option, value in options.items()
+                        if option not in host_options
+                    },
+                    "names": names_map,
+                },
+            },
+        )
+
+        if "error" in result:
+            print(result["error"], file=stderr)
+            return 1
+
+        output_filename = (
+            args.output_filename or f"{splitext(filename)[0]}_obfu.py"
+        )
+        with open(output_filename, "w", encoding=args.file_encoding) as file:
+            file.write(result["code"])
+
+        if args.deobfuscate:
+            with open("deobfuscate.json", "w", encoding="utf-8") as file:
+                dump(
+                    {
+                        key: value
+                        for key, value in result.items()
+                        if key != "code"
+                    },
+                    file,
+                )
+
+        if args.print:
+            print(result["code"])
+
+        return 0
+
+    if args.benchmark:
+        reports = [
+            budget_obfuscation(
+                filename,
+                args.benchmark,
+                args.max_slowdown,
+                args.output_filename if len(filenames) == 1 else None,
+                names=names_map,
+                deobfuscate=args.deobfuscate,
+                **options,
+            )
+            for filename in filenames
+        ]
+        print_budget_reports(reports)
+        return int(
+            any(report.error or not report.within_budget for report in reports)
+        )
+
+    if len(filenames) > 1:
+        reports = batch_obfuscation(
+            filenames,
+            args.output_filename,
+            args.workers,
+            readers=args.io_threads,
+            writers=args.io_threads,
+            names=names_map,
+            deobfuscate=args.deobfuscate,
+            **options,
+            stats=bool(args.metrics),
+            trace_memory=False,
+            runtime="pyobfuscator_runtime" if args.shared_runtime else None,
+        )
+        print_batch_reports(reports)
+
+        if args.metrics:
+            write_metrics(
+                args.metrics,
+                [get_metrics(report, args.level) for report in reports],
+            )
+
+        return 1 if any(report.error for report in reports) else 0
+
+    if args.archive:
+        build_archive(
+            filename,
+            args.archive,
+            args.output_filename,
+            args.level,
+            names,
+            args.password,
+            args.file_encoding,
+            args.names_size,
+            args.shared_runtime,
+        )
+        return 0
+
     obfu = Obfuscator(
-        args.filename,
+        filename,
         args.output_filename,
-        args.level,
-        names,
-        args.deobfuscate,
-        args.password,
-        args.file_encoding,
-        args.names_size,
+        names=names,
+        deobfuscate=args.deobfuscate,
+        stats=args.stats or bool(args.metrics),
+        trace_memory=args.stats,
+        **options,
     )
+    start = perf_counter()
     obfu.default_obfuscation()
+    end = perf_counter()
 
     if args.print:
         print(obfu.code)
 
+    if args.stats:
+        print_stats(obfu.get_stats())
+
+    if args.metrics:
+        report = BatchReport(
+            filename,
+            obfu.output_filename,
+            getsize(filename),
+            getsize(obfu.output_filename),
+            end - start,
+            stats=obfu.get_stats(),
+        )
+        write_metrics(args.metrics, [get_metrics(report, args.level)])
+
+    if args.compression_benchmark:
+        print("Codec  Level  Size (bytes)  Decompression (ms)")
+        for report in obfu.compression_benchmark():
+            print(
+                f"{report.codec:<6} {report.level:>5}  {report.size:>12}"
+                f"  {report.decompress_time * 1000:>18.3f}"
+            )
+
     return 0
 
 
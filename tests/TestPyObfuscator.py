@@ -28,10 +28,12 @@ Tests:
 default_dir = dir()
 
 from os import path, getcwd, remove, environ
-from unittest.mock import MagicMock, Mock
+from unittest.mock import MagicMock, Mock, patch
 from unittest import TestCase
 import unittest
+import argparse
 import json
+import time
 import ast
 import sys
 
@@ -81,6 +83,13 @@ class Test_Name(TestCase):
             "obfu_name",
             "When Name.obfuscation is defined as 'obfu_name', isn't equal to 'obfu_name'",
         )
+        self.assertEqual(name, Name("name", "obfu_name"))
+        self.assertNotEqual(name, Name("name", "obfu_name", True))
+        self.assertEqual(
+            repr(name),
+            "Name(name='name', obfuscation='obfu_name',"
+            " is_attribute=False, namespace_name=None)",
+        )
 
 
 class Test_AttributeObfuscation(TestCase):
@@ -155,12 +164,45 @@ class Test_AttributeObfuscation(TestCase):
 
 class Test_Function(TestCase):
     def test_parse_args(self):
-        PyObfuscator.ArgumentParser.parse_args = Mock()
+        argparse.ArgumentParser.parse_args = Mock(
+            return_value=Mock(
+                compression="gzip", compression_level=None, serve=None
+            )
+        )
         parse_args()
-        PyObfuscator.ArgumentParser.parse_args.assert_called_once_with()
+        argparse.ArgumentParser.parse_args.assert_called_once_with()
 
     def test_main(self):
-        PyObfuscator.parse_args = Mock(return_value=Mock(names=["test:test"]))
+        PyObfuscator.parse_args = Mock(
+            return_value=Mock(
+                names=["test:test"],
+                filenames=["test.py"],
+                compression="gzip",
+                compression_level=None,
+                compression_benchmark=False,
+                combined_loader=False,
+                armor="base85",
+                archive=None,
+                lazy=False,
+                exports_cache=None,
+                shared_runtime=False,
+                minify=False,
+                scopes=False,
+                profile=None,
+                hot_threshold=0.05,
+                fast_xor=False,
+                hoist=True,
+                runtime_stats=False,
+                trace_events=None,
+                trace_sample=1,
+                stats=False,
+                metrics=None,
+                benchmark=None,
+                serve=None,
+                watch=None,
+                connect=None,
+            )
+        )
         default_obfuscation = Obfuscator.default_obfuscation
         Obfuscator.default_obfuscation = Mock()
         main()
@@ -169,6 +211,807 @@ class Test_Function(TestCase):
         Obfuscator.default_obfuscation = default_obfuscation
 
 
+class Test_Archive(TestCase):
+    def test_build_archive(self):
+        from tempfile import TemporaryDirectory
+        from importlib.util import spec_from_file_location, module_from_spec
+        from os import mkdir
+
+        with TemporaryDirectory() as directory:
+            package = path.join(directory, "archived_package")
+            mkdir(package)
+
+            with open(path.join(package, "__init__.py"), "w") as file:
+                file.write("from .values import get_value\n")
+            with open(path.join(package, "values.py"), "w") as file:
+                file.write("def get_value():\n    return 'archived value'\n")
+            with open(path.join(package, "unused.py"), "w") as file:
+                file.write("raise RuntimeError('unused module imported')\n")
+
+            archive = path.join(directory, "modules.pyobf")
+            runtime = path.join(directory, "runtime.py")
+            names = PyObfuscator.build_archive(package, archive, runtime)
+
+            self.assertTrue(path.isfile(archive))
+            with open(archive, "rb") as file:
+                self.assertNotIn(b"archived value", file.read())
+
+            spec = spec_from_file_location("runtime", runtime)
+            module = module_from_spec(spec)
+            spec.loader.exec_module(module)
+
+            try:
+                self.assertEqual(
+                    set(module.importer.modules),
+                    {
+                        "archived_package",
+                        "archived_package.values",
+                        "archived_package.unused",
+                    },
+                )
+                import archived_package
+
+                self.assertEqual(
+                    getattr(
+                        archived_package, names["get_value"].obfuscation
+                    )(),
+                    "archived value",
+                )
+                self.assertIn("archived_package.values", sys.modules)
+                self.assertNotIn("archived_package.unused", sys.modules)
+            finally:
+                sys.meta_path.remove(module.importer)
+                for name in ("archived_package", "archived_package.values"):
+                    sys.modules.pop(name, None)
+
+
+    def test_archive_shared_runtime_script(self):
+        from tempfile import TemporaryDirectory
+        from subprocess import run
+        from os import makedirs
+
+        with TemporaryDirectory() as directory:
+            package = path.join(directory, "pk", "script_package")
+            makedirs(package)
+            makedirs(path.join(directory, "arch"))
+            with open(path.join(package, "__init__.py"), "w") as file:
+                file.write("from .values import value\n")
+            with open(path.join(package, "values.py"), "w") as file:
+                file.write("value = 'archived ' + str(len('value'))\n")
+
+            process = run(
+                [
+                    sys.executable,
+                    PyObfuscator.__file__,
+                    package,
+                    "-A",
+                    path.join("arch", "mods.pyobf"),
+                    "-o",
+                    path.join("arch", "pyobfuscator_runtime.py"),
+                    "-l",
+                    "6",
+                    "-R",
+                ],
+                cwd=directory,
+                capture_output=True,
+                text=True,
+            )
+            self.assertEqual(process.returncode, 0, process.stderr)
+
+            process = run(
+                [
+                    sys.executable,
+                    "-c",
+                    "import pyobfuscator_runtime, script_package, sys\n"
+                    "print(*vars(sys.modules['script_package.values'])"
+                    ".values(), sep='\\n')",
+                ],
+                cwd=path.join(directory, "arch"),
+                capture_output=True,
+                text=True,
+            )
+            self.assertEqual(process.returncode, 0, process.stderr)
+            self.assertIn("archived 5", process.stdout.splitlines())
+
+
+class Test_Runtime(TestCase):
+    def test_shared_runtime(self):
+        from tempfile import TemporaryDirectory
+
+        with TemporaryDirectory() as directory:
+            names, key = PyObfuscator.build_runtime(
+                path.join(directory, "shared_runtime.py")
+            )
+            self.assertEqual(len(key), 40)
+            sys.path.insert(0, directory)
+
+            try:
+                for level in (1, 2, 6):
+                    environ["test"] = ""
+                    result = PyObfuscator.obfuscate(
+                        "from os import environ\n"
+                        "environ['test'] = str(len('runtime'))",
+                        level=level,
+                        names=names,
+                        runtime="shared_runtime",
+                        strings_key=key,
+                    )
+                    namespace = {
+                        name: None
+                        for name in default_dir
+                        if name != "__builtins__"
+                    }
+                    exec(result.code, namespace)
+                    self.assertEqual(environ["test"], "7")
+
+                    if level == 2:
+                        self.assertIn(
+                            "from shared_runtime import *", result.code
+                        )
+                        self.assertNotIn("lambda", result.code)
+
+                runtime = sys.modules["shared_runtime"]
+                xor = getattr(runtime, names["xor"].obfuscation)
+                self.assertIs(xor(b"cached"), xor(b"cached"))
+            finally:
+                sys.path.remove(directory)
+                sys.modules.pop("shared_runtime", None)
+
+
+class Test_InMemory(TestCase):
+    def test_obfuscate(self):
+        namespace = {
+            name: None
+            for name in default_dir
+            if name != "__builtins__"
+        }
+
+        for code in (
+            "from os import environ;environ['test']='in memory'",
+            ast.parse("from os import environ;environ['test']='in memory'"),
+        ):
+            environ["test"] = ""
+            result = PyObfuscator.obfuscate(code, level=6)
+            self.assertIsInstance(result, PyObfuscator.ObfuscationResult)
+            self.assertIsInstance(result.names["environ"], Name)
+            self.assertEqual(
+                result.configuration["Obfuscator"]["level"], 6
+            )
+            exec(result.code, namespace.copy())
+            self.assertEqual(environ["test"], "in memory")
+
+        self.assertFalse(path.isfile("deobfuscate.json"))
+
+    def test_filter(self):
+        from subprocess import run
+
+        process = run(
+            [sys.executable, PyObfuscator.__file__, "-", "-l", "2"],
+            input="print('filter')",
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(process.returncode, 0)
+        self.assertIn("PyObfuscator", process.stderr)
+        compile(process.stdout, "filter.py", "exec")
+
+    def test_silent_lazy_import(self):
+        from subprocess import run
+
+        process = run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, PyObfuscator; print(' '.join(sys.modules))",
+            ],
+            cwd=path.dirname(PyObfuscator.__file__),
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(process.stderr, "")
+        self.assertNotIn("Copyright", process.stdout)
+        modules = set(process.stdout.split())
+        for module in (
+            "argparse",
+            "asyncio",
+            "json",
+            "gzip",
+            "lzma",
+            "bz2",
+            "base64",
+            "dataclasses",
+            "inspect",
+            "socket",
+            "concurrent.futures",
+        ):
+            self.assertNotIn(module, modules)
+
+    def test_import_time(self):
+        from tempfile import TemporaryDirectory
+        from py_compile import compile as compile_file
+        from importlib.util import cache_from_source
+        from subprocess import run
+        from shutil import copy
+
+        with TemporaryDirectory() as directory:
+            filename = copy(PyObfuscator.__file__, directory)
+            compile_file(filename, cache_from_source(filename))
+
+            times = []
+            for _ in range(5):
+                process = run(
+                    [
+                        sys.executable,
+                        "-X",
+                        "importtime",
+                        "-c",
+                        "import PyObfuscator",
+                    ],
+                    cwd=directory,
+                    capture_output=True,
+                    text=True,
+                )
+                line = process.stderr.splitlines()[-1]
+                self.assertTrue(line.endswith("| PyObfuscator"))
+                times.append(int(line.split("|")[1]))
+
+            self.assertLess(min(times), 100000)
+
+
+class Test_Batch(TestCase):
+    def test_batch_obfuscation(self):
+        from tempfile import TemporaryDirectory
+
+        with TemporaryDirectory() as directory:
+            filenames = []
+            for index, size in enumerate((1, 50, 10)):
+                filename = path.join(directory, f"batch{index}.py")
+                filenames.append(filename)
+                with open(filename, "w") as file:
+                    file.write(f"value = {index}\n" * size)
+
+            with open(path.join(directory, "error.py"), "w") as file:
+                file.write("def (:")
+
+            self.assertListEqual(
+                PyObfuscator.get_filenames(
+                    [path.join(directory, "batch*.py"), filenames[0]]
+                ),
+                filenames,
+            )
+
+            output = path.join(directory, "output")
+            reports = PyObfuscator.batch_obfuscation(
+                filenames + [path.join(directory, "error.py")],
+                output,
+                2,
+                level=3,
+                deobfuscate=True,
+            )
+
+            self.assertEqual(len(reports), 4)
+            for report in reports:
+                if report.filename.endswith("error.py"):
+                    self.assertTrue(report.error.startswith("SyntaxError"))
+                    continue
+
+                self.assertIsNone(report.error)
+                self.assertTrue(path.isfile(report.output_filename))
+                self.assertTrue(
+                    path.isfile(
+                        report.output_filename[:-3] + "_deobfuscate.json"
+                    )
+                )
+                self.assertEqual(
+                    path.dirname(report.output_filename), output
+                )
+                self.assertEqual(
+                    report.output_size, path.getsize(report.output_filename)
+                )
+
+            PyObfuscator.print_batch_reports(reports)
+            self.assertFalse(path.isfile("deobfuscate.json"))
+
+    def test_write_atomic(self):
+        from tempfile import TemporaryDirectory
+        from threading import Thread
+        from os import listdir
+
+        with TemporaryDirectory() as directory:
+            filename = path.join(directory, "atomic.py")
+            threads = [
+                Thread(
+                    target=PyObfuscator.write_atomic,
+                    args=(filename, str(index).encode() * 100000),
+                )
+                for index in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertListEqual(listdir(directory), ["atomic.py"])
+            with open(filename, "rb") as file:
+                data = file.read()
+            self.assertEqual(data, data[:1] * 100000)
+            if sys.platform != "win32":
+                self.assertEqual(
+                    PyObfuscator.stat(filename).st_mode & 0o777, 0o644
+                )
+
+    def test_batch_tree(self):
+        from tempfile import TemporaryDirectory
+
+        with TemporaryDirectory() as directory:
+            filenames = []
+            for name in ("a", "b"):
+                PyObfuscator.makedirs(path.join(directory, name))
+                filenames.append(path.join(directory, name, "module.py"))
+                with open(filenames[-1], "w") as file:
+                    file.write(f"result = {name!r}\n")
+
+            missing = path.join(directory, "missing.py")
+            output = path.join(directory, "output")
+            reports = PyObfuscator.batch_obfuscation(
+                filenames + [missing],
+                output,
+                1,
+                level=1,
+                names={"result": "result"},
+                deobfuscate=False,
+            )
+
+            self.assertEqual(len(reports), 3)
+            for report in reports:
+                if report.filename == missing:
+                    self.assertTrue(
+                        report.error.startswith("FileNotFoundError")
+                    )
+                    continue
+
+                name = path.basename(path.dirname(report.filename))
+                self.assertEqual(
+                    report.output_filename,
+                    path.join(output, name, "module_obfu.py"),
+                )
+                namespace = {
+                    name: None
+                    for name in default_dir
+                    if name != "__builtins__"
+                }
+                with open(report.output_filename) as file:
+                    exec(file.read(), namespace)
+                self.assertEqual(
+                    namespace["result"],
+                    path.basename(path.dirname(report.filename)),
+                )
+
+    def test_batch_shared_runtime(self):
+        from tempfile import TemporaryDirectory
+        from subprocess import run
+
+        with TemporaryDirectory() as directory:
+            sources = path.join(directory, "sources")
+            PyObfuscator.makedirs(sources)
+            filenames = []
+            for name in ("first", "second"):
+                filenames.append(path.join(sources, f"{name}.py"))
+                with open(filenames[-1], "w") as file:
+                    file.write(f"print('shared ' + {name!r})\n")
+
+            reports = PyObfuscator.batch_obfuscation(
+                filenames, None, 1, "pyobfuscator_runtime", level=6
+            )
+            self.assertFalse(any(report.error for report in reports))
+            self.assertTrue(
+                path.isfile(path.join(sources, "pyobfuscator_runtime.py"))
+            )
+
+            process = run(
+                [sys.executable, path.join(sources, "first_obfu.py")],
+                cwd=directory,
+                capture_output=True,
+                text=True,
+            )
+            self.assertEqual(process.returncode, 0, process.stderr)
+            self.assertEqual(process.stdout, "shared first\n")
+
+    def test_batch_pipeline(self):
+        from tempfile import TemporaryDirectory
+        from os import listdir
+
+        with TemporaryDirectory() as directory:
+            filenames = []
+            for index in range(5):
+                filename = path.join(directory, f"pipeline{index}.py")
+                filenames.append(filename)
+                with open(filename, "w", newline="") as file:
+                    file.write(f"value = {index}\r\nresult = value\r\n")
+
+            invalid = path.join(directory, "invalid.py")
+            with open(invalid, "wb") as file:
+                file.write(b"value = '\xff'\n")
+
+            output = path.join(directory, "output")
+            reports = PyObfuscator.batch_obfuscation(
+                filenames + [invalid],
+                output,
+                1,
+                readers=2,
+                writers=2,
+                queue_size=1,
+                level=3,
+                names={"result": "result"},
+                deobfuscate=False,
+            )
+
+            self.assertEqual(len(reports), 6)
+            for report in reports:
+                if report.filename == invalid:
+                    self.assertTrue(
+                        report.error.startswith("UnicodeDecodeError")
+                    )
+                    continue
+
+                self.assertIsNone(report.error)
+                self.assertEqual(report.input_size, 27)
+                self.assertEqual(
+                    report.output_size, path.getsize(report.output_filename)
+                )
+                namespace = {
+                    name: None
+                    for name in default_dir
+                    if name != "__builtins__"
+                }
+                with open(report.output_filename) as file:
+                    exec(file.read(), namespace)
+                self.assertEqual(
+                    namespace["result"], int(report.filename[-4])
+                )
+
+            self.assertListEqual(
+                sorted(listdir(output)),
+                [f"pipeline{index}_obfu.py" for index in range(5)],
+            )
+
+    def test_watch(self):
+        from tempfile import TemporaryDirectory
+        from os import utime
+
+        with TemporaryDirectory() as directory:
+            source = path.join(directory, "source")
+            PyObfuscator.makedirs(path.join(source, "package"))
+            first = path.join(source, "first.py")
+            second = path.join(source, "package", "second.py")
+            for filename, value in ((first, 1), (second, 2)):
+                with open(filename, "w") as file:
+                    file.write(f"def shared():\n    return {value}\n")
+
+            output = path.join(directory, "output")
+            watcher = PyObfuscator.Watcher(
+                source, output, level=2, deobfuscate=False
+            )
+            reports = watcher.poll()
+            self.assertListEqual(
+                [report.filename for report in reports], [first, second]
+            )
+            self.assertTrue(
+                path.isfile(path.join(output, "package", "second_obfu.py"))
+            )
+            self.assertListEqual(watcher.poll(), [])
+
+            shared = watcher.names["shared"].obfuscation
+            with open(reports[1].output_filename) as file:
+                second_code = file.read()
+
+            with open(first, "w") as file:
+                file.write("def shared():\n    return 3\n")
+            utime(first, ns=(0, 0))
+
+            reports = watcher.poll()
+            self.assertEqual(len(reports), 1)
+            self.assertEqual(reports[0].filename, first)
+            self.assertIsNone(reports[0].error)
+            self.assertEqual(watcher.names["shared"].obfuscation, shared)
+            with open(path.join(output, "package", "second_obfu.py")) as file:
+                self.assertEqual(file.read(), second_code)
+
+            namespace = {
+                name: None for name in default_dir if name != "__builtins__"
+            }
+            with open(reports[0].output_filename) as file:
+                exec(file.read(), namespace)
+            self.assertEqual(namespace[shared](), 3)
+
+            with patch.object(PyObfuscator, "isfile") as isfile, patch.object(
+                PyObfuscator, "makedirs"
+            ) as makedirs:
+                self.assertListEqual(watcher.poll(), [])
+            isfile.assert_not_called()
+            makedirs.assert_not_called()
+
+            remove(second)
+            self.assertListEqual(watcher.poll(), [])
+            self.assertFalse(
+                path.exists(path.join(output, "package", "second_obfu.py"))
+            )
+
+            watcher = PyObfuscator.Watcher(
+                source, output, level=2, deobfuscate=False
+            )
+            self.assertEqual(watcher.names["shared"].obfuscation, shared)
+            self.assertListEqual(watcher.poll(), [])
+
+            remove(reports[0].output_filename)
+            watcher = PyObfuscator.Watcher(
+                source, output, level=2, deobfuscate=False
+            )
+            reports = watcher.poll()
+            self.assertListEqual(
+                [report.filename for report in reports], [first]
+            )
+            self.assertEqual(watcher.names["shared"].obfuscation, shared)
+
+    def test_metrics(self):
+        from tempfile import TemporaryDirectory
+        from os import listdir
+
+        with TemporaryDirectory() as directory:
+            filename = path.join(directory, "metrics.py")
+            with open(filename, "w") as file:
+                file.write("from json import *\nprint(dumps([1]))\n")
+            with open(path.join(directory, "error.py"), "w") as file:
+                file.write("def (:")
+
+            cache = path.join(directory, "exports.json")
+            for _ in range(2):
+                reports = PyObfuscator.batch_obfuscation(
+                    [filename, path.join(directory, "error.py")],
+                    path.join(directory, "output"),
+                    1,
+                    level=6,
+                    exports_cache=cache,
+                    stats=True,
+                    trace_memory=False,
+                )
+            metrics = [
+                PyObfuscator.get_metrics(report, 6)
+                for report in sorted(reports, key=lambda x: x.filename)
+            ]
+
+            self.assertTrue(metrics[0]["error"].startswith("SyntaxError"))
+            self.assertEqual(metrics[0]["stages"], {})
+            metric = metrics[1]
+            self.assertEqual(metric["cache_hits"], 1)
+            self.assertEqual(metric["cache_misses"], 0)
+            self.assertGreater(metric["names"], 0)
+            self.assertGreater(metric["expansion_ratio"], 1)
+            self.assertIn("unparse", metric["stages"])
+            self.assertIn("hexadecimal", metric["stages"])
+            self.assertEqual(
+                metric["expansion_ratio"],
+                metric["output_size"] / metric["input_size"],
+            )
+            ratios = metric["stage_expansion_ratios"]
+            self.assertIn("gzip", ratios)
+            self.assertGreater(ratios["base85"], 1)
+            self.assertAlmostEqual(ratios["hexadecimal"], 4, delta=0.1)
+            self.assertEqual(metrics[0]["stage_expansion_ratios"], {})
+
+            jsonl = path.join(directory, "metrics.jsonl")
+            PyObfuscator.write_metrics(jsonl, metrics)
+            PyObfuscator.write_metrics(jsonl, metrics[1:])
+            with open(jsonl) as file:
+                records = [json.loads(line) for line in file]
+            self.assertEqual(len(records), 3)
+            self.assertIn("timestamp", records[0])
+            self.assertEqual(records[1]["filename"], filename)
+            self.assertEqual(records[1]["stage_expansion_ratios"], ratios)
+
+            prom = path.join(directory, "metrics.prom")
+            PyObfuscator.write_metrics(prom, metrics)
+            PyObfuscator.write_metrics(prom, metrics)
+            with open(prom) as file:
+                lines = file.read().splitlines()
+            label = f'file="{filename}",level="6"'
+            self.assertIn(f"pyobfuscator_failed{{{label}}} 0", lines)
+            self.assertIn(
+                f"pyobfuscator_exports_cache_hits{{{label}}} 1", lines
+            )
+            self.assertEqual(
+                len([line for line in lines if "stage=\"parse\"" in line]),
+                2,
+            )
+            self.assertIn(
+                f'pyobfuscator_stage_expansion_ratio{{{label},stage="gzip"}}'
+                f" {ratios['gzip']}",
+                lines,
+            )
+            self.assertListEqual(
+                sorted(listdir(directory)),
+                sorted(
+                    [
+                        "error.py",
+                        "exports.json",
+                        "metrics.jsonl",
+                        "metrics.prom",
+                        "metrics.py",
+                        "output",
+                    ]
+                ),
+            )
+
+    def test_budget_obfuscation(self):
+        from tempfile import TemporaryDirectory
+
+        with TemporaryDirectory() as directory:
+            filename = path.join(directory, "budget.py")
+            with open(filename, "w") as file:
+                file.write("print(sum(len(str(i)) for i in range(100)))\n")
+
+            command = f'"{sys.executable}" {{file}}'
+            reports = [
+                PyObfuscator.budget_obfuscation(
+                    filename, command, max_slowdown, repeat=1, level=3
+                )
+                for max_slowdown in (100, -1)
+            ]
+
+            self.assertIsNone(reports[0].error)
+            self.assertTrue(reports[0].within_budget)
+            self.assertListEqual(
+                reports[0].kept, ["constants", "attributes", "layers"]
+            )
+            self.assertTrue(path.isfile(reports[0].output_filename))
+
+            self.assertIsNone(reports[1].error)
+            self.assertFalse(reports[1].within_budget)
+            self.assertListEqual(reports[1].kept, [])
+            with open(reports[1].output_filename) as file:
+                self.assertIn("(100)", file.read())
+
+            error = PyObfuscator.budget_obfuscation(
+                filename, f'"{sys.executable}" -c "1/0"', repeat=1
+            )
+            self.assertTrue(error.error.startswith("CalledProcessError"))
+
+            PyObfuscator.print_budget_reports(reports + [error])
+
+
+class Test_Daemon(TestCase):
+    def test_obfuscate_job(self):
+        result = PyObfuscator.obfuscate_job(
+            {
+                "code": "from os import environ;environ['test']='job test'",
+                "options": {"level": 6, "names": {"environ": "job_environ"}},
+            }
+        )
+        self.assertNotIn("error", result)
+        self.assertIn(
+            {
+                "name": "environ",
+                "obfuscation_name": "job_environ",
+                "definition": False,
+                "namespace": None,
+            },
+            result["names"],
+        )
+        self.assertEqual(result["Obfuscator"]["level"], 6)
+
+        exec(
+            result["code"],
+            {
+                name: None
+                for name in PyObfuscator.default_dir
+                if name != "__builtins__"
+            },
+        )
+        self.assertEqual(environ["test"], "job test")
+
+        result = PyObfuscator.obfuscate_job({"code": "def (:"})
+        self.assertTrue(result["error"].startswith("SyntaxError"))
+
+    def test_serve_loopback(self):
+        import asyncio
+
+        for address in ("0.0.0.0:8765", "192.0.2.1:8765"):
+            with self.assertRaises(ValueError):
+                asyncio.run(PyObfuscator.serve(address, 1))
+
+    def test_job_host_options(self):
+        from tempfile import TemporaryDirectory
+
+        with TemporaryDirectory() as directory:
+            filenames = {
+                option: path.join(directory, f"{option}.json")
+                for option in PyObfuscator.host_options
+            }
+            for option, filename in filenames.items():
+                result = PyObfuscator.obfuscate_job(
+                    {
+                        "filename": path.join(directory, "job.py"),
+                        "code": "from os import *\nprint(1)",
+                        "options": {"level": 2, option: filename},
+                    }
+                )
+                self.assertEqual(
+                    result,
+                    {"error": f"Option not allowed in a job: {option!r}"},
+                )
+                self.assertFalse(path.exists(filename))
+
+            result = PyObfuscator.obfuscate_job(
+                {
+                    "code": "from os import *\nprint(1)",
+                    "options": {"level": 2},
+                },
+                {"exports_cache": filenames["exports_cache"]},
+            )
+            self.assertNotIn("error", result)
+            self.assertTrue(path.exists(filenames["exports_cache"]))
+
+    def test_serve_and_client(self):
+        from socket import socket, AF_UNIX, SOCK_STREAM
+        from tempfile import TemporaryDirectory
+        from threading import Thread
+        import asyncio
+
+        with TemporaryDirectory() as directory:
+            address = path.join(directory, "daemon.sock")
+            loop = asyncio.new_event_loop()
+            task = loop.create_task(PyObfuscator.serve(address, 1))
+
+            def run_loop():
+                try:
+                    loop.run_until_complete(task)
+                except asyncio.CancelledError:
+                    pass
+
+                loop.run_until_complete(
+                    asyncio.gather(
+                        *asyncio.all_tasks(loop), return_exceptions=True
+                    )
+                )
+
+            thread = Thread(target=run_loop)
+            thread.start()
+
+            try:
+                for _ in range(500):
+                    if path.exists(address):
+                        break
+                    time.sleep(0.01)
+
+                result = PyObfuscator.client(
+                    address,
+                    {"code": "print('daemon')", "options": {"level": 2}},
+                )
+                self.assertNotIn("error", result)
+                self.assertIn("names", result)
+                compile(result["code"], "daemon.py", "exec")
+
+                with socket(AF_UNIX, SOCK_STREAM) as connection:
+                    connection.connect(address)
+                    file = connection.makefile("rwb")
+                    file.write(b"{invalid json\n")
+                    file.flush()
+                    self.assertTrue(
+                        json.loads(file.readline())["error"].startswith(
+                            "Invalid JSON job"
+                        )
+                    )
+                    file.write(b'{"code": "print(1)"}\n')
+                    file.flush()
+                    self.assertIn("code", json.loads(file.readline()))
+                    file.close()
+            finally:
+                loop.call_soon_threadsafe(task.cancel)
+                thread.join()
+                loop.close()
+
+
 class Test_Obfuscator(TestCase):
     def test_add_super_arguments(self):
         obfu = Obfuscator("")
@@ -282,6 +1125,8 @@ class Test_Obfuscator(TestCase):
     def test_gzip(self):
         mock = Mock()
         mock.level = 0
+        mock.compression = "gzip"
+        mock.compression_level = None
 
         mock.code = "environ['test'] = 'Hello World !'"
         code = "environ['test'] = 'Python Hello World !'"
@@ -334,6 +1179,106 @@ class Test_Obfuscator(TestCase):
                 "Gzip obfuscation: bad execution",
             )
 
+    def test_gzip_codecs(self):
+        code = "environ['test'] = 'Codec Hello World !'"
+
+        for codec in ("gzip", "zlib", "lzma", "bz2"):
+            obfu = Obfuscator("", compression=codec, compression_level=1)
+            compressed_code = obfu.gzip(code)
+            self.assertTrue(
+                compressed_code.startswith(f"from {codec} import decompress"),
+                "gzip don't use the compression codec",
+            )
+
+            environ["test"] = ""
+            exec(compressed_code)
+            self.assertEqual(
+                environ["test"],
+                "Codec Hello World !",
+                f"Bad execution with {codec} compression",
+            )
+
+        with self.assertRaises(ValueError):
+            Obfuscator("", compression="unknown")
+
+        with self.assertRaises(ValueError):
+            Obfuscator("", compression="bz2", compression_level=0)
+
+    def test_compression_benchmark(self):
+        obfu = Obfuscator("")
+        reports = obfu.compression_benchmark("print('a')" * 100, repeat=1)
+
+        self.assertListEqual(
+            [report.codec for report in reports],
+            ["gzip", "zlib", "lzma", "bz2"],
+        )
+        for report in reports:
+            self.assertLess(report.size, 1000)
+            self.assertGreaterEqual(report.decompress_time, 0)
+
+    def test_missing_filename_argument(self):
+        from subprocess import run
+
+        process = run(
+            [sys.executable, PyObfuscator.__file__],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(process.returncode, 2)
+        self.assertIn("required: filenames", process.stderr)
+
+    def test_compression_level_argument(self):
+        from subprocess import run
+
+        process = run(
+            [
+                sys.executable,
+                PyObfuscator.__file__,
+                "code.py",
+                "-c",
+                "bz2",
+                "-C",
+                "0",
+            ],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(process.returncode, 2)
+        self.assertIn("bz2 levels are 1 to 9", process.stderr)
+
+    def test_loader(self):
+        def input(string):
+            return "abc"
+
+        code = "environ['test'] = 'Loader Hello World !'"
+        self.assertEqual(
+            Obfuscator("", level=2).loader(code),
+            code,
+            "loader change code with level 2",
+        )
+
+        for level in (3, 4, 5, 6):
+            for password in (None, "abc"):
+                obfu = Obfuscator("", level=level, password=password)
+                loader_code = obfu.loader(code)
+                self.assertEqual(loader_code, obfu.code)
+                self.assertNotIn(
+                    "Loader", loader_code, "loader don't pack the code"
+                )
+                self.assertEqual(
+                    loader_code.count("exec"),
+                    1,
+                    "loader should use only one exec",
+                )
+
+                environ["test"] = ""
+                exec(loader_code)
+                self.assertEqual(
+                    environ["test"],
+                    "Loader Hello World !",
+                    f"Bad execution with loader (level {level})",
+                )
+
     def test_hexadecimal(self):
         mock = Mock()
         mock.level = 0
@@ -399,6 +1344,7 @@ class Test_Obfuscator(TestCase):
     def test_base85(self):
         mock = Mock()
         mock.level = 0
+        mock.armor = "base85"
 
         mock.code = "environ['test'] = 'Hello World !'"
         code = "environ['test'] = 'Python Hello World !'"
@@ -451,6 +1397,41 @@ class Test_Obfuscator(TestCase):
                 "Bad execution with base85 obfuscation",
             )
 
+    def test_base85_armors(self):
+        code = "environ['test'] = 'Armor Hello World !'"
+
+        for armor in ("base85", "base85-chunked", "base64", "base16"):
+            obfu = Obfuscator("", armor=armor)
+            for encoded_code in (obfu.base85(code), obfu.loader(code)):
+                environ["test"] = ""
+                exec(encoded_code)
+                self.assertEqual(
+                    environ["test"],
+                    "Armor Hello World !",
+                    f"Bad execution with {armor} armor",
+                )
+
+        data = bytes(range(256)) * 1000
+        self.assertEqual(
+            PyObfuscator.b85encode_chunked(data, 1024),
+            PyObfuscator.base85_encode(data),
+        )
+        self.assertEqual(
+            PyObfuscator.b85decode_chunked(
+                PyObfuscator.base85_encode(data), 1280
+            ),
+            data,
+        )
+
+        with self.assertRaises(ValueError):
+            Obfuscator("", armor="unknown")
+
+        with self.assertRaises(ValueError):
+            PyObfuscator.b85encode_chunked(data, 1001)
+
+        with self.assertRaises(ValueError):
+            PyObfuscator.b85decode_chunked(b"", 1024)
+
     def test_xor_code(self):
         def input(string):
             return "abc"
@@ -725,6 +1706,61 @@ class Test_Obfuscator(TestCase):
         # remove("test_obfu.py")
         remove("deobfuscate.json")
 
+    def test_lazy_functions(self):
+        code = (
+            "from os import environ\n"
+            "def lazy_function(value):\n"
+            "    return 'lazy ' + value\n"
+            "@staticmethod\n"
+            "def decorated():\n"
+            "    return 'decorated'\n"
+            "def not_called():\n"
+            "    return 'not called'\n"
+            "environ['test'] = lazy_function('function')\n"
+        )
+        obfu = Obfuscator("", level=2, names={}, lazy=True)
+        obfu_code = obfu.source_obfuscation(code)
+        name = obfu.default_names["lazy_function"].obfuscation
+
+        self.assertIn(
+            f"\tdef {name}(*__, **___):",
+            obfu_code,
+            "lazy_functions don't add the trampoline",
+        )
+        self.assertIn(
+            "\t\treturn _(*__, **___)",
+            obfu_code,
+            "lazy_functions don't add the trampoline",
+        )
+
+        namespace = {
+            name: None
+            for name in PyObfuscator.default_dir
+            if name != "__builtins__"
+        }
+        exec(obfu_code, namespace)
+        self.assertEqual(environ["test"], "lazy function")
+        self.assertNotIn(
+            "_", namespace[name].__code__.co_freevars, "function not rebound"
+        )
+
+        name = obfu.default_names["not_called"].obfuscation
+        trampoline = namespace[name]
+        self.assertIn("_", trampoline.__code__.co_freevars)
+
+        exec_ = obfu.default_names["exec"].obfuscation
+        calls = []
+        namespace[exec_] = lambda *arguments: calls.append(exec(*arguments))
+        self.assertEqual(trampoline(), "not called")
+        self.assertNotIn(
+            "_", namespace[name].__code__.co_freevars, "function not rebound"
+        )
+        self.assertEqual(trampoline(), "not called")
+        self.assertEqual(len(calls), 1, "function decrypted on each call")
+
+        obfu = Obfuscator("", level=1, names={}, lazy=True)
+        self.assertEqual(obfu.lazy_functions(code), code)
+
     def test_get_attributes_from(self):
         obfu = Obfuscator("")
         mock1 = Mock()
@@ -826,7 +1862,7 @@ class Test_Obfuscator(TestCase):
         for value in values.elts:
             self.assertEqual(
                 value.args[0].func.id,
-                obfu.default_names["myimport"].obfuscation,
+                obfu.default_names["__import__"].obfuscation,
                 "get_targets_and_value_for_import don't return import function in second tuple",
             )
             self.assertEqual(
@@ -903,7 +1939,7 @@ class Test_Obfuscator(TestCase):
             if first:
                 self.assertEqual(
                     obfu.obfu_names[call.args[0].func.id].name,
-                    "myimport",
+                    "__import__",
                     "visit_Import don't call __import__ functions",
                 )
                 self.assertIn(
@@ -923,6 +1959,180 @@ class Test_Obfuscator(TestCase):
                     "visit_Import don't import good module",
                 )
 
+    def test_rank_names(self):
+        code = (
+            "def compute(value):\n    total = value\n"
+            "    for index in range(value):\n        total += index\n"
+            "    return total\nresult = compute(5) + compute(2)\n"
+        )
+        result = PyObfuscator.obfuscate(code, level=1, names={}, minify=True)
+        default = PyObfuscator.obfuscate(code, level=1, names={})
+        self.assertLess(len(result.code), len(default.code))
+
+        names = result.names
+        self.assertEqual(len(names["total"].obfuscation), 1)
+        self.assertLessEqual(
+            len(names["total"].obfuscation), len(names["print"].obfuscation)
+        )
+        obfuscations = [name.obfuscation for name in names.values()]
+        self.assertEqual(len(obfuscations), len(set(obfuscations)))
+        for name in obfuscations:
+            self.assertTrue(name.isidentifier())
+            self.assertNotIn(name, dir(__builtins__) + ["for", "in", "if"])
+
+        namespace = {
+            name: None for name in default_dir if name != "__builtins__"
+        }
+        exec(result.code, namespace)
+        self.assertEqual(namespace[names["result"].obfuscation], 18)
+
+    def test_rename_scopes(self):
+        code = (
+            "def first(value):\n    total = value * 2\n    return total\n"
+            "def second(value):\n    result = value + 1\n    return result\n"
+            "def closure(value):\n    counter = value\n"
+            "    def inner():\n        return counter\n    return inner()\n"
+            "def dynamic(value):\n    hidden = value\n"
+            "    return len(locals())\n"
+            "output = (first(2), second(2), closure(3), dynamic(4))\n"
+        )
+        obfu = Obfuscator("", level=1, names={}, scopes=True)
+        result = obfu.obfuscate(code)
+
+        self.assertListEqual(
+            [(name.name, name.namespace_name) for name in obfu.scoped_names],
+            [("total", "first"), ("result", "second")],
+        )
+        self.assertEqual(
+            obfu.scoped_names[0].obfuscation, obfu.scoped_names[1].obfuscation
+        )
+        self.assertNotIn("total", result.names)
+        self.assertIn("counter", result.names)
+        self.assertIn(
+            "first",
+            [name["namespace"] for name in result.configuration["names"]],
+        )
+
+        namespace = {
+            name: None for name in default_dir if name != "__builtins__"
+        }
+        exec(result.code, namespace)
+        self.assertTupleEqual(
+            namespace[result.names["output"].obfuscation], (4, 3, 3, 2)
+        )
+
+    def test_profile_hot_functions(self):
+        from tempfile import TemporaryDirectory
+
+        code = (
+            "def hot(value):\n    return value.upper() + 'hot'\n"
+            "def cold(value):\n    return value.upper() + 'cold'\n"
+            "output = hot('a') + cold('b')\n"
+        )
+
+        with TemporaryDirectory() as directory:
+            profile = path.join(directory, "calls.json")
+            with open(profile, "w") as file:
+                json.dump({"module.py:1(hot)": 99, "module.py:3(cold)": 1}, file)
+
+            obfu = Obfuscator("", level=2, names={}, profile=profile)
+            source = obfu.source_obfuscation(code)
+
+        self.assertIn("'hot'", source)
+        self.assertIn(".upper()", source)
+        self.assertNotIn("'cold'", source)
+        self.assertEqual(source.count(".upper()"), 1)
+
+        namespace = {
+            name: None for name in default_dir if name != "__builtins__"
+        }
+        exec(source, namespace)
+        self.assertEqual(
+            namespace[obfu.default_names["output"].obfuscation], "AhotBcold"
+        )
+
+    def test_hoist_loop_constants(self):
+        code = (
+            "def count(values):\n    total = 0\n    for value in values:\n"
+            "        total += len(str(value) + 'ab') + 10\n"
+            "    return total, [item + 'c' for item in 'ab']\n"
+            "output = count(range(12))\n"
+        )
+        obfu = Obfuscator("", level=2, names={})
+        source = obfu.source_obfuscation(code)
+
+        loop = next(
+            node
+            for node in ast.walk(ast.parse(source))
+            if isinstance(node, ast.For)
+        )
+        self.assertNotIn(
+            obfu.default_names["xor"].obfuscation,
+            [
+                node.id
+                for node in ast.walk(loop)
+                if isinstance(node, ast.Name)
+            ],
+        )
+
+        namespace = {
+            name: None for name in default_dir if name != "__builtins__"
+        }
+        exec(source, namespace)
+        self.assertTupleEqual(
+            namespace[obfu.default_names["output"].obfuscation],
+            (158, ["ac", "bc"]),
+        )
+
+        obfu = Obfuscator("", level=2, names={}, hoist=False)
+        source = obfu.source_obfuscation(code)
+        loop = next(
+            node
+            for node in ast.walk(ast.parse(source))
+            if isinstance(node, ast.For)
+        )
+        self.assertIn(
+            obfu.default_names["xor"].obfuscation,
+            [
+                node.id
+                for node in ast.walk(loop)
+                if isinstance(node, ast.Name)
+            ],
+        )
+
+    def test_imports_without_exception(self):
+        import xml.dom.minidom
+        import json.decoder
+
+        result = PyObfuscator.obfuscate(
+            "from xml import dom\nfrom os import path\n"
+            "import xml.dom.minidom as m\nfrom json import decoder, loads\n"
+            "result = (dom, path, m, decoder, loads)",
+            level=2,
+            names={},
+        )
+        namespace = {
+            name: None for name in default_dir if name != "__builtins__"
+        }
+        exceptions = []
+
+        def trace(frame, event, argument):
+            if event == "exception":
+                exceptions.append(argument[0])
+            return trace
+
+        sys.settrace(trace)
+        try:
+            exec(result.code, namespace)
+        finally:
+            sys.settrace(None)
+
+        self.assertListEqual(exceptions, [])
+        self.assertTupleEqual(
+            namespace[result.names["result"].obfuscation],
+            (xml.dom, path, xml.dom.minidom, json.decoder, json.loads),
+        )
+
     def test_visit_ImportFrom(self):
         import_from1 = ast.ImportFrom(
             module="dataclasses", names=[ast.alias(name="dataclass")], level=0
@@ -931,11 +2141,7 @@ class Test_Obfuscator(TestCase):
             module="ast", names=[ast.alias(name="*")], level=0
         )
 
-        ast_attr = [
-            attr
-            for attr in dir(ast)
-            if not (attr.startswith("__") and attr.endswith("__"))
-        ]
+        ast_attr = [attr for attr in dir(ast) if not attr.startswith("_")]
 
         obfu = Obfuscator("", level=0)
         obfu.init_crypt_strings()
@@ -971,6 +2177,83 @@ class Test_Obfuscator(TestCase):
             "visit_ImportFrom don't import good attributes when import *",
         )
 
+    def test_get_module_exports(self):
+        from tempfile import TemporaryDirectory
+
+        with TemporaryDirectory() as directory:
+            filename = path.join(directory, "exports.py")
+            with open(filename, "w") as file:
+                file.write(
+                    "raise RuntimeError('imported')\n"
+                    "__all__ = ['a', 'b']\n__all__ += ['c']\n"
+                )
+            cache_filename = path.join(directory, "cache", "exports.json")
+
+            self.assertListEqual(
+                PyObfuscator.get_module_exports(
+                    "exports", filename, cache_filename
+                ),
+                ["a", "b", "c"],
+            )
+            with open(cache_filename) as file:
+                self.assertEqual(
+                    json.load(file)[path.abspath(filename)][1],
+                    ["a", "b", "c"],
+                )
+
+            get_static_exports = PyObfuscator.get_static_exports
+            PyObfuscator.get_static_exports = Mock()
+            PyObfuscator.exports_caches.clear()
+            try:
+                self.assertListEqual(
+                    PyObfuscator.get_module_exports(
+                        "exports", filename, cache_filename
+                    ),
+                    ["a", "b", "c"],
+                )
+                PyObfuscator.get_static_exports.assert_not_called()
+            finally:
+                PyObfuscator.get_static_exports = get_static_exports
+                PyObfuscator.exports_caches.clear()
+
+            with open(filename, "w") as file:
+                file.write("def a(): pass\nif a: b = 1\n")
+            self.assertIsNone(PyObfuscator.get_static_exports(filename))
+            with open(filename, "w") as file:
+                file.write("__all__ = ['a']\n__all__.append('b')\n")
+            self.assertIsNone(PyObfuscator.get_static_exports(filename))
+            with open(filename, "w") as file:
+                file.write("import os.path\nfrom os import sep as s\nx=1\n")
+            self.assertListEqual(
+                PyObfuscator.get_static_exports(filename), ["os", "s", "x"]
+            )
+            with open(filename, "w") as file:
+                file.write(
+                    "try:\n    import json\nexcept ImportError:\n"
+                    "    json = None\n_private = 1\ndef main(): pass\n"
+                    "if __name__ == '__main__':\n    main()\n"
+                )
+            self.assertListEqual(
+                PyObfuscator.get_static_exports(filename), ["json", "main"]
+            )
+
+            package = path.join(directory, "package")
+            PyObfuscator.makedirs(package)
+            with open(path.join(package, "__init__.py"), "w") as file:
+                file.write("value = 1\n_private = 2\n")
+            filename = path.join(package, "module.py")
+            with open(filename, "w") as file:
+                file.write("from . import *\n")
+            obfu = Obfuscator(filename, names={}, level=1)
+            obfu.exports_cache = None
+            code = obfu.source_obfuscation("from . import *\n")
+            self.assertIn("value", code)
+            self.assertNotIn("_private", code)
+
+            obfu = Obfuscator("", names={}, level=1)
+            with self.assertRaises(ValueError):
+                obfu.source_obfuscation("from .missing import *\n")
+
     def test_init_builtins(self):
         global default_dir
 
@@ -1065,6 +2348,222 @@ class Test_Obfuscator(TestCase):
             "xor don't decrypt correctly an encrypted bytes",
         )
 
+    def test_xor_bytes(self):
+        from os import urandom
+
+        for size in (0, 1, 39, 40, 41, 4096, (1 << 20) + 7):
+            data = urandom(size)
+            for key in (urandom(40), [7, 255, 0], b"password"):
+                self.assertEqual(
+                    PyObfuscator.xor_bytes(data, key),
+                    bytes(
+                        [
+                            char ^ key[i % len(key)]
+                            for i, char in enumerate(data)
+                        ]
+                    ),
+                )
+
+    def test_fast_xor(self):
+        code = "output = ('long string ' * 3).upper(), b'\\x00bytes', ''\n"
+        obfu = Obfuscator("", level=2, names={}, fast_xor=True)
+        source = obfu.source_obfuscation(code)
+
+        xor = obfu.default_names["xor"].obfuscation
+        self.assertEqual(
+            [
+                node.targets[0].id
+                for node in ast.parse(source).body
+                if isinstance(node, ast.Assign)
+                and isinstance(node.value, ast.Lambda)
+            ],
+            [xor, xor],
+        )
+
+        namespace = {
+            name: None for name in default_dir if name != "__builtins__"
+        }
+        exec(source, namespace)
+        self.assertTupleEqual(
+            namespace[obfu.default_names["output"].obfuscation],
+            ("LONG STRING LONG STRING LONG STRING ", b"\x00bytes", ""),
+        )
+
+    def test_stats(self):
+        from io import StringIO
+
+        code = "def square(value):\n    return value * 2\n\nsquare(3)\n"
+        result = Obfuscator("", level=6, names={}, stats=True).obfuscate(code)
+        stages = [stage.name for stage in result.stats.stages]
+
+        for name in ("parse", "visit", "unparse", "gzip", "hexadecimal"):
+            self.assertIn(name, stages)
+        for stage in result.stats.stages:
+            self.assertGreater(stage.input_size, 0)
+            self.assertGreater(stage.output_size, 0)
+            self.assertGreaterEqual(stage.time, 0)
+            self.assertGreaterEqual(stage.peak_memory, 0)
+        self.assertGreater(result.stats.names, 0)
+        self.assertEqual(
+            result.stats.stages[-1].output_size, len(result.code)
+        )
+
+        self.assertIsNone(
+            Obfuscator("", level=6, names={}).obfuscate(code).stats
+        )
+
+        file = StringIO()
+        PyObfuscator.print_stats(result.stats, file)
+        lines = file.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("Stage"))
+        self.assertEqual(len(lines), len(result.stats.stages) + 3)
+        self.assertTrue(lines[1].startswith(result.stats.stages[0].name))
+        self.assertTrue(lines[-2].startswith("Total"))
+        self.assertEqual(
+            lines[-1],
+            f"Names: {result.stats.names} "
+            f"({result.stats.name_retries} retries)",
+        )
+
+    def test_runtime_stats(self):
+        from tempfile import TemporaryDirectory
+        from subprocess import run
+        from os import listdir
+
+        code = (
+            "class Value:\n    def get(self):\n        return 'value'\n"
+            "print(''.join(Value().get() for _ in range(3)))\n"
+        )
+
+        with TemporaryDirectory() as directory:
+            for options in ({}, {"combined_loader": True}):
+                result = Obfuscator(
+                    "", level=6, names={}, runtime_stats=True, **options
+                ).obfuscate(code)
+                filename = path.join(directory, "runtime_stats.py")
+                with open(filename, "w") as file:
+                    file.write(result.code)
+
+                report = path.join(directory, "report_{pid}.json")
+                process = run(
+                    [sys.executable, filename],
+                    env={**environ, "PYOBFUSCATOR_RUNTIME_STATS": report},
+                    capture_output=True,
+                    text=True,
+                )
+                self.assertEqual(process.stdout, "valuevaluevalue\n")
+
+                reports = [
+                    name
+                    for name in listdir(directory)
+                    if name.startswith("report_")
+                ]
+                self.assertEqual(len(reports), 1)
+                with open(path.join(directory, reports[0])) as file:
+                    stats = json.load(file)
+                remove(path.join(directory, reports[0]))
+
+                self.assertSetEqual(
+                    set(stats["layers"]),
+                    {"loader"}
+                    if options
+                    else {"gzip", "xor", "base85", "hexadecimal"},
+                )
+                for layer in stats["layers"].values():
+                    self.assertEqual(layer["calls"], 1)
+                    self.assertGreater(layer["exec"], 0)
+                self.assertGreaterEqual(sum(stats["xor"].values()), 3)
+                self.assertTrue(
+                    any(
+                        site.endswith(":decode") for site in stats["getattr"]
+                    )
+                )
+
+                process = run(
+                    [sys.executable, filename],
+                    env={
+                        name: value
+                        for name, value in environ.items()
+                        if name != "PYOBFUSCATOR_RUNTIME_STATS"
+                    },
+                    capture_output=True,
+                    text=True,
+                )
+                self.assertEqual(process.stdout, "valuevaluevalue\n")
+                self.assertFalse(
+                    any(
+                        name.startswith("report_")
+                        for name in listdir(directory)
+                    )
+                )
+
+    def test_tracer(self):
+        from tempfile import TemporaryDirectory
+
+        code = "def square(value):\n    return value * value\n"
+        self.assertFalse(Obfuscator("", names={}).tracing)
+
+        with self.assertLogs(level="DEBUG") as logs:
+            obfu = Obfuscator("", level=2, names={})
+            self.assertTrue(obfu.tracing)
+            obfu.obfuscate(code)
+        self.assertIn("DEBUG:root:'square' function obfuscation.", logs.output)
+        self.assertNotIn(
+            "DEBUG:root:Deleted annotation in <class 'ast.arg'>", logs.output
+        )
+
+        with self.assertLogs(level="INFO") as logs:
+            obfu = Obfuscator("", level=2, names={})
+            self.assertFalse(obfu.tracing)
+            obfu.obfuscate(code)
+        self.assertListEqual(
+            [line for line in logs.output if line.startswith("DEBUG:")], []
+        )
+        self.assertIn(
+            "INFO:root:Deleted annotation in <class 'ast.arg'>", logs.output
+        )
+
+        with TemporaryDirectory() as directory:
+            events = path.join(directory, "events.jsonl")
+            for level, sample in ((2, 1), (1, 1), (1, 0.25)):
+                obfu = Obfuscator(
+                    "code.py",
+                    level=level,
+                    names={},
+                    trace_events=events,
+                    trace_sample=sample,
+                )
+                self.assertTrue(obfu.tracing)
+                obfu.obfuscate(code)
+                self.assertIsNone(obfu.tracer.events)
+
+            with open(events) as file:
+                records = [json.loads(line) for line in file]
+
+        function = {
+            "filename": "code.py",
+            "node": "FunctionDef",
+            "line": 1,
+            "column": 0,
+            "message": "'square' function obfuscation.",
+        }
+        level2 = records.index(function)
+        self.assertGreater(level2, 0)
+        self.assertEqual(records[level2 + 3]["line"], 2)
+        self.assertListEqual(
+            [record["message"] for record in records[level2 + 5 :]],
+            [
+                "Delete Module doc string.",
+                "'square' function obfuscation.",
+                "arg obfuscation for value",
+                "Deleted annotation in <class 'ast.arg'>",
+                "Name obfuscation for 'value'",
+                "Name obfuscation for 'value'",
+                "Delete Module doc string.",
+                "Name obfuscation for 'value'",
+            ],
+        )
+
     def test_visit_ClassDef(self):
         class_ = ast.ClassDef(
             name="Test",